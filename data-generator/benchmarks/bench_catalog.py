@@ -0,0 +1,67 @@
+# data_generator/benchmarks/bench_catalog.py
+#
+# Catalog load time and sampling rate for a large synthetic catalog, and batch
+# generation throughput with it compared to the built-in 38 products.
+# Run from the data-generator directory:  python benchmarks/bench_catalog.py
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src import catalog, event_generator
+from src.catalog import Catalog
+
+NUM_PRODUCTS = 100_000
+SAMPLES = 1_000_000
+BATCH_SIZE = 1_000
+TOTAL_EVENTS = 100_000
+
+# Metrics where a larger value is a regression (see run_benchmarks.py).
+LOWER_IS_BETTER = ["*_seconds"]
+
+
+def _generation_rate():
+    start = time.perf_counter()
+    for _ in range(TOTAL_EVENTS // BATCH_SIZE):
+        event_generator.generate_clickstream_events(BATCH_SIZE)
+    return TOTAL_EVENTS / (time.perf_counter() - start)
+
+
+def run():
+    """Returns load times, samples/sec and events/sec with the built-in and a 100k-SKU catalog."""
+    default_catalog = catalog.get_catalog()
+    results = {"batch_builtin_events_per_sec": _generation_rate()}
+    big = Catalog.synthetic(NUM_PRODUCTS)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "products.csv")
+        big.to_csv(path)
+        start = time.perf_counter()
+        big = Catalog.load(path)
+        results["csv_load_seconds"] = time.perf_counter() - start
+
+    u = np.random.default_rng(0).random(SAMPLES)
+    start = time.perf_counter()
+    big.sample(u)
+    results["sample_vectorized_per_sec"] = SAMPLES / (time.perf_counter() - start)
+    draws = u[:SAMPLES // 10].tolist()
+    start = time.perf_counter()
+    for value in draws:
+        big.sample_one(value)
+    results["sample_one_per_sec"] = len(draws) / (time.perf_counter() - start)
+
+    catalog.set_catalog(big)
+    try:
+        results[f"batch_{NUM_PRODUCTS}_skus_events_per_sec"] = _generation_rate()
+    finally:
+        catalog.set_catalog(default_catalog)
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:>36}: {value:>14,.3f}" if name.endswith("_seconds") else f"{name:>36}: {value:>14,.0f}")
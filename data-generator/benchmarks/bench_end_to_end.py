@@ -0,0 +1,48 @@
+# data_generator/benchmarks/bench_end_to_end.py
+#
+# Throughput of the full generator loop (rate controller -> batch generation ->
+# sink) with an unreachable target rate, so the loop runs flat out. Event Hubs
+# sinks use a fake producer; file sinks write to a temporary directory.
+# Run from the data-generator directory:  python benchmarks/bench_end_to_end.py
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config
+from src.event_generator import generate_clickstream_events
+from src.fake_producer import FakeEventHubProducer
+from src.rate_controller import ConstantProfile, RateController
+from src.sinks import EventHubSink, NdjsonFileSink
+
+TOTAL_EVENTS = 100_000
+
+
+def _loop_rate(sink):
+    rate_controller = RateController(ConstantProfile(10**9), log_reports=False)
+    sent = 0
+    start = time.perf_counter()
+    while sent < TOTAL_EVENTS:
+        sent += sink.publish_events(generate_clickstream_events(rate_controller.acquire()))
+    sink.close()
+    return sent / (time.perf_counter() - start)
+
+
+def run():
+    """Returns end-to-end events/sec per sink, with MAX_EVENTS_PER_BATCH-sized batches."""
+    results = {
+        "eventhub_single": _loop_rate(EventHubSink(producer=FakeEventHubProducer(), packed=False)),
+        "eventhub_packed": _loop_rate(EventHubSink(producer=FakeEventHubProducer(), packed=True)),
+    }
+    with tempfile.TemporaryDirectory() as output_dir:
+        results["ndjson"] = _loop_rate(NdjsonFileSink(output_dir=output_dir))
+    return results
+
+
+if __name__ == "__main__":
+    print(f"Batches of up to {config.MAX_EVENTS_PER_BATCH} events")
+    for name, value in run().items():
+        print(f"{name:>28}: {value:>12,.0f} events/sec")
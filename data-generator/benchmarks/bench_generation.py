@@ -0,0 +1,80 @@
+# data_generator/benchmarks/bench_generation.py
+#
+# Compares the per-event generator with the vectorized batch API, and measures
+# the weighted choice helper and session store memory.
+# Run from the data-generator directory:  python benchmarks/bench_generation.py
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src import event_generator
+from src.session_store import SessionStore
+
+TOTAL_EVENTS = 200_000
+BATCH_SIZES = [75, 1_000, 10_000]
+SESSION_COUNTS = [10_000, 100_000, 1_000_000]
+WEIGHTED_CHOICES = 200_000
+
+# Metrics where a larger value is a regression (see run_benchmarks.py).
+LOWER_IS_BETTER = ["bytes_per_session_*"]
+
+
+def _rate(fn, total):
+    start = time.perf_counter()
+    fn(total)
+    return total / (time.perf_counter() - start)
+
+
+def _single(total):
+    for _ in range(total):
+        event_generator.generate_clickstream_event()
+
+
+def _batched(batch_size):
+    def run(total):
+        for _ in range(total // batch_size):
+            event_generator.generate_clickstream_events(batch_size)
+    return run
+
+
+def _weighted_choice(total):
+    for _ in range(total):
+        event_generator._choose_from_weighted_dict(event_generator.config.REFERRAL_SOURCES)
+
+
+def _memory_per_session(num_users):
+    """Resident bytes per session in a store holding `num_users` sessions."""
+    store = SessionStore()
+    store.allocate_many(np.arange(num_users, dtype=np.uint32))
+    return store.resident_bytes() / num_users
+
+
+def run():
+    """
+    Returns events/sec for the per-event path and each batch size, weighted
+    choices/sec and bytes per session.
+    """
+    results = {"single": _rate(_single, TOTAL_EVENTS)}
+    for batch_size in BATCH_SIZES:
+        results[f"batch_{batch_size}"] = _rate(_batched(batch_size), TOTAL_EVENTS)
+    results["weighted_choice"] = _rate(_weighted_choice, WEIGHTED_CHOICES)
+    for num_users in SESSION_COUNTS:
+        results[f"bytes_per_session_{num_users}"] = _memory_per_session(num_users)
+    return results
+
+
+if __name__ == "__main__":
+    results = run()
+    baseline = results["single"]
+    for name, value in results.items():
+        if name.startswith("bytes_per_session"):
+            print(f"{name:>28}: {value:>12,.1f} bytes")
+        elif name == "weighted_choice":
+            print(f"{name:>28}: {value:>12,.0f} choices/sec")
+        else:
+            print(f"{name:>28}: {value:>12,.0f} events/sec  ({value / baseline:.1f}x)")
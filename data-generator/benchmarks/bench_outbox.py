@@ -0,0 +1,108 @@
+# data_generator/benchmarks/bench_outbox.py
+#
+# Generator loop against a faulty Event Hubs producer (random failures, stalled
+# sends and a full outage), sending directly through EventHubSink vs. through
+# the disk-backed Outbox. Reports the generation rate the loop sustains, how
+# many events were delivered once the fault cleared, and whether an outbox
+# closed mid-outage redelivers everything after a restart.
+# Run from the data-generator directory:  python benchmarks/bench_outbox.py
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.event_generator import generate_clickstream_events
+from src.fake_producer import FakeEventHubProducer
+from src.outbox import Outbox
+from src.sinks import EventHubSink
+
+TOTAL_EVENTS = 50_000
+BATCH_SIZE = 500
+FAULTS = {
+    "flaky": dict(failure_rate=0.2, seed=1),                        # throttling: 1 in 5 sends fails
+    "stalls": dict(stall_rate=0.1, stall_seconds=0.2, seed=1),     # 1 in 10 sends hangs for 200 ms
+    "outage": dict(),                                              # every send fails for OUTAGE_SECONDS
+}
+OUTAGE_SECONDS = 1.0
+
+# Metrics where a larger value is a regression (see run_benchmarks.py).
+LOWER_IS_BETTER = ["*_lost_events", "*_drain_seconds"]
+
+
+def _producer(fault):
+    producer = FakeEventHubProducer(**FAULTS[fault])
+    if fault == "outage":
+        producer.fail_for(OUTAGE_SECONDS)
+    return producer
+
+
+def _direct(batches, fault):
+    """Blocking sends; a failed batch is lost (generate_data would stop)."""
+    producer = _producer(fault)
+    sink = EventHubSink(producer=producer, packed=False)
+    start = time.perf_counter()
+    for events in batches:
+        try:
+            sink.publish_events(events)
+        except Exception:
+            pass
+    return TOTAL_EVENTS / (time.perf_counter() - start), producer.sent_events
+
+
+def _outbox(batches, fault, directory):
+    producer = _producer(fault)
+    outbox = Outbox(EventHubSink(producer=producer, packed=False), directory=directory,
+                    max_memory_events=10 * BATCH_SIZE, retry_base_seconds=0.01, retry_max_seconds=0.2)
+    start = time.perf_counter()
+    for events in batches:
+        outbox.publish_events(events)
+    generated = time.perf_counter() - start
+    outbox.flush()
+    drained = time.perf_counter() - start
+    outbox.close()
+    return TOTAL_EVENTS / generated, producer.sent_events, drained
+
+
+def _restart(batches, directory):
+    """Closes an outbox mid-outage, then drains its log with a healthy producer."""
+    outbox = Outbox(EventHubSink(producer=_producer("outage"), packed=False), directory=directory,
+                    max_memory_events=10 * BATCH_SIZE, drain_timeout_seconds=0)
+    for events in batches:
+        outbox.publish_events(events)
+    outbox.close()
+    producer = FakeEventHubProducer()
+    outbox = Outbox(EventHubSink(producer=producer, packed=False), directory=directory)
+    outbox.flush()
+    outbox.close()
+    return producer.sent_events
+
+
+def run():
+    """Returns generation events/sec and delivered events, direct vs. outbox, per fault."""
+    batches = [generate_clickstream_events(BATCH_SIZE) for _ in range(TOTAL_EVENTS // BATCH_SIZE)]
+    results = {}
+    for fault in FAULTS:
+        rate, sent = _direct(batches, fault)
+        results[f"direct_{fault}_events_per_sec"] = rate
+        results[f"direct_{fault}_lost_events"] = TOTAL_EVENTS - sent
+        with tempfile.TemporaryDirectory() as directory:
+            rate, sent, drained = _outbox(batches, fault, directory)
+        results[f"outbox_{fault}_events_per_sec"] = rate
+        results[f"outbox_{fault}_lost_events"] = max(0, TOTAL_EVENTS - sent)
+        results[f"outbox_{fault}_drain_seconds"] = drained
+    with tempfile.TemporaryDirectory() as directory:
+        results["outbox_restart_lost_events"] = max(0, TOTAL_EVENTS - _restart(batches, directory))
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        if name.endswith("_seconds"):
+            print(f"{name:>34}: {value:>12.2f} s")
+        elif name.endswith("_per_sec"):
+            print(f"{name:>34}: {value:>12,.0f} events/sec")
+        else:
+            print(f"{name:>34}: {value:>12,}")
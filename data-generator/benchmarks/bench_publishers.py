@@ -0,0 +1,66 @@
+# data_generator/benchmarks/bench_publishers.py
+#
+# Throughput of the blocking EventHubPublisher vs. the pipelined
+# AsyncEventHubPublisher against fake producers with a simulated send latency.
+# Run from the data-generator directory:  python benchmarks/bench_publishers.py
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.async_eventhub_publisher import AsyncEventHubPublisher
+from src.event_generator import generate_clickstream_events
+from src.eventhub_publisher import EventHubPublisher
+from src.fake_producer import FakeAsyncEventHubProducer, FakeEventHubProducer
+
+TOTAL_EVENTS = 50_000
+BATCH_SIZE = 500
+SEND_LATENCIES = [0.0, 0.005, 0.020]
+
+# Metrics where a larger value is a regression (see run_benchmarks.py).
+LOWER_IS_BETTER = ["*_avg_send_latency"]
+
+
+def _sync_rate(batches, latency):
+    producer = FakeEventHubProducer(send_latency_seconds=latency)
+    publisher = EventHubPublisher(producer=producer)
+    start = time.perf_counter()
+    for events in batches:
+        publisher.publish_events(events)
+    return producer.sent_events / (time.perf_counter() - start)
+
+
+async def _async_rate(batches, latency):
+    producer = FakeAsyncEventHubProducer(send_latency_seconds=latency)
+    publisher = AsyncEventHubPublisher(producer=producer, max_batch_events=BATCH_SIZE)
+    await publisher.start()
+    start = time.perf_counter()
+    for events in batches:
+        await publisher.publish_events(events)
+    await publisher.flush()
+    elapsed = time.perf_counter() - start
+    stats = publisher.stats()
+    await publisher.close()
+    return producer.sent_events / elapsed, stats["avg_send_latency_seconds"]
+
+
+def run():
+    """Returns events/sec for both publishers at each simulated send latency."""
+    batches = [generate_clickstream_events(BATCH_SIZE) for _ in range(TOTAL_EVENTS // BATCH_SIZE)]
+    results = {}
+    for latency in SEND_LATENCIES:
+        label = f"{latency * 1000:.0f}ms"
+        results[f"sync_{label}"] = _sync_rate(batches, latency)
+        results[f"async_{label}"], results[f"async_{label}_avg_send_latency"] = asyncio.run(_async_rate(batches, latency))
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        if name.endswith("avg_send_latency"):
+            print(f"{name:>32}: {value * 1000:>10.1f} ms")
+        else:
+            print(f"{name:>32}: {value:>10,.0f} events/sec")
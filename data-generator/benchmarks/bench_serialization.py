@@ -0,0 +1,100 @@
+# data_generator/benchmarks/bench_serialization.py
+#
+# Encoder speed and bytes/event (json vs. orjson vs. the binary wire format),
+# the cost of filling an EventDataBatch, EventHubPublisher throughput in
+# bytes/sec and messages/sec with one event per EventData vs. packed messages,
+# for JSON and binary bodies, and the encoded event size with full product
+# details vs. PRODUCT_PAYLOAD = "ids".
+# Run from the data-generator directory:  python benchmarks/bench_serialization.py
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config, serializer, wire_format
+from src.event_generator import generate_clickstream_events
+from src.eventhub_publisher import EventHubPublisher
+from src.fake_producer import FakeEventHubProducer
+
+TOTAL_EVENTS = 100_000
+BATCH_SIZE = 1_000
+
+# Metrics where a larger value is a regression.
+LOWER_IS_BETTER = ["*_bytes_per_event"]
+
+
+def _encode_rate(encode, events):
+    start = time.perf_counter()
+    total_bytes = sum(len(encode(event)) for event in events)
+    elapsed = time.perf_counter() - start
+    return len(events) / elapsed, total_bytes / elapsed
+
+
+def _batch_build_rate(payloads):
+    """Events/sec wrapped in EventData and added to EventDataBatches (no sending)."""
+    from azure.eventhub import EventDataBatch
+    tracker = serializer.BatchSizeTracker(1024 * 1024)
+    start = time.perf_counter()
+    batch = EventDataBatch(max_size_in_bytes=tracker.max_size_in_bytes)
+    for payload in payloads:
+        if not tracker.fits(len(payload)):
+            batch = EventDataBatch(max_size_in_bytes=tracker.max_size_in_bytes)
+            tracker.reset()
+        batch.add(serializer.make_event_data(payload))
+        tracker.add(len(payload))
+    return len(payloads) / (time.perf_counter() - start)
+
+
+def _publish(batches, packed, encoding):
+    producer = FakeEventHubProducer()
+    publisher = EventHubPublisher(producer=producer, packed=packed, encoding=encoding)
+    start = time.perf_counter()
+    for events in batches:
+        publisher.publish_events(events)
+    elapsed = time.perf_counter() - start
+    return {
+        "events_per_sec": sum(len(events) for events in batches) / elapsed,
+        "messages_per_sec": producer.sent_events / elapsed,
+        "bytes_per_sec": producer.sent_bytes / elapsed,
+        "batches": producer.sent_batches,
+    }
+
+
+def _payload_bytes(payload):
+    """Mean encoded size of a generated event with the given PRODUCT_PAYLOAD."""
+    default_payload, config.PRODUCT_PAYLOAD = config.PRODUCT_PAYLOAD, payload
+    try:
+        events = generate_clickstream_events(TOTAL_EVENTS // 10)
+    finally:
+        config.PRODUCT_PAYLOAD = default_payload
+    return sum(len(serializer.encode_event(event)) for event in events) / len(events)
+
+
+def run():
+    """Returns encoder rates, per-mode publish throughput and payload sizes."""
+    batches = [generate_clickstream_events(BATCH_SIZE) for _ in range(TOTAL_EVENTS // BATCH_SIZE)]
+    events = [event for batch in batches for event in batch]
+    results = {}
+    results["json_events_per_sec"], results["json_bytes_per_sec"] = _encode_rate(
+        lambda event: json.dumps(event).encode("utf-8"), events)
+    if serializer.orjson is not None:
+        results["orjson_events_per_sec"], results["orjson_bytes_per_sec"] = _encode_rate(serializer.encode_event, events)
+    results["binary_events_per_sec"], results["binary_bytes_per_sec"] = _encode_rate(wire_format.encode_framed, events)
+    results["json_bytes_per_event"] = sum(len(serializer.encode_event(event)) for event in events) / len(events)
+    results["binary_bytes_per_event"] = sum(len(wire_format.encode_framed(event)) for event in events) / len(events)
+    results["batch_build_events_per_sec"] = _batch_build_rate([serializer.encode_event(event) for event in events])
+    for mode, packed, encoding in (("single", False, "json"), ("packed", True, "json"),
+                                   ("binary_single", False, "binary"), ("binary_packed", True, "binary")):
+        for name, value in _publish(batches, packed, encoding).items():
+            results[f"{mode}_{name}"] = value
+    for payload in ("full", "ids"):
+        results[f"{payload}_payload_bytes_per_event"] = _payload_bytes(payload)
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:>32}: {value:>16,.0f}")
@@ -0,0 +1,133 @@
+# data_generator/benchmarks/run_benchmarks.py
+#
+# Runs the bench_*.py modules, saves their results as JSON and optionally
+# compares them against a baseline run. Everything runs offline: Event Hubs is
+# replaced by the fake producers. Run from the data-generator directory:
+#
+#   python benchmarks/run_benchmarks.py
+#   python benchmarks/run_benchmarks.py --only generation serialization --repeat 3
+#   python benchmarks/run_benchmarks.py --baseline benchmarks/results/<run>.json --threshold 0.10
+#
+# Exits with status 1 when a metric regressed by more than the threshold.
+
+import argparse
+import datetime
+import fnmatch
+import glob
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from src import config, event_generator
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+SEED = 1234
+
+
+def available_benchmarks():
+    return sorted(os.path.basename(path)[len("bench_"):-len(".py")]
+                  for path in glob.glob(os.path.join(BENCH_DIR, "bench_*.py")))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _is_lower_better(metric, lower_is_better):
+    return any(fnmatch.fnmatch(metric, pattern) for pattern in lower_is_better)
+
+
+def run_benchmarks(names, repeat=1):
+    """
+    Runs the named benchmark modules `repeat` times each, keeping the best value
+    of every metric. Returns (results, lower_is_better): metric name
+    ("<module>.<metric>") -> value, and the glob patterns of metrics where a
+    larger value is worse.
+    """
+    results = {}
+    lower_is_better = []
+    for name in names:
+        module = importlib.import_module(f"bench_{name}")
+        lower_is_better += [f"{name}.{pattern}" for pattern in getattr(module, "LOWER_IS_BETTER", [])]
+        for i in range(repeat):
+            # Same users and random streams for every run, so runs are comparable.
+            event_generator.reset_sessions(config.NUM_USERS, seed=SEED)
+            print(f"Running {name} ({i + 1}/{repeat})...")
+            for metric, value in module.run().items():
+                metric = f"{name}.{metric}"
+                best = min if _is_lower_better(metric, lower_is_better) else max
+                results[metric] = best(results[metric], value) if metric in results else value
+    return results, lower_is_better
+
+
+def compare(results, baseline, lower_is_better, threshold):
+    """
+    Prints each metric next to its baseline value. Returns the names of metrics
+    that got worse by more than `threshold` (a fraction).
+    """
+    regressions = []
+    print(f"\n{'metric':<48} {'baseline':>14} {'current':>14} {'change':>8}")
+    for metric, value in results.items():
+        old = baseline.get(metric)
+        if not old:
+            print(f"{metric:<48} {'-':>14} {value:>14,.1f}")
+            continue
+        change = (value - old) / old
+        worse = change if _is_lower_better(metric, lower_is_better) else -change
+        flag = ""
+        if worse > threshold:
+            regressions.append(metric)
+            flag = "  REGRESSION"
+        print(f"{metric:<48} {old:>14,.1f} {value:>14,.1f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the data generator benchmarks.")
+    parser.add_argument("--only", nargs="+", choices=available_benchmarks(), help="Benchmarks to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per benchmark; the best value is kept")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="Results file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown as a fraction (default: 0.10)")
+    args = parser.parse_args()
+
+    results, lower_is_better = run_benchmarks(args.only or available_benchmarks(), args.repeat)
+    run = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": SEED,
+        "repeat": args.repeat,
+        "lower_is_better": lower_is_better,
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, lower_is_better, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,76 @@
 # data_generator/generate_data.py
 
-import time
-import random
-from src import config
-from src.event_generator import generate_clickstream_event
-from src.eventhub_publisher import EventHubPublisher
+import asyncio
+from src import config, metrics
+from src.event_generator import flush_delayed_events, generate_clickstream_events
+from src.parallel import run_parallel, run_parallel_simulation
+from src.rate_controller import RateController, create_profile
+from src.simulation import run_simulation
+from src.sinks import create_sink
+
+async def main_async():
+    """
+    Generator loop using AsyncEventHubPublisher: batches are handed to the
+    publisher's pipeline and sent in the background while the next ones are made.
+    """
+    from src.async_eventhub_publisher import AsyncEventHubPublisher
+
+    publisher = AsyncEventHubPublisher()
+    await publisher.start()
+    rate_controller = RateController(create_profile())
+    print(f"Starting clickstream data generator (async publisher, {rate_controller.profile}). Press Ctrl+C to stop.")
+    try:
+        while True:
+            num_events_in_batch = await rate_controller.acquire_async()
+            sent_count = await publisher.publish_events(generate_clickstream_events(num_events_in_batch))
+            rate_controller.record(sent_count)
+    finally:
+        try:
+            await publisher.publish_events(flush_delayed_events())
+        except Exception as e:
+            # Keeps a failed send of the held-back events from hiding why the loop stopped.
+            print(f"Could not send the events held back by disorder injection: {e}")
+        await publisher.close()
 
 def main():
     """
     Main function to run the clickstream data generator.
     """
+    if config.NUM_WORKERS > 1:
+        # each worker starts its own metrics outputs
+        if config.SIMULATION_MODE:
+            run_parallel_simulation()
+        else:
+            run_parallel()
+        return
+    metrics.start()
+    if config.SIMULATION_MODE:
+        try:
+            run_simulation()
+        except KeyboardInterrupt:
+            print("\nStopping simulation gracefully...")
+        return
+    if config.USE_ASYNC_PUBLISHER:
+        try:
+            asyncio.run(main_async())
+        except KeyboardInterrupt:
+            print("\nStopping data generator gracefully...")
+        return
+
     publisher = None
     try:
-        publisher = EventHubPublisher()
-        print("Starting clickstream data generator. Press Ctrl+C to stop.")
+        publisher = create_sink()
+        # Sizes each batch so the achieved rate follows the traffic profile,
+        # including the time spent generating and sending.
+        rate_controller = RateController(create_profile())
+        outbox = " via outbox" if config.USE_OUTBOX and config.SINK == "eventhub" else ""
+        print(f"Starting clickstream data generator ({config.SINK} sink{outbox}, {rate_controller.profile}). Press Ctrl+C to stop.")
 
         while True:
-            events_to_send = []
-            num_events_in_batch = random.randint(1, config.MAX_EVENTS_PER_BATCH)
-            for _ in range(num_events_in_batch):
-                event = generate_clickstream_event()
-                events_to_send.append(event)
-                # print(events_to_send)
-
-            if events_to_send:
-                sent_count = publisher.publish_events(events_to_send)
-                print(f"Sent {sent_count} events.")
-
-            time.sleep(config.SLEEP_INTERVAL_SECONDS)
+            num_events_in_batch = rate_controller.acquire()
+            events_to_send = generate_clickstream_events(num_events_in_batch)
+            sent_count = publisher.publish_events(events_to_send)
+            rate_controller.record(sent_count)
 
     except KeyboardInterrupt:
         print("\nStopping data generator gracefully...")
@@ -35,6 +78,10 @@ def main():
         print(f"An unexpected error occurred: {e}")
     finally:
         if publisher:
+            try:
+                publisher.publish_events(flush_delayed_events())
+            except Exception as e:
+                print(f"Could not send the events held back by disorder injection: {e}")
             publisher.close()
 
 if __name__ == "__main__":
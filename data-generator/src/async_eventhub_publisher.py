@@ -0,0 +1,252 @@
+# data_generator/src/async_eventhub_publisher.py
+
+import asyncio
+import time
+import zlib
+from src import config
+from src import serializer
+from src.serializer import BatchSizeTracker, get_encoder, make_event_data
+
+
+class AsyncEventHubPublisher:
+    """
+    Pipelined, partition-aware Event Hubs publisher built on azure.eventhub.aio.
+
+    Events are routed to a partition by hashing their partition key field
+    (`session_id` by default), so every event of a session lands on the same
+    partition, in order. Each partition has its own buffer, which is flushed into
+    the partition's send queue once it holds `max_batch_events` events or has
+    waited `linger_seconds`. Every partition has one sender task, so a
+    partition's batches go out one at a time and in order; up to
+    `max_in_flight` partitions send concurrently, so several batches are on the
+    wire at once instead of one round trip per batch. Queues are bounded: when
+    senders fall behind, publish() waits (back-pressure) instead of buffering
+    without limit.
+
+    A failed send is retried `send_retries` times with exponential backoff. If
+    it still fails, its events are counted in stats()["failed_events"] and the
+    error is raised from the next publish(), flush() or close().
+
+    Usage:
+        publisher = AsyncEventHubPublisher()
+        await publisher.start()
+        await publisher.publish_events(events)
+        await publisher.close()
+    """
+    def __init__(self, producer=None, partition_key_field=None, max_in_flight=None,
+                 max_batch_events=None, linger_seconds=None, max_queued_batches=None, encoding=None,
+                 send_retries=None, retry_base_seconds=None):
+        """
+        Args:
+            producer: An azure.eventhub.aio.EventHubProducerClient (or a fake with
+                the same API). Created from config when omitted.
+            partition_key_field (str): Event field used for routing ("session_id" or "user_id").
+            max_in_flight (int): Number of batches being sent concurrently.
+            max_batch_events (int): Flush a partition buffer at this many events.
+            linger_seconds (float): Flush a partition buffer after this long.
+            max_queued_batches (int): Bound of each partition's send queue.
+            encoding (str): "json" or "binary" message bodies (default: config.EVENT_ENCODING).
+            send_retries (int): Retries of a failed send before its events count as failed.
+            retry_base_seconds (float): Delay before the first retry, doubled per attempt.
+        """
+        if producer is None:
+            if not config.EVENTHUB_CONNECTION_STR or not config.EVENTHUB_NAME:
+                raise ValueError("Event Hubs connection string or name not configured. Check .env and src/config.py")
+            from azure.eventhub.aio import EventHubProducerClient
+            producer = EventHubProducerClient.from_connection_string(
+                conn_str=config.EVENTHUB_CONNECTION_STR,
+                eventhub_name=config.EVENTHUB_NAME
+            )
+        self.producer = producer
+        self.partition_key_field = partition_key_field or config.ASYNC_PARTITION_KEY_FIELD
+        self.max_in_flight = max_in_flight or config.ASYNC_MAX_IN_FLIGHT
+        self.max_batch_events = max_batch_events or config.ASYNC_MAX_BATCH_EVENTS
+        self.linger_seconds = linger_seconds if linger_seconds is not None else config.ASYNC_LINGER_SECONDS
+        self.max_queued_batches = max_queued_batches or self.max_in_flight * 2
+        self.encoding = encoding or config.EVENT_ENCODING
+        self._encode = get_encoder(self.encoding)
+        self.send_retries = config.ASYNC_SEND_RETRIES if send_retries is None else send_retries
+        self.retry_base_seconds = (config.ASYNC_RETRY_BASE_SECONDS if retry_base_seconds is None
+                                   else retry_base_seconds)
+
+        self._partition_ids = []
+        self._buffers = {}         # partition_id -> [serialized events]
+        self._buffer_started = {}  # partition_id -> monotonic time of first buffered event
+        self._queues = {}          # partition_id -> asyncio.Queue of payload lists
+        self._flush_locks = {}     # partition_id -> asyncio.Lock held from taking a buffer to queueing it
+        self._in_flight = None     # asyncio.Semaphore(max_in_flight)
+        self._tasks = []
+        self._size_tracker = None
+        self._error = None         # first send failure not yet raised to the caller
+
+        self.sent_events = 0
+        self.sent_batches = 0
+        self.failed_events = 0
+        self.failed_batches = 0
+        self.retried_sends = 0
+        self.oversize_splits = 0
+        self.send_latency_total = 0.0
+        self.send_latency_max = 0.0
+
+    async def start(self):
+        """Looks up the partitions and starts the sender and linger tasks."""
+        self._partition_ids = list(await self.producer.get_partition_ids())
+        self._buffers = {pid: [] for pid in self._partition_ids}
+        self._queues = {pid: asyncio.Queue(maxsize=self.max_queued_batches) for pid in self._partition_ids}
+        self._flush_locks = {pid: asyncio.Lock() for pid in self._partition_ids}
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._tasks = [asyncio.create_task(self._sender(pid)) for pid in self._partition_ids]
+        self._tasks.append(asyncio.create_task(self._linger()))
+
+    def _partition_for(self, event):
+        key = str(event.get(self.partition_key_field, ""))
+        return self._partition_ids[zlib.crc32(key.encode("utf-8")) % len(self._partition_ids)]
+
+    def _raise_send_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    async def publish(self, event):
+        """Buffers one event; waits if the partition's send queue is full."""
+        self._raise_send_error()
+        partition_id = self._partition_for(event)
+        buffer = self._buffers[partition_id]
+        if not buffer:
+            self._buffer_started[partition_id] = time.monotonic()
+        started = time.perf_counter()
+        payload = self._encode(event)
+        serializer.SERIALIZE_SECONDS.observe(time.perf_counter() - started)
+        serializer.SERIALIZED_BYTES.inc(len(payload))
+        buffer.append(payload)
+        if len(buffer) >= self.max_batch_events:
+            await self._flush_partition(partition_id)
+
+    async def publish_events(self, events):
+        """Buffers a list of events. Returns the number of events accepted."""
+        for event in events:
+            await self.publish(event)
+        serializer.EVENTS_PUBLISHED.inc(len(events))
+        return len(events)
+
+    async def _flush_partition(self, partition_id):
+        # publish() and _linger() both flush. While one waits on a full queue, a slot freed by the
+        # sender could go to the other's later buffer first; the lock keeps buffers in queue order.
+        async with self._flush_locks[partition_id]:
+            buffer = self._buffers[partition_id]
+            if buffer:
+                self._buffers[partition_id] = []
+                await self._queues[partition_id].put(buffer)
+
+    async def flush(self):
+        """
+        Sends everything buffered so far and waits until it has been delivered.
+        Raises the first send failure since the last check.
+        """
+        for partition_id in self._partition_ids:
+            await self._flush_partition(partition_id)
+        for queue in self._queues.values():
+            await queue.join()
+        self._raise_send_error()
+
+    async def _linger(self):
+        """Flushes partition buffers that have waited longer than linger_seconds."""
+        while True:
+            await asyncio.sleep(self.linger_seconds / 2 or 0.001)
+            now = time.monotonic()
+            for partition_id, buffer in self._buffers.items():
+                if buffer and now - self._buffer_started[partition_id] >= self.linger_seconds:
+                    await self._flush_partition(partition_id)
+
+    async def _sender(self, partition_id):
+        """Sends one partition's batches, one at a time, in the order they were queued."""
+        queue = self._queues[partition_id]
+        while True:
+            payloads = await queue.get()
+            try:
+                async with self._in_flight:
+                    await self._send(partition_id, payloads)
+            finally:
+                queue.task_done()
+
+    async def _send(self, partition_id, payloads):
+        sent = 0
+        try:
+            batch = await self.producer.create_batch(partition_id=partition_id)
+            if self._size_tracker is None:
+                self._size_tracker = BatchSizeTracker(batch.max_size_in_bytes, encoding=self.encoding)
+            tracker = self._size_tracker
+            tracker.reset()
+            build_started = time.perf_counter()
+            for payload in payloads:
+                if not tracker.fits(len(payload)):
+                    # Batch full: send what we have and continue in a new one
+                    await self._send_batch(batch, build_started)
+                    sent += len(batch)
+                    self.oversize_splits += 1
+                    serializer.BATCH_SPLITS.inc()
+                    batch = await self.producer.create_batch(partition_id=partition_id)
+                    tracker.reset()
+                    build_started = time.perf_counter()
+                batch.add(make_event_data(payload, encoding=self.encoding))
+                tracker.add(len(payload))
+            await self._send_batch(batch, build_started)
+        except Exception as e:
+            self.failed_batches += 1
+            self.failed_events += len(payloads) - sent
+            print(f"Error sending batch to partition {partition_id}, {len(payloads) - sent} events lost: {e}")
+            if self._error is None:
+                self._error = e
+
+    async def _send_batch(self, batch, build_started):
+        """Sends one filled batch, retrying failures with exponential backoff."""
+        serializer.BATCH_BUILD_SECONDS.observe(time.perf_counter() - build_started)
+        serializer.BATCH_FILL_RATIO.observe(self._size_tracker.fill_ratio())
+        for attempt in range(self.send_retries + 1):
+            start = time.monotonic()
+            try:
+                await self.producer.send_batch(batch)
+                break
+            except Exception:
+                if attempt == self.send_retries:
+                    raise
+                self.retried_sends += 1
+                await asyncio.sleep(self.retry_base_seconds * 2 ** attempt)
+        latency = time.monotonic() - start
+        serializer.SEND_BATCH_SECONDS.observe(latency)
+        serializer.BATCHES_SENT.inc()
+        serializer.MESSAGES_SENT.inc(len(batch))
+        self.sent_batches += 1
+        self.sent_events += len(batch)
+        self.send_latency_total += latency
+        self.send_latency_max = max(self.send_latency_max, latency)
+
+    def stats(self):
+        """Counters for monitoring and benchmarks."""
+        return {
+            "sent_events": self.sent_events,
+            "sent_batches": self.sent_batches,
+            "failed_events": self.failed_events,
+            "failed_batches": self.failed_batches,
+            "retried_sends": self.retried_sends,
+            "oversize_splits": self.oversize_splits,
+            "queued_batches": sum(queue.qsize() for queue in self._queues.values()),
+            "avg_send_latency_seconds": self.send_latency_total / self.sent_batches if self.sent_batches else 0.0,
+            "max_send_latency_seconds": self.send_latency_max,
+        }
+
+    async def close(self):
+        """
+        Flushes outstanding events, stops the background tasks and closes the
+        producer. Raises the first send failure not reported yet.
+        """
+        try:
+            if self._queues:
+                await self.flush()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+            await self.producer.close()
+            print("Async Event Hub Producer closed.")
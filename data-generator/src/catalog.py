@@ -0,0 +1,213 @@
+# data_generator/src/catalog.py
+
+import bisect
+import csv
+import os
+import numpy as np
+from src import config
+
+CATALOG_COLUMNS = ["id", "name", "brand", "price", "category", "stock", "popularity"]
+
+
+class Catalog:
+    """
+    Product catalog in a column layout, indexed by product index 0..n-1.
+
+    Strings that repeat (brands, categories) are dictionary-encoded: a small
+    vocabulary list plus an int32 code per product. Every per-product lookup on
+    the generator hot path is a list or array index; the id -> index map is
+    only built when first used.
+
+    Products are sampled in proportion to `popularity`, through cumulative
+    weights computed once. When a source has no popularity column, weights
+    reproduce the original behaviour: pick a category uniformly, then a product
+    in it uniformly.
+    """
+    def __init__(self, ids, names, brands, prices, categories, stock=None, popularity=None):
+        """
+        Args:
+            ids, names, brands, categories (list of str): One entry per product.
+            prices (sequence of float): Unit prices.
+            stock (sequence of int): Optional stock levels.
+            popularity (sequence of float): Optional relative sampling weights.
+        """
+        if not ids:
+            raise ValueError("Catalog has no products.")
+        self.ids = list(ids)
+        self.names = list(names)
+        self.brands, self.brand_codes = _encode(brands)
+        self.categories, self.category_codes = _encode(categories)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.stock = np.asarray(stock, dtype=np.int64) if stock is not None else None
+        if popularity is None:
+            # Category first, then product: every category gets the same total weight.
+            category_sizes = np.bincount(self.category_codes)
+            popularity = 1.0 / (len(self.categories) * category_sizes[self.category_codes])
+        popularity = np.asarray(popularity, dtype=np.float64)
+        if (popularity < 0).any() or popularity.sum() <= 0:
+            raise ValueError("Product popularity must be non-negative and not all zero.")
+        self.cumulative_weights = np.cumsum(popularity)
+        self._cumulative_list = None
+        self._index = None
+        self._page_urls = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Constructors ---
+
+    @classmethod
+    def from_config(cls, products_by_category=None, categories=None):
+        """Builds the catalog from config.PRODUCTS_BY_CATEGORY (in PRODUCT_CATEGORIES order)."""
+        products_by_category = products_by_category or config.PRODUCTS_BY_CATEGORY
+        categories = categories or config.PRODUCT_CATEGORIES
+        rows = [dict(product, category=category) for category in categories for product in products_by_category[category]]
+        return cls.from_rows(rows)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds the catalog from dicts with CATALOG_COLUMNS keys (stock and popularity optional)."""
+        columns = {name: [row.get(name) for row in rows] for name in CATALOG_COLUMNS}
+        return cls._from_columns(columns)
+
+    @classmethod
+    def _from_columns(cls, columns):
+        optional = {name: columns.get(name) for name in ("stock", "popularity")}
+        for name, values in optional.items():
+            if values is None or any(value in (None, "") for value in values):
+                optional[name] = None
+        return cls(
+            columns["id"], columns["name"], columns["brand"],
+            [float(price) for price in columns["price"]], columns["category"],
+            stock=[int(value) for value in optional["stock"]] if optional["stock"] else None,
+            popularity=[float(value) for value in optional["popularity"]] if optional["popularity"] else None,
+        )
+
+    @classmethod
+    def from_csv(cls, path):
+        """Loads a CSV with a header row: id,name,brand,price,category[,stock][,popularity]."""
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            columns = {name: [] for name in reader.fieldnames}
+            for row in reader:
+                for name, value in row.items():
+                    columns[name].append(value)
+        return cls._from_columns(columns)
+
+    @classmethod
+    def from_parquet(cls, path):
+        """Loads a Parquet file with the CSV columns (requires pyarrow)."""
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Loading a Parquet catalog requires pyarrow (pip install pyarrow)") from e
+        table = pq.read_table(path, columns=[c for c in CATALOG_COLUMNS if c in pq.read_schema(path).names])
+        return cls._from_columns(table.to_pydict())
+
+    @classmethod
+    def load(cls, path):
+        """Loads a .csv or .parquet catalog file."""
+        if path.endswith(".parquet"):
+            return cls.from_parquet(path)
+        if path.endswith(".csv"):
+            return cls.from_csv(path)
+        raise ValueError(f"Unsupported catalog file '{path}'. Use .csv or .parquet.")
+
+    @classmethod
+    def synthetic(cls, num_products, num_categories=50, num_brands=500, zipf_exponent=1.1, seed=0):
+        """Generates a catalog of `num_products` SKUs with Zipf-distributed popularity, for scale tests."""
+        rng = np.random.default_rng(seed)
+        category_codes = rng.integers(0, num_categories, size=num_products)
+        brand_codes = rng.integers(0, num_brands, size=num_products)
+        ranks = rng.permutation(num_products) + 1
+        return cls(
+            ids=[f"SKU-{i:08d}" for i in range(num_products)],
+            names=[f"Product {i}" for i in range(num_products)],
+            brands=[f"Brand {b}" for b in brand_codes.tolist()],
+            prices=np.round(rng.lognormal(4.5, 1.0, size=num_products), 2),
+            categories=[f"Category {c}" for c in category_codes.tolist()],
+            popularity=1.0 / ranks ** zipf_exponent,
+        )
+
+    def to_csv(self, path):
+        """Writes the catalog in the format from_csv() reads (popularity as normalized weights)."""
+        weights = np.diff(self.cumulative_weights, prepend=0.0) / self.cumulative_weights[-1]
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(CATALOG_COLUMNS if self.stock is not None else [c for c in CATALOG_COLUMNS if c != "stock"])
+            for i in range(len(self)):
+                row = [self.ids[i], self.names[i], self.brand(i), self.price(i), self.category(i)]
+                if self.stock is not None:
+                    row.append(int(self.stock[i]))
+                row.append(f"{weights[i]:.6g}")
+                writer.writerow(row)
+
+    # --- Lookups ---
+
+    def index_of(self, product_id):
+        """Product index for `product_id` (KeyError if unknown)."""
+        if self._index is None:
+            self._index = {product_id: i for i, product_id in enumerate(self.ids)}
+        return self._index[product_id]
+
+    def brand(self, i):
+        return self.brands[self.brand_codes[i]]
+
+    def category(self, i):
+        return self.categories[self.category_codes[i]]
+
+    def price(self, i):
+        return float(self.prices[i])
+
+    @property
+    def page_urls(self):
+        """Product page URL per product index (built on first use)."""
+        if self._page_urls is None:
+            self._page_urls = [f"/products/{product_id}" for product_id in self.ids]
+        return self._page_urls
+
+    # --- Sampling ---
+
+    def sample(self, u):
+        """Product indices for an array of uniform [0, 1) draws, weighted by popularity."""
+        indices = np.searchsorted(self.cumulative_weights, u * self.cumulative_weights[-1], side="right")
+        return np.minimum(indices, len(self.ids) - 1)
+
+    def sample_one(self, u):
+        """sample() for a single float draw (no NumPy overhead)."""
+        if self._cumulative_list is None:
+            self._cumulative_list = self.cumulative_weights.tolist()
+        return min(bisect.bisect_right(self._cumulative_list, u * self._cumulative_list[-1]), len(self.ids) - 1)
+
+
+def _encode(values):
+    """Dictionary-encodes `values`: returns (vocabulary in first-seen order, int32 codes)."""
+    vocabulary = {}
+    codes = np.fromiter((vocabulary.setdefault(value, len(vocabulary)) for value in values), dtype=np.int32)
+    return list(vocabulary), codes
+
+
+_catalog = None
+
+
+def get_catalog():
+    """
+    The process-wide catalog, loaded on first use from config.CATALOG_PATH (or
+    config.PRODUCTS_BY_CATEGORY when no path is set), so importing the generator
+    stays fast even for large catalog files.
+    """
+    global _catalog
+    if _catalog is None:
+        path = config.CATALOG_PATH
+        if path:
+            _catalog = Catalog.load(os.path.expanduser(path))
+            print(f"Loaded {len(_catalog):,} products from {path}")
+        else:
+            _catalog = Catalog.from_config()
+    return _catalog
+
+
+def set_catalog(catalog):
+    """Replaces the process-wide catalog (e.g. with Catalog.synthetic() in benchmarks)."""
+    global _catalog
+    _catalog = catalog
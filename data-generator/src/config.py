@@ -1,76 +1,119 @@
 # data_generator/src/config.py
 
+import csv
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# --- Event Hubs Configuration ---
+# --- Sink Configuration ---
+SINK = os.environ.get("SINK", "eventhub") # "eventhub", "ndjson" or "parquet"
+
+# --- Event Hubs Configuration (only required for the eventhub sink) ---
 EVENTHUB_CONNECTION_STR = os.environ.get("EVENTHUB_CONNECTION_STR")
 EVENTHUB_NAME = os.environ.get("EVENTHUB_NAME")
+PACK_EVENTS = False # Pack many newline-delimited events into one EventData (bronze explodes them)
+EVENT_ENCODING = os.environ.get("EVENT_ENCODING", "json") # "json" or "binary" (schema-versioned records, see src/wire_format.py and schemas/)
+
+# --- File Sink Configuration ---
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "output/clickstream")
+FILE_COMPRESSION = os.environ.get("FILE_COMPRESSION") or None # ndjson: "gzip"; parquet: "snappy" (default), "zstd", "gzip"
+FILE_ROTATE_BYTES = 128 * 1024 * 1024 # Start a new file after this many bytes...
+FILE_ROTATE_SECONDS = 60 # ...or after this long
+FILE_BUFFER_EVENTS = 10_000 # Events buffered in memory before a bulk write
 
 # --- Simulation Parameters ---
 NUM_USERS = 200 
-MAX_EVENTS_PER_BATCH = 75 
-SLEEP_INTERVAL_SECONDS = 0.3 
+MAX_EVENTS_PER_BATCH = 1000 # Largest batch the rate controller hands out (was 75, the upper bound of a random batch size)
+SLEEP_INTERVAL_SECONDS = 0.3 # Rate controller tick: batches are sized to rate x tick (was a fixed sleep after every batch)
+MAX_ACTIVE_SESSIONS = 1_000_000 # Session store size limit; least recently seen sessions are evicted beyond it
+SESSION_IDLE_TIMEOUT_SECONDS = 30 * 60 # Sessions idle for longer than this are evicted
+
+# --- Traffic Shape ---
+TARGET_EVENTS_PER_SECOND = 1000 # Base rate of the traffic profile, aggregate across all workers
+TRAFFIC_PROFILE = os.environ.get("TRAFFIC_PROFILE", "constant") # "constant", "daily_sine", "step_ramp" or "flash_sale"
+RATE_REPORT_INTERVAL_SECONDS = 5 # How often target vs. achieved rate is reported
+DAILY_SINE_AMPLITUDE = 0.5 # Rate swings between (1 - a) and (1 + a) x the base rate
+DAILY_SINE_PEAK_HOUR = 20 # UTC hour of the daily peak
+DAILY_SINE_PERIOD_SECONDS = 24 * 60 * 60 # Length of one simulated day (shrink to compress a day into a test run)
+STEP_RAMP_STEPS = 5 # Ramp to the base rate in this many equal steps...
+STEP_RAMP_STEP_SECONDS = 60 # ...each held this long
+FLASH_SALE_MULTIPLIER = 10 # Burst rate as a multiple of the base rate
+FLASH_SALE_START_SECONDS = 300 # Burst starts this long into the run...
+FLASH_SALE_DURATION_SECONDS = 120 # ...and lasts this long
+FLASH_SALE_PERIOD_SECONDS = None # Repeat the burst every this many seconds (None: once)
+
+# --- Simulation Mode (event-time backfill; see src/simulation.py) ---
+SIMULATION_MODE = os.environ.get("SIMULATION_MODE", "").lower() in ("1", "true", "yes") # Generate on a virtual clock, as fast as possible
+SIM_SEED = 42 # Same seed, same event stream
+SIM_START = "2024-01-01T00:00:00" # Event time of the first simulated event (UTC)
+SIM_DURATION_SECONDS = 7 * 24 * 60 * 60 # Event time to cover
+SIM_EVENTS_PER_SECOND = 5 # Base event-time rate of the traffic profile; with NUM_USERS this sets the gaps between a user's events
+SIM_BATCH_SIZE = 10_000 # Events generated per batch
+
+# --- Disorder Injection (late, out-of-order and duplicate delivery; see src/disorder.py) ---
+DISORDER_DELAY = os.environ.get("DISORDER_DELAY", "none") # Delivery delay distribution: "none", "exponential", "lognormal" or "pareto"
+DISORDER_DELAY_SECONDS = 30 # Mean (exponential), median (lognormal) or scale (pareto) of the delay, in event time
+DISORDER_DELAY_SIGMA = 1.0 # lognormal shape
+DISORDER_PARETO_ALPHA = 1.5 # pareto tail index (smaller: heavier tail)
+DISORDER_LATE_FRACTION = 1.0 # Share of events delayed at all
+DISORDER_DUPLICATE_RATE = float(os.environ.get("DISORDER_DUPLICATE_RATE", 0)) # Share of events delivered a second time
+DISORDER_PARTITIONS = 4 # Sessions are hashed to this many partitions for partition drops...
+DISORDER_PARTITION_DROP_INTERVAL_SECONDS = 0 # ...one of which is dropped on average this often in event time (0: off)...
+DISORDER_PARTITION_DROP_SECONDS = 10 * 60 # ...holding its events back this long, then replaying them at once
+
+# --- Parallel Generation ---
+NUM_WORKERS = 1 # >1 splits NUM_USERS and the target (or simulated) rate across this many worker processes
+WORKER_STATS_INTERVAL_SECONDS = 5 # How often workers report throughput to the coordinator
+
+# --- Async Publisher ---
+USE_ASYNC_PUBLISHER = False # Publish through AsyncEventHubPublisher (pipelined sends)
+ASYNC_PARTITION_KEY_FIELD = "session_id" # Events with the same value land on the same partition
+ASYNC_MAX_IN_FLIGHT = 4 # Batches being sent concurrently (one per partition at a time, so a partition's batches stay in order)
+ASYNC_MAX_BATCH_EVENTS = 500 # Flush a partition buffer at this many events...
+ASYNC_LINGER_SECONDS = 0.05 # ...or after this long, whichever comes first
+ASYNC_SEND_RETRIES = 3 # Retries of a failed send (exponential backoff) before its events count as failed...
+ASYNC_RETRY_BASE_SECONDS = 0.1 # ...starting at this delay
+
+# --- Outbox (see src/outbox.py) ---
+USE_OUTBOX = os.environ.get("USE_OUTBOX", "").lower() in ("1", "true", "yes") # Queue Event Hubs sends behind a disk-backed outbox so send stalls and errors never stop generation
+OUTBOX_DIR = os.environ.get("OUTBOX_DIR", "outbox") # Segment log and ack checkpoint (parallel workers use <dir>/shard-<n>)
+OUTBOX_MAX_MEMORY_EVENTS = 50_000 # Events queued in memory before batches spill to the segment log (0: log every batch)
+OUTBOX_SEGMENT_BYTES = 64 * 1024 * 1024 # Start a new segment file after this many bytes
+OUTBOX_FSYNC_INTERVAL_SECONDS = 1.0 # fsync the segment log at most this often (0: after every append)
+OUTBOX_RETRY_BASE_SECONDS = 0.1 # Delay before retrying a failed send, doubled per attempt...
+OUTBOX_RETRY_MAX_SECONDS = 30 # ...up to this
+OUTBOX_DRAIN_TIMEOUT_SECONDS = 10 # On shutdown, wait this long for the outbox to drain; the rest stays on disk for the next run
+
+# --- Metrics & Profiling ---
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0)) # Serve Prometheus metrics on http://127.0.0.1:<port>/metrics (0: off; parallel workers use port + 1 + shard)
+METRICS_LOG_INTERVAL_SECONDS = float(os.environ.get("METRICS_LOG_INTERVAL_SECONDS", 0)) # Print all metrics as one JSON line this often (0: off)
+PROFILER_SIGNALS = False # SIGUSR1 toggles cProfile, SIGUSR2 takes tracemalloc snapshots (POSIX only)
+PROFILE_DIR = "profiles" # Where profiler dumps are written
 
 # --- Core Data Lists ---
 PAGES = ["/", "/products", "/about", "/contact", "/cart", "/checkout", "/purchase_success"]
 
-# --- NEW: Product Categories and Specific Products (with Brand & Price) ---
-PRODUCT_CATEGORIES = [
-    "Laptops", "Smartphones", "Headphones", "Monitors",
-    "Keyboards", "Mice", "Speakers", "Cameras", "Wearables"
-]
-
-PRODUCTS_BY_CATEGORY = {
-    "Laptops": [
-        {"id": "LAPTOP-XPS15-2024", "name": "Dell XPS 15 (2024)", "brand": "Dell", "price": 1899.99, "stock": 50},
-        {"id": "LAPTOP-MBOOK-AIR-M3", "name": "MacBook Air M3", "brand": "Apple", "price": 1199.00, "stock": 120},
-        {"id": "LAPTOP-SURFACE-PRO10", "name": "Microsoft Surface Pro 10", "brand": "Microsoft", "price": 1099.00, "stock": 70},
-        {"id": "LAPTOP-ZENBOOK-14", "name": "ASUS ZenBook 14 OLED", "brand": "ASUS", "price": 999.00, "stock": 90},
-        {"id": "LAPTOP-IDEAPAD-GAMING", "name": "Lenovo IdeaPad Gaming 3", "brand": "Lenovo", "price": 849.00, "stock": 60}
-    ],
-    "Smartphones": [
-        {"id": "PHONE-IPHONE15", "name": "iPhone 15 Pro", "brand": "Apple", "price": 999.00, "stock": 200},
-        {"id": "PHONE-SAMSUNG-S24", "name": "Samsung Galaxy S24 Ultra", "brand": "Samsung", "price": 1299.00, "stock": 180},
-        {"id": "PHONE-PIXEL8", "name": "Google Pixel 8 Pro", "brand": "Google", "price": 799.00, "stock": 150},
-        {"id": "PHONE-ONEPLUS-12", "name": "OnePlus 12", "brand": "OnePlus", "price": 799.00, "stock": 100},
-        {"id": "PHONE-XIAOMI-14", "name": "Xiaomi 14 Ultra", "brand": "Xiaomi", "price": 999.00, "stock": 80}
-    ],
-    "Headphones": [
-        {"id": "HP-SONY-WH1000XM5", "name": "Sony WH-1000XM5", "brand": "Sony", "price": 349.00, "stock": 300},
-        {"id": "HP-BOSE-QC45", "name": "Bose QuietComfort 45", "brand": "Bose", "price": 279.00, "stock": 250},
-        {"id": "HP-AIRPODS-MAX", "name": "AirPods Max", "brand": "Apple", "price": 549.00, "stock": 100},
-        {"id": "HP-SENNH-HD660S2", "name": "Sennheiser HD 660S2", "brand": "Sennheiser", "price": 599.00, "stock": 50},
-        {"id": "HP-JBL-TUNE760NC", "name": "JBL Tune 760NC", "brand": "JBL", "price": 129.00, "stock": 400}
-    ],
-    "Monitors": [
-        {"id": "MON-DELL-U2723QE", "name": "Dell UltraSharp U2723QE", "brand": "Dell", "price": 599.00, "stock": 100},
-        {"id": "MON-LG-27GN95R", "name": "LG UltraGear 27GN95R", "brand": "LG", "price": 799.00, "stock": 80},
-        {"id": "MON-SAMSUNG-G9", "name": "Samsung Odyssey G9", "brand": "Samsung", "price": 1299.00, "stock": 40}
-    ],
-    "Keyboards": [
-        {"id": "KB-LOGI-MXKEYS", "name": "Logitech MX Keys S", "brand": "Logitech", "price": 109.00, "stock": 200},
-        {"id": "KB-RAZER-BWV3", "name": "Razer BlackWidow V3", "brand": "Razer", "price": 139.00, "stock": 150}
-    ],
-    "Mice": [
-        {"id": "MOUSE-LOGI-MXMASTER3S", "name": "Logitech MX Master 3S", "brand": "Logitech", "price": 99.00, "stock": 250},
-        {"id": "MOUSE-RAZER-DEATHADDER", "name": "Razer DeathAdder V3", "brand": "Razer", "price": 69.00, "stock": 180}
-    ],
-    "Speakers": [
-        {"id": "SPK-BOSE-SOUNDLINKFLEX", "name": "Bose SoundLink Flex", "brand": "Bose", "price": 149.00, "stock": 120},
-        {"id": "SPK-JBL-FLIP6", "name": "JBL Flip 6", "brand": "JBL", "price": 109.00, "stock": 150}
-    ],
-    "Cameras": [
-        {"id": "CAM-SONY-A7IV", "name": "Sony Alpha a7 IV", "brand": "Sony", "price": 2499.00, "stock": 30},
-        {"id": "CAM-CANON-R6II", "name": "Canon EOS R6 Mark II", "brand": "Canon", "price": 2299.00, "stock": 25}
-    ],
-    "Wearables": [
-        {"id": "WEAR-APPLE-WATCH9", "name": "Apple Watch Series 9", "brand": "Apple", "price": 399.00, "stock": 200},
-        {"id": "WEAR-SAMSUNG-WATCH6", "name": "Samsung Galaxy Watch 6", "brand": "Samsung", "price": 299.00, "stock": 180}
-    ]
-}
+# --- Product Catalog ---
+# CSV/Parquet file with columns id,name,brand,price,category[,stock][,popularity]
+# (see src/catalog.py). When unset, the built-in products from schemas/products.csv are used.
+CATALOG_PATH = os.environ.get("CATALOG_PATH") or None
+PRODUCT_PAYLOAD = os.environ.get("PRODUCT_PAYLOAD", "full") # "full": product names, brands and unit prices on every event; "ids": product ids only (silver enriches them from the catalog)
+
+# --- Product Categories and Specific Products (with Brand & Price) ---
+# Read from schemas/products.csv, which the pipeline's product dimension reads
+# too, so both sides always agree on the built-in catalog.
+PRODUCTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "schemas", "products.csv")
+PRODUCT_CATEGORIES = []
+PRODUCTS_BY_CATEGORY = {}
+with open(PRODUCTS_PATH, newline="", encoding="utf-8") as _f:
+    for _row in csv.DictReader(_f):
+        if _row["category"] not in PRODUCTS_BY_CATEGORY:
+            PRODUCT_CATEGORIES.append(_row["category"])
+            PRODUCTS_BY_CATEGORY[_row["category"]] = []
+        PRODUCTS_BY_CATEGORY[_row["category"]].append({"id": _row["id"], "name": _row["name"], "brand": _row["brand"],
+                                                       "price": float(_row["price"]), "stock": int(_row["stock"])})
 
 
 # --- NEW: Event Types (includes 'checkout') ---
@@ -144,9 +187,6 @@ BROWSER_TYPES = ["Chrome", "Firefox", "Safari", "Edge"]
 OS_TYPES = ["Windows", "macOS", "Linux", "Android", "iOS"]
 
 
-if not EVENTHUB_CONNECTION_STR or not EVENTHUB_NAME:
-    raise ValueError("EVENTHUB_CONNECTION_STR and EVENTHUB_NAME must be set in .env file or as environment variables.")
-
 ALL_PRODUCT_IDS = [p["id"] for category_prods in PRODUCTS_BY_CATEGORY.values() for p in category_prods]
 
 
@@ -0,0 +1,219 @@
+# data_generator/src/disorder.py
+#
+# Late, out-of-order and duplicated delivery of generated events, to measure
+# how the streaming layers' watermarks cope with realistic disorder.
+#
+# Events are generated in order (the Markov state, carts and session rules are
+# untouched); a Disorder only changes when each one is *delivered*. Every event
+# gets an arrival time, its event time plus a delay drawn from DISORDER_DELAY,
+# and is held back until the generator's clock (the latest event time produced)
+# reaches it. On top of that a partition of sessions can be dropped for a while
+# and then replayed all at once, and events can be delivered twice.
+#
+# Delivered events carry their ground truth in TRUTH_COLUMNS:
+#   lateness_ms   how far the latest event time delivered so far is ahead of this
+#                 event's time, i.e. how far behind a watermark it arrives
+#                 (0 for an event delivered in order)
+#   is_duplicate  a second delivery of an event already sent
+#   is_replay     held back by a partition drop
+# Every sink keeps them (version 2 of the binary wire format, the Parquet sink's
+# columns), but bronze parses only the clickstream fields, so they never reach
+# the tables.
+
+import heapq
+import itertools
+import zlib
+import numpy as np
+from src import config
+from src.metrics import REGISTRY
+
+TRUTH_COLUMNS = ["lateness_ms", "is_duplicate", "is_replay"]
+DELAY_DISTRIBUTIONS = ["none", "exponential", "lognormal", "pareto"]
+
+_HELD_EVENTS = REGISTRY.gauge("disorder_held_events", "Generated events held back for late delivery")
+_LATE_EVENTS = REGISTRY.counter("disorder_late_events_total", "Events delivered after a later event time")
+_DUPLICATE_EVENTS = REGISTRY.counter("disorder_duplicate_events_total", "Duplicate deliveries injected")
+_REPLAYED_EVENTS = REGISTRY.counter("disorder_replayed_events_total", "Events held back by a partition drop")
+
+
+def _epoch_micros(timestamps):
+    """Generator timestamps ("2024-01-01T00:00:00.000000Z") as int64 epoch microseconds."""
+    return np.array([ts.rstrip("Z") for ts in timestamps], dtype="datetime64[us]").astype(np.int64)
+
+
+class Disorder:
+    """
+    Reorders generated events by a simulated arrival time.
+
+    Usage:
+        disorder = Disorder(delay="lognormal", delay_seconds=60, duplicate_rate=0.01)
+        delivered = disorder.apply(generate_clickstream_events(1000))  # may hold some back
+        ...
+        delivered = disorder.flush()  # everything still held, at the end of a run
+    """
+    def __init__(self, delay=None, delay_seconds=None, delay_sigma=None, pareto_alpha=None, late_fraction=None,
+                 duplicate_rate=None, partitions=None, partition_drop_interval_seconds=None,
+                 partition_drop_seconds=None, seed=None):
+        """
+        Args:
+            delay (str): Delay distribution, one of DELAY_DISTRIBUTIONS (default: config.DISORDER_DELAY).
+            delay_seconds (float): Mean (exponential), median (lognormal) or scale (pareto) of the delay.
+            delay_sigma (float): lognormal shape (default: config.DISORDER_DELAY_SIGMA).
+            pareto_alpha (float): pareto tail index, smaller is heavier (default: config.DISORDER_PARETO_ALPHA).
+            late_fraction (float): Share of events delayed at all (default: config.DISORDER_LATE_FRACTION).
+            duplicate_rate (float): Share of events delivered twice, the copy after a further delay.
+            partitions (int): Sessions are hashed to this many partitions (by session_id, like the
+                async publisher's partition key).
+            partition_drop_interval_seconds (float): Mean event time between partition drops (0: off).
+            partition_drop_seconds (float): How long a dropped partition's events are held before
+                they are replayed together.
+            seed: Seed or numpy SeedSequence for the random draws; None for a random stream.
+        All defaults come from the DISORDER_* settings in src/config.py.
+        """
+        self.delay = delay or config.DISORDER_DELAY
+        if self.delay not in DELAY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown delay distribution '{self.delay}'. Choose one of: {', '.join(DELAY_DISTRIBUTIONS)}")
+        self.delay_seconds = config.DISORDER_DELAY_SECONDS if delay_seconds is None else delay_seconds
+        self.delay_sigma = config.DISORDER_DELAY_SIGMA if delay_sigma is None else delay_sigma
+        self.pareto_alpha = config.DISORDER_PARETO_ALPHA if pareto_alpha is None else pareto_alpha
+        self.late_fraction = config.DISORDER_LATE_FRACTION if late_fraction is None else late_fraction
+        self.duplicate_rate = config.DISORDER_DUPLICATE_RATE if duplicate_rate is None else duplicate_rate
+        self.partitions = partitions or config.DISORDER_PARTITIONS
+        self.partition_drop_interval_seconds = (config.DISORDER_PARTITION_DROP_INTERVAL_SECONDS
+                                                if partition_drop_interval_seconds is None
+                                                else partition_drop_interval_seconds)
+        self.partition_drop_seconds = (config.DISORDER_PARTITION_DROP_SECONDS if partition_drop_seconds is None
+                                       else partition_drop_seconds)
+        self.rng = np.random.default_rng(seed)
+        self._held = []          # heap of (arrival us, seq, event time us, event, is_duplicate, is_replay)
+        self._seq = itertools.count()
+        self._now = None         # latest event time generated, epoch us
+        self._delivered_max = None  # latest event time delivered, epoch us
+        self._drops = []         # (partition, start us, end us) of partition drops
+        self._next_drop = None
+        self.delivered_events = 0
+        self.late_events = 0
+        self.duplicate_events = 0
+        self.replayed_events = 0
+        _HELD_EVENTS.set_function(lambda: len(self._held))
+
+    @property
+    def enabled(self):
+        """False when the settings leave every event in order (apply() is then a pass-through)."""
+        return (self.delay != "none" and self.late_fraction > 0) or self.duplicate_rate > 0 \
+            or self.partition_drop_interval_seconds > 0
+
+    def _delays(self, n):
+        """`n` delivery delays in microseconds."""
+        if self.delay == "none" or not n:
+            return np.zeros(n, dtype=np.int64)
+        scale = self.delay_seconds * 1_000_000
+        if self.delay == "exponential":
+            delays = self.rng.exponential(scale, n)
+        elif self.delay == "lognormal":
+            delays = scale * self.rng.lognormal(0.0, self.delay_sigma, n)
+        else:  # pareto (Lomax: starts at 0, so most events are only slightly late)
+            delays = scale * self.rng.pareto(self.pareto_alpha, n)
+        if self.late_fraction < 1:
+            delays[self.rng.random(n) >= self.late_fraction] = 0
+        return np.minimum(delays, 2**62).astype(np.int64)
+
+    def _schedule_drops(self, first, now):
+        """Starts the partition drops due up to `now` and returns those that can still affect events."""
+        interval = self.partition_drop_interval_seconds * 1_000_000
+        if self._next_drop is None:
+            self._next_drop = first + int(self.rng.exponential(interval))
+        while self._next_drop <= now:
+            start = self._next_drop
+            self._drops.append((int(self.rng.integers(self.partitions)), start,
+                                start + int(self.partition_drop_seconds * 1_000_000)))
+            self._next_drop = start + max(1, int(self.rng.exponential(interval)))
+        # Generated event times only move forward, so drops that ended are done with.
+        self._drops = [drop for drop in self._drops if drop[2] > first]
+        return self._drops
+
+    def apply(self, events):
+        """
+        Takes a batch of generated events (in event-time order) and returns the
+        events due for delivery once the clock has reached this batch, in
+        arrival order, with TRUTH_COLUMNS filled in.
+        """
+        if not events:
+            return []
+        times = _epoch_micros([event["timestamp"] for event in events])
+        n = len(events)
+        now = int(times.max()) if self._now is None else max(self._now, int(times.max()))
+        self._now = now
+        arrivals = times + self._delays(n)
+
+        replayed = np.zeros(n, dtype=bool)
+        if self.partition_drop_interval_seconds > 0:
+            drops = self._schedule_drops(int(times.min()), now)
+            if drops:
+                partitions = np.array([zlib.crc32(event["session_id"].encode()) % self.partitions
+                                       for event in events])
+                for partition, start, end in drops:
+                    hit = (partitions == partition) & (times >= start) & (times < end)
+                    arrivals[hit] = np.maximum(arrivals[hit], end)
+                    replayed |= hit
+            self.replayed_events += int(replayed.sum())
+            _REPLAYED_EVENTS.inc(int(replayed.sum()))
+
+        held = self._held
+        seq = self._seq
+        for event, event_time, arrival, replay in zip(events, times.tolist(), arrivals.tolist(), replayed.tolist()):
+            heapq.heappush(held, (arrival, next(seq), event_time, event, False, replay))
+        if self.duplicate_rate > 0:
+            copies = np.nonzero(self.rng.random(n) < self.duplicate_rate)[0]
+            for i, extra in zip(copies.tolist(), self._delays(len(copies)).tolist()):
+                heapq.heappush(held, (int(arrivals[i]) + extra, next(seq), int(times[i]), events[i], True,
+                                      bool(replayed[i])))
+            self.duplicate_events += len(copies)
+            _DUPLICATE_EVENTS.inc(len(copies))
+        return self._release(now)
+
+    def flush(self):
+        """Delivers every event still held back (end of a run)."""
+        return self._release(None)
+
+    def _release(self, now):
+        held = self._held
+        delivered = []
+        latest = self._delivered_max
+        late = 0
+        while held and (now is None or held[0][0] <= now):
+            _, _, event_time, event, is_duplicate, is_replay = heapq.heappop(held)
+            if is_duplicate:
+                event = dict(event)
+            if latest is None or event_time > latest:
+                latest = event_time
+            lateness_ms = (latest - event_time) // 1000
+            late += lateness_ms > 0
+            event["lateness_ms"] = lateness_ms
+            event["is_duplicate"] = is_duplicate
+            event["is_replay"] = is_replay
+            delivered.append(event)
+        self._delivered_max = latest
+        self.delivered_events += len(delivered)
+        self.late_events += late
+        _LATE_EVENTS.inc(late)
+        return delivered
+
+    def __len__(self):
+        """Events held back for later delivery."""
+        return len(self._held)
+
+    def stats(self):
+        return {
+            "delivered_events": self.delivered_events,
+            "held_events": len(self._held),
+            "late_events": self.late_events,
+            "duplicate_events": self.duplicate_events,
+            "replayed_events": self.replayed_events,
+        }
+
+
+def create_disorder(seed=None):
+    """Disorder from the DISORDER_* settings, or None when they leave events in order."""
+    disorder = Disorder(seed=seed)
+    return disorder if disorder.enabled else None
@@ -1,100 +1,198 @@
 # data_generator/src/event_generator.py
 
-import uuid
+import collections
 import datetime
 import random
-import json
-from src import config 
-
-user_sessions = {} 
-# {user_id: {
-#    "session_id": "...",
-#    "last_page": "...",
-#    "cart_items": [], # Stores full product objects now
-#    "last_event_type": "START_SESSION", # Initial state for transitions
-#    "current_product_viewed": None, # The product they are currently viewing/interacting with
-#    "is_new_user": True/False,
-#    "referral_source": "...",
-#    "device_type": "...",
-#    "geo_country": "...",
-#    "geo_city": "..."
-# }}
-
-def _generate_user_id():
-    """Generates a unique user ID."""
-    return f"user_{uuid.uuid4().hex[:8]}"
+import time
+import numpy as np
+from src import config
+from src.catalog import get_catalog
+from src.disorder import TRUTH_COLUMNS, create_disorder
+from src.metrics import REGISTRY
+from src.session_store import SessionStore
+from src.simulation import format_timestamps
+
+# Random sources: `_random` for the per-event path, `_rng` for the batch path and
+# the session store. Seed both through reset_sessions() to replay a stream.
+_random = random.Random()
+_rng = np.random.default_rng()
+
+# Event-time clock: a simulation.SimulationClock in simulation mode, None to
+# stamp events with the wall clock.
+_clock = None
+
+# Late/out-of-order delivery of generated events (a disorder.Disorder), or None,
+# and the delivered events generate_clickstream_event() has not returned yet.
+_disorder = create_disorder()
+_delivery = collections.deque()
+
+# Per-user state lives in a SessionStore (see session_store.SESSION_FIELDS).
+# Categorical attributes are stored as codes into the vocabularies below.
+session_store = SessionStore(
+    max_sessions=config.MAX_ACTIVE_SESSIONS,
+    idle_timeout_seconds=config.SESSION_IDLE_TIMEOUT_SECONDS,
+    rng=_rng,
+)
+
+_EVENTS_GENERATED = REGISTRY.counter("generator_events_total", "Events emitted (after disorder injection, if any)")
+_GENERATE_SECONDS = REGISTRY.histogram("generator_batch_seconds", "Time to generate one generate_clickstream_events() batch")
+REGISTRY.gauge("active_sessions", "Sessions in the session store", function=lambda: len(session_store))
+
+# User population shard owned by this process: every user key k satisfies
+# k % _num_shards == _shard_index (see reset_sessions()).
+_shard_index = 0
+_num_shards = 1
+
+# --- Vocabularies ---
+# Products come from the catalog (see catalog.get_catalog()), loaded on first use.
+
+_REFERRAL_SOURCES = list(config.REFERRAL_SOURCES.keys())
+_REFERRAL_CODE = {name: i for i, name in enumerate(_REFERRAL_SOURCES)}
+_DEVICE_TYPES = list(config.DEVICE_TYPES.keys())
+_DEVICE_CODE = {name: i for i, name in enumerate(_DEVICE_TYPES)}
+_COUNTRIES = list(config.GEO_LOCATIONS.keys())
+_CITIES = [city for country in _COUNTRIES for city in config.GEO_LOCATIONS[country]]
+_CITY_COUNTS = np.array([len(config.GEO_LOCATIONS[country]) for country in _COUNTRIES])
+_CITY_OFFSETS = np.concatenate(([0], np.cumsum(_CITY_COUNTS)[:-1]))
+
+# Pages: the static pages and the search results page have codes below
+# _PRODUCT_PAGE_BASE; product i's page has code _PRODUCT_PAGE_BASE + i.
+_STATIC_PAGE_URLS = config.PAGES + ["/search_results"]
+_PAGE_CODE = {url: i for i, url in enumerate(_STATIC_PAGE_URLS)}
+_PRODUCT_PAGE_BASE = len(_STATIC_PAGE_URLS)
+_GENERAL_PAGES = [p for p in config.PAGES if p not in ["/products", "/cart", "/checkout", "/purchase_success"]]
+_GENERAL_PAGE_CODES = np.array([_PAGE_CODE[p] for p in _GENERAL_PAGES])
+
+# Markov chain as a matrix: one row of cumulative probabilities per state code.
+# States without their own row (e.g. "end_session") fall back to page_view,
+# like the .get() default in generate_clickstream_event().
+_NEXT_EVENTS = list(dict.fromkeys(e for row in config.EVENT_TRANSITION_PROBABILITIES.values() for e in row))
+_STATES = _NEXT_EVENTS + ["START_SESSION"]
+_START_SESSION = len(_NEXT_EVENTS)
+_TRANSITION_CUM = np.cumsum([
+    [config.EVENT_TRANSITION_PROBABILITIES.get(state, config.EVENT_TRANSITION_PROBABILITIES["page_view"]).get(e, 0.0)
+     for e in _NEXT_EVENTS]
+    for state in _STATES
+], axis=1)
+_TRANSITION_CUM /= _TRANSITION_CUM[:, -1:]
+
+_EV_PAGE_VIEW = _NEXT_EVENTS.index("page_view")
+_EV_ADD_TO_CART = _NEXT_EVENTS.index("add_to_cart")
+_EV_REMOVE_FROM_CART = _NEXT_EVENTS.index("remove_from_cart")
+_EV_CHECKOUT = _NEXT_EVENTS.index("checkout")
+_EV_PURCHASE = _NEXT_EVENTS.index("purchase")
+_EV_SEARCH = _NEXT_EVENTS.index("search")
+
+_REFERRAL_CUM = np.cumsum(list(config.REFERRAL_SOURCES.values()))
+_DEVICE_CUM = np.cumsum(list(config.DEVICE_TYPES.values()))
+
+EVENT_COLUMNS = [
+    "user_id", "session_id", "timestamp", "event_type", "page_url", "product_id",
+    "product_name", "product_brand", "product_price", "category", "browser", "os",
+    "ip_address", "referral_source", "device_type", "geo_country", "geo_city",
+    "is_new_user", "cart_size"
+]
+# Columns left out with PRODUCT_PAYLOAD = "ids": the silver layer looks product
+# details up in the catalog, so events only carry the ids.
+CATALOG_COLUMNS = ["product_name", "product_brand"]
+_IDS_ONLY_COLUMNS = [col for col in EVENT_COLUMNS if col not in CATALOG_COLUMNS]
+
+def _format_user_id(user_key):
+    return f"user_{user_key:08x}"
+
+def _format_session_id(session_key):
+    return f"session_{session_key:012x}"
+
+def _new_user_keys(k):
+    """Draws `k` random user keys belonging to this process's shard."""
+    return _rng.integers(0, 2**32 // _num_shards, size=k, dtype=np.uint64) * _num_shards + _shard_index
 
 def _choose_from_weighted_dict(weights_dict):
     """Chooses an item from a dictionary where values are weights."""
     items = list(weights_dict.keys())
     weights = list(weights_dict.values())
-    return random.choices(items, weights=weights, k=1)[0]
+    return _random.choices(items, weights=weights, k=1)[0]
 
-def _get_or_create_session(user_id):
+def _random_product():
+    """Picks a product, weighted by catalog popularity. Returns the product index."""
+    return get_catalog().sample_one(_random.random())
+
+def _page_url(page_code, catalog):
+    if page_code < _PRODUCT_PAGE_BASE:
+        return _STATIC_PAGE_URLS[page_code]
+    return catalog.page_urls[page_code - _PRODUCT_PAGE_BASE]
+
+def _get_or_create_session(slot):
     """
     Retrieves an existing user session or creates a new one.
-    Simulates a new session with a 15% chance for existing users.
+    `slot` is None for a user that is not in the session store yet.
+    Simulates a new session with a 5% chance for existing users.
+    Returns the user's slot in the session store.
     """
-    if user_id not in user_sessions:
+    store = session_store
+    if slot is None:
         # New user always starts a new session
+        slot = store.allocate(_random.randrange(2**32 // _num_shards) * _num_shards + _shard_index)
         is_new_user = True
-        referral_source = _choose_from_weighted_dict(config.REFERRAL_SOURCES)
-        device_type = _choose_from_weighted_dict(config.DEVICE_TYPES)
-        geo_country = random.choice(list(config.GEO_LOCATIONS.keys()))
-        geo_city = random.choice(config.GEO_LOCATIONS[geo_country])
-        os = random.choice(config.OS_TYPES)
-        browser = random.choice(config.BROWSER_TYPES)
-    elif random.random() < 0.05: # 5% chance for existing user to start a new session
-        is_new_user = False # Still an existing user, just new session
-        referral_source = _choose_from_weighted_dict(config.REFERRAL_SOURCES)
-        device_type = _choose_from_weighted_dict(config.DEVICE_TYPES)
-        geo_country = user_sessions[user_id]["geo_country"]
-        geo_city = user_sessions[user_id]["geo_city"]
-        os = random.choice(config.OS_TYPES)
-        browser = random.choice(config.BROWSER_TYPES)
+        country = _random.randrange(len(_COUNTRIES))
+        store.geo_country[slot] = country
+        store.geo_city[slot] = _CITY_OFFSETS[country] + _random.randrange(int(_CITY_COUNTS[country]))
+    elif _random.random() < 0.05: # 5% chance for existing user to start a new session
+        is_new_user = False # Still an existing user, just new session (keeps geo)
     else:
         # Continue existing session
-        return user_sessions[user_id]
-
-    session_id = f"session_{uuid.uuid4().hex[:12]}"
-    user_sessions[user_id] = {
-        "session_id": session_id,
-        "last_page": random.choice(config.PAGES), # Initial page for new session
-        "cart_items": [],
-        "last_event_type": "START_SESSION", # Set initial state for transitions
-        "current_product_viewed": None,
-        "is_new_user": is_new_user,
-        "referral_source": referral_source,
-        "device_type": device_type,
-        "geo_country": geo_country,
-        "geo_city": geo_city,
-        "os": os,
-        "browser": browser
-    }
-    return user_sessions[user_id]
+        return slot
+
+    store.session_key[slot] = _random.getrandbits(48)
+    store.last_page[slot] = _random.randrange(len(config.PAGES)) # Initial page for new session
+    store.cart_clear(slot)
+    store.last_event[slot] = _START_SESSION # Set initial state for transitions
+    store.current_product[slot] = -1
+    store.is_new_user[slot] = is_new_user
+    store.referral_source[slot] = _REFERRAL_CODE[_choose_from_weighted_dict(config.REFERRAL_SOURCES)]
+    store.device_type[slot] = _DEVICE_CODE[_choose_from_weighted_dict(config.DEVICE_TYPES)]
+    store.os[slot] = _random.randrange(len(config.OS_TYPES))
+    store.browser[slot] = _random.randrange(len(config.BROWSER_TYPES))
+    return slot
 
 def generate_clickstream_event():
     """
     Generates a single simulated clickstream event with more realistic logic.
+
+    With disorder injection configured (see src/disorder.py), events are
+    returned one per call in delivery order: an event held back comes out of
+    a later call, a duplicate out of a call of its own. A call generates as
+    many events as it takes for one to be due, so the first calls of a run
+    generate a burst (about the delay's worth of events); a paced live run
+    should use generate_clickstream_events() with the rate controller.
     """
-    # Select a user, mixing existing with a small chance of new ones
-    active_users = list(user_sessions.keys())
-    if not active_users: # Handle initial startup with no users
-        user_id = _generate_user_id()
+    if _disorder is None:
+        event = _generate_event()
     else:
-        user_id_options = active_users + [_generate_user_id() for _ in range(5)]
-        user_id = random.choice(user_id_options)
+        while not _delivery:
+            _delivery.extend(_disorder.apply([_generate_event()]))
+        event = _delivery.popleft()
+    _EVENTS_GENERATED.inc()
+    return event
 
-    user_state = _get_or_create_session(user_id)
+def _generate_event():
+    store = session_store
+    # Select a user, mixing existing with a small chance of new ones (5 fresh candidates)
+    num_active = len(store)
+    pick = _random.randrange(num_active + 5)
+    slot = _get_or_create_session(int(store.live_slots[pick]) if pick < num_active else None)
 
-    timestamp = datetime.datetime.utcnow().isoformat() + "Z"
+    timestamp = _clock.next_timestamp() if _clock is not None else datetime.datetime.utcnow().isoformat() + "Z"
 
 
-    prev_event_type = user_state["last_event_type"]
+    prev_event_type = _STATES[store.last_event[slot]]
     possible_next_events = config.EVENT_TRANSITION_PROBABILITIES.get(prev_event_type, config.EVENT_TRANSITION_PROBABILITIES["page_view"]) # Default to page_view if unknown
     event_type = _choose_from_weighted_dict(possible_next_events)
 
-    page_url = user_state["last_page"]
+    catalog = get_catalog()
+    ids_only = config.PRODUCT_PAYLOAD == "ids"
+    page_code = int(store.last_page[slot]) # Kept for product pages; static pages are looked up by URL
+    page_url = _page_url(page_code, catalog)
     product_id_value = None
     product_name_value = None
     product_brand_value = None
@@ -102,93 +200,90 @@ def generate_clickstream_event():
     product_category_value = None
 
     # Logic for product and page context
-    selected_product_obj = None
+    selected_product = None # Product index
 
     if event_type == "page_view":
         # Simulate Browse: either a general page, a category page, or a specific product page
         # 60% chance for general page view
-        if random.random() < 0.6: 
-            page_url = random.choice([p for p in config.PAGES if p not in ["/products", "/cart", "/checkout", "/purchase_success"]])
-            user_state["current_product_viewed"] = None # Clear product context if not product page
-        else: 
-            product_category_value = random.choice(config.PRODUCT_CATEGORIES)
-            selected_product_obj = random.choice(config.PRODUCTS_BY_CATEGORY[product_category_value])
-            page_url = f"/products/{selected_product_obj['id']}" # Specific product page URL
-            user_state["current_product_viewed"] = selected_product_obj # Store for next action
-            
+        if _random.random() < 0.6:
+            page_url = _random.choice(_GENERAL_PAGES)
+            store.current_product[slot] = -1 # Clear product context if not product page
+        else:
+            selected_product = _random_product()
+            page_code = _PRODUCT_PAGE_BASE + selected_product
+            page_url = catalog.page_urls[selected_product] # Specific product page URL
+            store.current_product[slot] = selected_product # Store for next action
+
 
     elif event_type == "add_to_cart":
-        if user_state["current_product_viewed"]:
+        if store.current_product[slot] >= 0:
             # User adds the product they just viewed
-            selected_product_obj = user_state["current_product_viewed"]
+            selected_product = int(store.current_product[slot])
         else:
             # If no product in context (e.g., came from search/direct), pick a random product
-            random_category = random.choice(config.PRODUCT_CATEGORIES)
-            selected_product_obj = random.choice(config.PRODUCTS_BY_CATEGORY[random_category])
-        user_state["cart_items"].append(selected_product_obj)
+            selected_product = _random_product()
+        store.cart_add(slot, selected_product)
         page_url = "/cart" # Assume user navigates to cart or stays on product page
-        user_state["current_product_viewed"] = None # Product added, context might shift
+        store.current_product[slot] = -1 # Product added, context might shift
 
     elif event_type == "remove_from_cart":
-        if user_state["cart_items"]:
+        if store.cart_size[slot]:
             # Remove a random item from cart if it's not empty
-            removed_product = user_state["cart_items"].pop(random.randrange(len(user_state["cart_items"])))
-            selected_product_obj = removed_product # The one that was removed
+            selected_product = store.cart_pop(slot, _random.randrange(store.cart_size[slot])) # The one that was removed
             page_url = "/cart"
         else:
             # Revert to page view if no items to remove to keep behavior realistic
             event_type = "page_view"
-            page_url = random.choice(config.PAGES)
-            user_state["current_product_viewed"] = None
+            page_url = _random.choice(config.PAGES)
+            store.current_product[slot] = -1
 
     elif event_type == "checkout":
-        if user_state["cart_items"]:
+        if store.cart_size[slot]:
             page_url = "/checkout"
-            user_state["current_product_viewed"] = None # Clear product context
+            store.current_product[slot] = -1 # Clear product context
         else:
             # Revert to page view if no items to checkout
             event_type = "page_view"
-            page_url = random.choice(config.PAGES)
-            user_state["current_product_viewed"] = None
+            page_url = _random.choice(config.PAGES)
+            store.current_product[slot] = -1
 
     elif event_type == "purchase":
-        if user_state["cart_items"]:
+        if store.cart_size[slot]:
             # For purchase, 'product_id' becomes a list of IDs, and 'category' becomes 'Mixed'
-            product_id_value = [item["id"] for item in user_state["cart_items"]]
-            product_name_value = [item["name"] for item in user_state["cart_items"]]
-            product_brand_value = list(set(item["brand"] for item in user_state["cart_items"])) # Unique brands
-            product_price_value = round(sum(item["price"] for item in user_state["cart_items"]), 2) # Total purchase value
+            cart_items = list(store.cart(slot))
+            product_id_value = [catalog.ids[p] for p in cart_items]
+            if not ids_only:
+                product_name_value = [catalog.names[p] for p in cart_items]
+                product_brand_value = list(dict.fromkeys(catalog.brand(p) for p in cart_items)) # Unique brands, in cart order
+            product_price_value = round(sum(catalog.price(p) for p in cart_items), 2) # Total purchase value
             product_category_value = "Mixed" # Represents multiple categories in one purchase
             page_url = "/purchase_success"
-            user_state["cart_items"] = [] # Clear cart after purchase
-            user_state["current_product_viewed"] = None
+            store.cart_clear(slot) # Clear cart after purchase
+            store.current_product[slot] = -1
         else:
             # Revert to page view if no items to purchase
             event_type = "page_view"
-            page_url = random.choice(config.PAGES)
-            user_state["current_product_viewed"] = None
+            page_url = _random.choice(config.PAGES)
+            store.current_product[slot] = -1
 
     elif event_type == "search":
         page_url = "/search_results"
-        user_state["current_product_viewed"] = None
+        store.current_product[slot] = -1
         # Could add a 'search_query' field here for more realism
 
     # Populate product details for single-item events (not purchase)
-    if selected_product_obj and event_type not in ["purchase"]:
-        product_id_value = [selected_product_obj["id"]]
-        product_name_value = [selected_product_obj["name"]]
-        product_brand_value = [selected_product_obj["brand"]]
-        product_price_value = [selected_product_obj["price"]]
-        # Find the category for the selected product object
-        for cat, prods in config.PRODUCTS_BY_CATEGORY.items():
-            if selected_product_obj in prods:
-                product_category_value = cat
-                break
+    if selected_product is not None and event_type not in ["purchase"]:
+        product_id_value = [catalog.ids[selected_product]]
+        if not ids_only:
+            product_name_value = [catalog.names[selected_product]]
+            product_brand_value = [catalog.brand(selected_product)]
+            product_price_value = [catalog.price(selected_product)]
+            product_category_value = catalog.category(selected_product)
 
 
     event = {
-        "user_id": user_id,
-        "session_id": user_state["session_id"],
+        "user_id": _format_user_id(store.user_key[slot]),
+        "session_id": _format_session_id(store.session_key[slot]),
         "timestamp": timestamp,
         "event_type": event_type,
         "page_url": page_url,
@@ -197,24 +292,321 @@ def generate_clickstream_event():
         "product_brand": product_brand_value,   # Product brand (list for purchase)
         "product_price": product_price_value,   # Product price (total for purchase)
         "category": product_category_value,     # Broader category (Mixed for purchase)
-        "browser": user_state["browser"],
-        "os": user_state["os"],
-        "ip_address": f"192.168.{random.randint(0,255)}.{random.randint(0,255)}",
-        "referral_source": user_state["referral_source"],
-        "device_type": user_state["device_type"],
-        "geo_country": user_state["geo_country"],
-        "geo_city": user_state["geo_city"],
-        "is_new_user": user_state["is_new_user"],
-        "cart_size": len(user_state["cart_items"]) # Current items in cart for this event
+        "browser": config.BROWSER_TYPES[store.browser[slot]],
+        "os": config.OS_TYPES[store.os[slot]],
+        "ip_address": f"192.168.{_random.randint(0,255)}.{_random.randint(0,255)}",
+        "referral_source": _REFERRAL_SOURCES[store.referral_source[slot]],
+        "device_type": _DEVICE_TYPES[store.device_type[slot]],
+        "geo_country": _COUNTRIES[store.geo_country[slot]],
+        "geo_city": _CITIES[store.geo_city[slot]],
+        "is_new_user": bool(store.is_new_user[slot]),
+        "cart_size": int(store.cart_size[slot]) # Current items in cart for this event
     }
+    if ids_only:
+        for col in CATALOG_COLUMNS:
+            del event[col]
 
     # Update user state for next event generation
-    user_state["last_page"] = page_url
-    user_state["last_event_type"] = event_type
-    # current_product_viewed is handled within the event_type logic
+    store.last_page[slot] = _PAGE_CODE.get(page_url, page_code)
+    store.last_event[slot] = _STATES.index(event_type)
+    store.touch(slot)
+    # current_product is handled within the event_type logic
 
     return event
 
+# --- Batch (vectorized) generation ---
+
+def _draw_transitions(state_codes, u):
+    """Advances a vector of Markov states by one step given uniform draws `u`."""
+    cum = _TRANSITION_CUM[state_codes]
+    return np.minimum((cum <= u[:, None]).sum(axis=1), len(_NEXT_EVENTS) - 1)
+
+def _draw_products(n):
+    """Picks `n` product indices the same way as the per-event path, weighted by catalog popularity."""
+    return get_catalog().sample(_rng.random(n))
+
+def _occurrence_rank(keys):
+    """
+    For each position returns how many earlier positions hold the same key.
+    Events with the same rank belong to distinct users and can be advanced together.
+    """
+    n = len(keys)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    starts = np.empty(n, dtype=bool)
+    starts[0] = True
+    starts[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    group_start = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n) - group_start
+    return rank
+
+def _start_sessions(slots, new_users, draws):
+    """Vectorized counterpart of the session-start branch of _get_or_create_session()."""
+    store = session_store
+    store.session_key[slots] = draws["session_key"]
+    store.last_page[slots] = draws["first_page"]
+    for slot in slots.tolist():
+        store.cart_clear(slot)
+    store.last_event[slots] = _START_SESSION
+    store.current_product[slots] = -1
+    store.is_new_user[slots] = new_users
+    store.referral_source[slots] = draws["referral_source"]
+    store.device_type[slots] = draws["device_type"]
+    store.os[slots] = draws["os"]
+    store.browser[slots] = draws["browser"]
+    # New users get a location; existing users keep theirs.
+    store.geo_country[slots[new_users]] = draws["geo_country"][new_users]
+    store.geo_city[slots[new_users]] = draws["geo_city"][new_users]
+
+def generate_clickstream_events(n, columnar=False):
+    """
+    Generates a batch of `n` clickstream events at once.
+
+    Follows the same user selection, session, cart, checkout and purchase rules as
+    generate_clickstream_event(), but draws all random inputs as NumPy arrays and
+    advances the Markov state of every user in the batch together. A user picked
+    several times in one batch is advanced once per "round", so their events stay
+    in order.
+
+    Args:
+        n (int): Number of events to generate.
+        columnar (bool): If True, return a dict of column name -> list/array
+            instead of a list of event dicts.
+
+    With disorder injection configured (see src/disorder.py), the events are
+    passed through it: they come back in delivery order, some are held back
+    for later batches and some are delivered twice, so the batch may be
+    shorter or longer than `n`. Columnar batches then also have the
+    disorder.TRUTH_COLUMNS.
+    """
+    if n <= 0:
+        return {col: [] for col in EVENT_COLUMNS} if columnar else []
+    started = time.perf_counter()
+    store = session_store
+    catalog = get_catalog()
+    if store.max_sessions is not None and n > store.max_sessions:
+        raise ValueError(f"Batch size {n} exceeds MAX_ACTIVE_SESSIONS ({store.max_sessions}).")
+
+    # Select users: an existing user, or a new one with the same odds as picking one
+    # of the 5 fresh candidates in the per-event path. Room for the new users is made
+    # first so no user picked for this batch can be evicted while it is in flight.
+    num_active = len(store)
+    is_new_pick = _rng.random(n) < 5 / (num_active + 5)
+    store.make_room(int(is_new_pick.sum()))
+    if not len(store):
+        is_new_pick[:] = True
+    slots = np.empty(n, dtype=np.int64)
+    slots[~is_new_pick] = store.sample_slots(n - int(is_new_pick.sum()))
+    slots[is_new_pick] = store.allocate_many(_new_user_keys(int(is_new_pick.sum())))
+    new_session = is_new_pick | (_rng.random(n) < 0.05)
+
+    # All per-event random inputs for the batch, drawn up front.
+    country = _rng.integers(0, len(_COUNTRIES), size=n)
+    session_draws = {
+        "session_key": _rng.integers(0, 2**48, size=n, dtype=np.uint64),
+        "first_page": _rng.integers(0, len(config.PAGES), size=n),
+        "referral_source": np.searchsorted(_REFERRAL_CUM, _rng.random(n) * _REFERRAL_CUM[-1], side="right"),
+        "device_type": np.searchsorted(_DEVICE_CUM, _rng.random(n) * _DEVICE_CUM[-1], side="right"),
+        "os": _rng.integers(0, len(config.OS_TYPES), size=n),
+        "browser": _rng.integers(0, len(config.BROWSER_TYPES), size=n),
+        "geo_country": country,
+        "geo_city": _CITY_OFFSETS[country] + (_rng.random(n) * _CITY_COUNTS[country]).astype(np.int64),
+    }
+    u_transition = _rng.random(n)
+    u_general_page = _rng.random(n)
+    viewed_products = _draw_products(n)
+    random_products = _draw_products(n)
+    u_remove = _rng.random(n)
+    fallback_pages = _rng.integers(0, len(config.PAGES), size=n)
+    general_pages = _GENERAL_PAGE_CODES[_rng.integers(0, len(_GENERAL_PAGES), size=n)]
+    ip_octets = _rng.integers(0, 256, size=(n, 2)).tolist()
+
+    # Per-event results, filled in round by round.
+    event_codes = np.empty(n, dtype=np.int64)
+    page_codes = np.empty(n, dtype=np.int64)
+    product_idx = np.full(n, -1, dtype=np.int64)
+    cart_sizes = np.empty(n, dtype=np.int64)
+    session_attrs = {name: np.empty(n, dtype=getattr(store, name).dtype) for name in (
+        "user_key", "session_key", "is_new_user", "referral_source", "device_type",
+        "geo_country", "geo_city", "os", "browser",
+    )}
+    purchases = {}
+
+    rank = _occurrence_rank(slots)
+    for r in range(int(rank.max()) + 1):
+        idx = np.nonzero(rank == r)[0]
+        s = slots[idx]
+
+        starting = new_session[idx]
+        if starting.any():
+            _start_sessions(
+                s[starting], is_new_pick[idx[starting]],
+                {name: values[idx[starting]] for name, values in session_draws.items()},
+            )
+
+        # Advance every user's Markov state in bulk and apply the cart rules.
+        events = _draw_transitions(store.last_event[s], u_transition[idx])
+        reverted = (store.cart_size[s] == 0) & np.isin(events, [_EV_REMOVE_FROM_CART, _EV_CHECKOUT, _EV_PURCHASE])
+        events[reverted] = _EV_PAGE_VIEW
+
+        is_view = (events == _EV_PAGE_VIEW) & ~reverted
+        product_view = is_view & (u_general_page[idx] >= 0.6)
+        general_view = is_view & ~product_view
+        is_add = events == _EV_ADD_TO_CART
+        is_remove = events == _EV_REMOVE_FROM_CART
+        is_checkout = events == _EV_CHECKOUT
+        is_purchase = events == _EV_PURCHASE
+        is_search = events == _EV_SEARCH
+
+        current = store.current_product[s]
+        products = np.full(len(idx), -1, dtype=np.int64)
+        products[product_view] = viewed_products[idx[product_view]]
+        products[is_add] = np.where(current >= 0, current, random_products[idx])[is_add]
+
+        pages = store.last_page[s].astype(np.int64) # end_session keeps the last page
+        pages[reverted] = fallback_pages[idx[reverted]]
+        pages[general_view] = general_pages[idx[general_view]]
+        pages[product_view] = _PRODUCT_PAGE_BASE + products[product_view]
+        pages[is_add | is_remove] = _PAGE_CODE["/cart"]
+        pages[is_checkout] = _PAGE_CODE["/checkout"]
+        pages[is_purchase] = _PAGE_CODE["/purchase_success"]
+        pages[is_search] = _PAGE_CODE["/search_results"]
+
+        current = np.where(reverted | general_view | is_add | is_checkout | is_purchase | is_search, -1, current)
+        current[product_view] = products[product_view]
+
+        # Carts are per-user arrays, so only the events that touch them loop.
+        for j in np.nonzero(is_add)[0].tolist():
+            store.cart_add(int(s[j]), int(products[j]))
+        for j in np.nonzero(is_remove)[0].tolist():
+            slot = int(s[j])
+            products[j] = store.cart_pop(slot, int(u_remove[idx[j]] * store.cart_size[slot]))
+        for j in np.nonzero(is_purchase)[0].tolist():
+            slot = int(s[j])
+            purchases[int(idx[j])] = list(store.cart(slot))
+            store.cart_clear(slot)
+
+        store.last_event[s] = events
+        store.last_page[s] = pages
+        store.current_product[s] = current
+
+        event_codes[idx] = events
+        page_codes[idx] = pages
+        product_idx[idx] = products
+        cart_sizes[idx] = store.cart_size[s]
+        for name, values in session_attrs.items():
+            values[idx] = getattr(store, name)[s]
+
+    # Stamp the batch before touching the store, so last_seen is the batch's last event time.
+    if _clock is not None:
+        timestamps = format_timestamps(_clock.advance(n))
+    else:
+        base_time = np.datetime64(datetime.datetime.utcnow(), "us")
+        timestamps = format_timestamps(base_time + np.arange(n).astype("timedelta64[us]"))
+    store.touch(slots)
+
+    # Assemble the output columns.
+    columns = {
+        "user_id": [f"user_{k:08x}" for k in session_attrs["user_key"].tolist()],
+        "session_id": [f"session_{k:012x}" for k in session_attrs["session_key"].tolist()],
+        "timestamp": timestamps,
+        "event_type": [_NEXT_EVENTS[e] for e in event_codes.tolist()],
+        "page_url": [_page_url(p, catalog) for p in page_codes.tolist()],
+        "product_id": [None] * n,
+        "product_name": [None] * n,
+        "product_brand": [None] * n,
+        "product_price": [None] * n,
+        "category": [None] * n,
+        "browser": [config.BROWSER_TYPES[c] for c in session_attrs["browser"].tolist()],
+        "os": [config.OS_TYPES[c] for c in session_attrs["os"].tolist()],
+        "ip_address": [f"192.168.{a}.{b}" for a, b in ip_octets],
+        "referral_source": [_REFERRAL_SOURCES[c] for c in session_attrs["referral_source"].tolist()],
+        "device_type": [_DEVICE_TYPES[c] for c in session_attrs["device_type"].tolist()],
+        "geo_country": [_COUNTRIES[c] for c in session_attrs["geo_country"].tolist()],
+        "geo_city": [_CITIES[c] for c in session_attrs["geo_city"].tolist()],
+        "is_new_user": session_attrs["is_new_user"].tolist(),
+        "cart_size": cart_sizes.tolist(),
+    }
+    ids_only = config.PRODUCT_PAYLOAD == "ids"
+    for i in np.nonzero(product_idx >= 0)[0].tolist():
+        if i in purchases:
+            continue
+        p = int(product_idx[i])
+        columns["product_id"][i] = [catalog.ids[p]]
+        if not ids_only:
+            columns["product_name"][i] = [catalog.names[p]]
+            columns["product_brand"][i] = [catalog.brand(p)]
+            columns["product_price"][i] = [catalog.price(p)]
+            columns["category"][i] = catalog.category(p)
+    for i, cart in purchases.items():
+        columns["product_id"][i] = [catalog.ids[p] for p in cart]
+        if not ids_only:
+            columns["product_name"][i] = [catalog.names[p] for p in cart]
+            columns["product_brand"][i] = list(dict.fromkeys(catalog.brand(p) for p in cart))
+        columns["product_price"][i] = round(sum(catalog.price(p) for p in cart), 2)
+        columns["category"][i] = "Mixed"
+
+    if columnar and _disorder is None:
+        result = columns
+        emitted = n
+    else:
+        names = EVENT_COLUMNS if columnar or not ids_only else _IDS_ONLY_COLUMNS
+        result = [dict(zip(names, row)) for row in zip(*(columns[col] for col in names))]
+        if _disorder is not None:
+            result = _disorder.apply(result)
+        emitted = len(result)
+        if columnar:
+            result = {col: [event[col] for event in result] for col in EVENT_COLUMNS + TRUTH_COLUMNS}
+    _GENERATE_SECONDS.observe(time.perf_counter() - started)
+    _EVENTS_GENERATED.inc(emitted)
+    return result
+
+def flush_delayed_events():
+    """Events still held back by disorder injection, for delivery at the end of a run."""
+    if _disorder is None:
+        return []
+    events = list(_delivery) + _disorder.flush()
+    _delivery.clear()
+    _EVENTS_GENERATED.inc(len(events))
+    return events
+
+def reset_sessions(num_users, shard_index=0, num_shards=1, seed=None, clock=None, disorder=None):
+    """
+    Discards all session state and starts over with `num_users` fresh users.
+
+    Worker processes call this to own one shard of the user population: only user
+    ids whose key falls in `shard_index` (of `num_shards`) are generated, so no
+    user is ever simulated by two processes. Random generators are reseeded so
+    forked workers do not replay each other's streams.
+
+    Args:
+        seed (int): Makes the event stream reproducible: the same seed, shard and
+            call sequence always yield the same events. None seeds from the OS.
+        clock: A simulation.SimulationClock that supplies event timestamps and the
+            session store's idle-timeout clock. None uses the wall clock.
+        disorder: A disorder.Disorder applied to generated events. None builds one
+            from the DISORDER_* settings (seeded like the generator), if they enable it.
+    """
+    global session_store, _random, _rng, _clock, _shard_index, _num_shards, _disorder
+    seed_seq = np.random.SeedSequence(None if seed is None else [seed, shard_index])
+    random_seq, rng_seq, disorder_seq = seed_seq.spawn(3)
+    _random = random.Random(int(random_seq.generate_state(1)[0]))
+    _rng = np.random.default_rng(rng_seq)
+    _clock = clock
+    _disorder = disorder if disorder is not None else create_disorder(seed=disorder_seq)
+    _delivery.clear()
+    _shard_index = shard_index
+    _num_shards = num_shards
+    session_store = SessionStore(
+        max_sessions=config.MAX_ACTIVE_SESSIONS,
+        idle_timeout_seconds=config.SESSION_IDLE_TIMEOUT_SECONDS,
+        clock=clock.now if clock is not None else time.monotonic,
+        rng=_rng,
+    )
+    for _ in range(num_users):
+        _get_or_create_session(None)
+
 # Initialize some starting users for the simulation
 for _ in range(config.NUM_USERS):
-    _get_or_create_session(_generate_user_id())
\ No newline at end of file
+    _get_or_create_session(None)
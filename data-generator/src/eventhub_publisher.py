@@ -1,15 +1,31 @@
 # data_generator/src/eventhub_publisher.py
 
-import json
-from azure.eventhub import EventHubProducerClient, EventData
+import time
+from azure.eventhub import EventHubProducerClient
 from src import config
+from src import serializer
+from src.serializer import BatchSizeTracker, get_encoder, make_event_data, pack_payloads
 
 class EventHubPublisher:
     """
     Handles connection to Azure Event Hubs and publishing of events.
     """
-    def __init__(self):
-        """Initializes the Event Hubs producer client."""
+    def __init__(self, producer=None, packed=None, encoding=None):
+        """
+        Initializes the Event Hubs producer client.
+        Args:
+            producer: Optional pre-built producer (e.g. a FakeEventHubProducer for offline runs).
+            packed (bool): Send many events per EventData (default: config.PACK_EVENTS).
+            encoding (str): "json" or "binary" message bodies (default: config.EVENT_ENCODING).
+        """
+        self.packed = config.PACK_EVENTS if packed is None else packed
+        self.encoding = encoding or config.EVENT_ENCODING
+        self._encode = get_encoder(self.encoding)
+        self._size_tracker = None
+        if producer is not None:
+            self.producer = producer
+            return
+
         if not config.EVENTHUB_CONNECTION_STR or not config.EVENTHUB_NAME:
             raise ValueError("Event Hubs connection string or name not configured. Check .env and src/config.py")
 
@@ -23,7 +39,9 @@ class EventHubPublisher:
 
     def publish_events(self, events):
         """
-        Publishes a list of events to Event Hubs in a single batch.
+        Publishes a list of events to Event Hubs, splitting into as many batches as needed.
+        Each event is serialized exactly once; batch sizes are tracked up front so a
+        batch is sent before it would overflow.
         Args:
             events (list): A list of Python dictionaries, where each dict is an event.
         """
@@ -31,17 +49,42 @@ class EventHubPublisher:
             return
 
         event_data_batch = self.producer.create_batch()
-        for event in events:
-            try:
-                event_data_batch.add(EventData(json.dumps(event)))
-            except ValueError as e:
-                print(f"Warning: Event too large for batch, sending current batch and starting new one. Error: {e}")
-                self.producer.send_batch(event_data_batch) # Send current batch
+        if self._size_tracker is None:
+            self._size_tracker = BatchSizeTracker(event_data_batch.max_size_in_bytes, packed=self.packed,
+                                                  encoding=self.encoding)
+        tracker = self._size_tracker
+        tracker.reset()
+
+        started = time.perf_counter()
+        bodies = [self._encode(event) for event in events]
+        if self.packed:
+            bodies = pack_payloads(bodies, tracker.max_body_bytes(), b"" if self.encoding == "binary" else b"\n")
+        serializer.SERIALIZE_SECONDS.observe(time.perf_counter() - started)
+        serializer.SERIALIZED_BYTES.inc(sum(map(len, bodies)))
+
+        build_started = time.perf_counter()
+        for body in bodies:
+            if not tracker.fits(len(body)):
+                self._send_batch(event_data_batch, build_started) # Send the full batch
+                serializer.BATCH_SPLITS.inc()
                 event_data_batch = self.producer.create_batch() # Start new batch
-                event_data_batch.add(EventData(json.dumps(event))) # Add current event to new batch
+                tracker.reset()
+                build_started = time.perf_counter()
+            event_data_batch.add(make_event_data(body, self.packed, self.encoding))
+            tracker.add(len(body))
+
+        self._send_batch(event_data_batch, build_started) # Send the final batch
+        serializer.EVENTS_PUBLISHED.inc(len(events))
+        return len(events)
 
-        self.producer.send_batch(event_data_batch) # Send the final batch
-        return len(events) 
+    def _send_batch(self, event_data_batch, build_started):
+        """Sends one filled batch, recording build time, fill ratio and round trip."""
+        serializer.BATCH_BUILD_SECONDS.observe(time.perf_counter() - build_started)
+        serializer.BATCH_FILL_RATIO.observe(self._size_tracker.fill_ratio())
+        with serializer.SEND_BATCH_SECONDS.time():
+            self.producer.send_batch(event_data_batch)
+        serializer.BATCHES_SENT.inc()
+        serializer.MESSAGES_SENT.inc(len(event_data_batch))
 
     def close(self):
         """Closes the Event Hubs producer connection."""
@@ -0,0 +1,107 @@
+# data_generator/src/fake_producer.py
+
+import asyncio
+import random
+import time
+from azure.eventhub import EventDataBatch
+from azure.eventhub.exceptions import EventHubError
+
+# Event Hubs Standard tier limit for a single batch.
+DEFAULT_MAX_BATCH_SIZE_IN_BYTES = 1024 * 1024
+
+
+class FakeEventHubProducer:
+    """
+    In-process stand-in for azure.eventhub.EventHubProducerClient.
+
+    Batches are real EventDataBatch objects, so size limits behave as they do
+    against Event Hubs, but send_batch only sleeps for `send_latency_seconds` and
+    counts what it was given. Used for benchmarks and offline runs.
+
+    Faults can be injected to exercise retry paths: each send fails with an
+    EventHubError with probability `failure_rate` (and every send during an
+    outage started with fail_for()), and stalls for `stall_seconds` with
+    probability `stall_rate` before doing so.
+    """
+    def __init__(self, send_latency_seconds=0.0, partition_count=4, max_size_in_bytes=DEFAULT_MAX_BATCH_SIZE_IN_BYTES,
+                 failure_rate=0.0, stall_rate=0.0, stall_seconds=0.0, seed=None):
+        self.send_latency_seconds = send_latency_seconds
+        self.failure_rate = failure_rate
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self._rng = random.Random(seed)
+        self._fail_until = 0.0
+        self.failed_sends = 0
+        self.stalled_sends = 0
+        self.partition_ids = [str(i) for i in range(partition_count)]
+        self.max_size_in_bytes = max_size_in_bytes
+        self.sent_batches = 0
+        self.sent_events = 0
+        self.sent_bytes = 0
+        self.events_by_partition = {}
+        self.closed = False
+
+    def get_partition_ids(self):
+        return list(self.partition_ids)
+
+    def create_batch(self, partition_id=None, partition_key=None, max_size_in_bytes=None):
+        return EventDataBatch(
+            max_size_in_bytes=max_size_in_bytes or self.max_size_in_bytes,
+            partition_id=partition_id,
+            partition_key=partition_key,
+        )
+
+    def fail_for(self, seconds):
+        """Fails every send for the next `seconds` (an outage)."""
+        self._fail_until = time.monotonic() + seconds
+
+    def _fault(self):
+        """Seconds to stall and whether to fail this send."""
+        stall = self.stall_seconds if self.stall_rate and self._rng.random() < self.stall_rate else 0.0
+        if stall:
+            self.stalled_sends += 1
+        fail = time.monotonic() < self._fail_until or (self.failure_rate and self._rng.random() < self.failure_rate)
+        return stall, fail
+
+    def _fail(self):
+        self.failed_sends += 1
+        raise EventHubError("Injected send failure (FakeEventHubProducer)")
+
+    def _record(self, batch):
+        self.sent_batches += 1
+        self.sent_events += len(batch)
+        self.sent_bytes += batch.size_in_bytes
+        partition = batch._partition_id
+        self.events_by_partition[partition] = self.events_by_partition.get(partition, 0) + len(batch)
+
+    def send_batch(self, batch):
+        stall, fail = self._fault()
+        if self.send_latency_seconds or stall:
+            time.sleep(self.send_latency_seconds + stall)
+        if fail:
+            self._fail()
+        self._record(batch)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncEventHubProducer(FakeEventHubProducer):
+    """Asyncio counterpart of FakeEventHubProducer (azure.eventhub.aio API)."""
+
+    async def get_partition_ids(self):
+        return list(self.partition_ids)
+
+    async def create_batch(self, partition_id=None, partition_key=None, max_size_in_bytes=None):
+        return super().create_batch(partition_id, partition_key, max_size_in_bytes)
+
+    async def send_batch(self, batch):
+        stall, fail = self._fault()
+        if self.send_latency_seconds or stall:
+            await asyncio.sleep(self.send_latency_seconds + stall)
+        if fail:
+            self._fail()
+        self._record(batch)
+
+    async def close(self):
+        self.closed = True
@@ -0,0 +1,303 @@
+# data_generator/src/metrics.py
+
+import bisect
+import json
+import os
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src import config
+
+# Seconds; covers a sub-millisecond encode up to a multi-second send.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+RATIO_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0)
+
+
+# Metrics are updated from several threads (the outbox drainer, the metrics
+# server, the generator loop), and `+=` on an attribute is not atomic, so every
+# update holds the metric's lock.
+
+class Counter:
+    """Monotonically increasing count."""
+    type = "counter"
+
+    def __init__(self, name, help=""):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        return [(self.name, self.value)]
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """Value that goes up and down; either set() or read from a callback on every scrape."""
+    type = "gauge"
+
+    def __init__(self, name, help="", function=None):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.function = function
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def set_function(self, function):
+        self.function = function
+
+    def get(self):
+        return self.function() if self.function is not None else self.value
+
+    def samples(self):
+        return [(self.name, self.get())]
+
+    def snapshot(self):
+        return self.get()
+
+
+class Histogram:
+    """
+    Distribution over fixed buckets (Prometheus semantics: cumulative `le`
+    buckets, plus _sum and _count).
+
+    Usage:
+        with histogram.time():
+            send()
+    """
+    type = "histogram"
+
+    def __init__(self, name, help="", buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.sum += value
+            self.count += 1
+            if value > self.max:
+                self.max = value
+
+    def time(self):
+        return _Timer(self)
+
+    def samples(self):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        samples = []
+        cumulative = 0
+        for bound, count_in_bucket in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count_in_bucket
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            samples.append((f'{self.name}_bucket{{le="{le}"}}', cumulative))
+        samples.append((f"{self.name}_sum", total))
+        samples.append((f"{self.name}_count", count))
+        return samples
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "mean": self.sum / self.count if self.count else 0.0,
+                "max": self.max,
+            }
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class MetricsRegistry:
+    """
+    Named metrics of this process. counter()/gauge()/histogram() return the
+    existing metric when the name is already registered, so modules can declare
+    their metrics at import time without coordinating.
+    """
+    def __init__(self, prefix="clickstream_"):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help, **kwargs):
+        name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, **kwargs)
+            return metric
+
+    def counter(self, name, help=""):
+        return self._get_or_create(Counter, name, help)
+
+    def gauge(self, name, help="", function=None):
+        return self._get_or_create(Gauge, name, help, function=function)
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help, buckets=buckets)
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(f"{name} {value}" for name, value in metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Plain dict of all metrics (histograms as count/mean/max), for log lines."""
+        return {name[len(self.prefix):]: metric.snapshot() for name, metric in list(self._metrics.items())}
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per scrape is noise
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serves REGISTRY at http://host:port/metrics from a daemon thread. Returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+    return server
+
+
+def start_log_reporter(interval_seconds, label=None):
+    """Prints REGISTRY as one JSON line every `interval_seconds` from a daemon thread."""
+    def report():
+        while True:
+            time.sleep(interval_seconds)
+            line = {"ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "metrics": REGISTRY.snapshot()}
+            if label:
+                line["source"] = label
+            print(json.dumps(line), flush=True)
+    thread = threading.Thread(target=report, name="metrics-log", daemon=True)
+    thread.start()
+    return thread
+
+
+class ProfilerHooks:
+    """
+    Opt-in profiling of a running generator, driven by signals (POSIX only):
+
+    - SIGUSR1 starts cProfile; the next SIGUSR1 stops it, writes the stats to
+      `output_dir/profile-<pid>-<time>.prof` (open with pstats or snakeviz) and
+      prints the top functions by cumulative time.
+    - SIGUSR2 starts tracemalloc; every following SIGUSR2 takes a snapshot, writes
+      it to `output_dir` and prints the top allocation sites and the growth since
+      the previous snapshot.
+
+    Usage: kill -USR1 <pid>   (twice, some seconds apart)
+    """
+    def __init__(self, output_dir=None, top=20):
+        self.output_dir = output_dir or config.PROFILE_DIR
+        self.top = top
+        self._profiler = None
+        self._last_snapshot = None
+
+    def install(self):
+        if not hasattr(signal, "SIGUSR1"):
+            print("Profiler signals are not available on this platform.")
+            return False
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.toggle_cprofile())
+        signal.signal(signal.SIGUSR2, lambda signum, frame: self.tracemalloc_snapshot())
+        print(f"Profiler hooks installed: kill -USR1 {os.getpid()} toggles cProfile, "
+              f"kill -USR2 {os.getpid()} takes a tracemalloc snapshot.")
+        return True
+
+    def _path(self, kind, extension):
+        os.makedirs(self.output_dir, exist_ok=True)
+        return os.path.join(self.output_dir, f"{kind}-{os.getpid()}-{time.strftime('%Y%m%dT%H%M%S')}{extension}")
+
+    def toggle_cprofile(self):
+        import cProfile
+        import pstats
+        if self._profiler is None:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+            print("cProfile started; send SIGUSR1 again to stop and dump.")
+            return None
+        self._profiler.disable()
+        path = self._path("profile", ".prof")
+        self._profiler.dump_stats(path)
+        pstats.Stats(self._profiler).sort_stats("cumulative").print_stats(self.top)
+        self._profiler = None
+        print(f"cProfile stats written to {path}")
+        return path
+
+    def tracemalloc_snapshot(self):
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            print("tracemalloc started; send SIGUSR2 again for a snapshot.")
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        path = self._path("tracemalloc", ".snapshot")
+        snapshot.dump(path)
+        print(f"Top {self.top} allocation sites:")
+        for stat in snapshot.statistics("lineno")[:self.top]:
+            print(f"  {stat}")
+        if self._last_snapshot is not None:
+            print(f"Top {self.top} changes since the previous snapshot:")
+            for stat in snapshot.compare_to(self._last_snapshot, "lineno")[:self.top]:
+                print(f"  {stat}")
+        self._last_snapshot = snapshot
+        print(f"tracemalloc snapshot written to {path}")
+        return path
+
+
+def start(port_offset=0, label=None):
+    """
+    Starts the configured metrics outputs for this process: the HTTP endpoint
+    (METRICS_PORT + port_offset, if METRICS_PORT is set), JSON log lines (every
+    METRICS_LOG_INTERVAL_SECONDS, if set) and the profiler signal hooks (if
+    PROFILER_SIGNALS).
+    """
+    if config.METRICS_PORT:
+        start_http_server(config.METRICS_PORT + port_offset)
+    if config.METRICS_LOG_INTERVAL_SECONDS:
+        start_log_reporter(config.METRICS_LOG_INTERVAL_SECONDS, label)
+    if config.PROFILER_SIGNALS:
+        ProfilerHooks().install()
@@ -0,0 +1,426 @@
+# data_generator/src/outbox.py
+#
+# Disk-backed outbox between the generator loop and a sink (USE_OUTBOX).
+#
+# publish_events() never waits for Event Hubs: batches go to a bounded memory
+# queue and, once that is full, are appended to a local segment log. A drainer
+# thread sends them through the wrapped sink in order (memory queue first, then
+# the log), retrying failed sends with exponential backoff, so throttling, a
+# stalled connection or an outage only grows the backlog.
+#
+# Log layout, in OUTBOX_DIR:
+#   segment-<n>.log  records back to back: u32 payload length | u32 crc32 | payload
+#                    (payload: the batch as a JSON array of events)
+#   ack.json         {"segment": n, "offset": bytes} of the first record not yet sent
+#
+# Delivery is at-least-once: a record is acknowledged after its send returns,
+# so a crash in between resends it on the next start. Batches are delivered in
+# the order they were accepted, across restarts too: when spilling starts, the
+# batch being sent and the memory queue are written to the log first, so the
+# log always holds the oldest unsent batches, and on close() whatever is still
+# in memory is appended after them. A restarted outbox drains the log before
+# anything new. Only a crash (not a clean shutdown) loses the memory queue; set
+# OUTBOX_MAX_MEMORY_EVENTS = 0 to write every batch to the log.
+
+import json
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from src import config
+from src.metrics import REGISTRY
+from src.serializer import encode_event
+from src.sinks import Sink
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+_RECORD_HEADER = struct.Struct("<II")
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".log"
+_ACK_FILE = "ack.json"
+DRAIN_RATE_WINDOW_SECONDS = 10
+
+OUTBOX_QUEUE_EVENTS = REGISTRY.gauge("outbox_queue_events", "Events waiting in the outbox memory queue")
+OUTBOX_BACKLOG_BYTES = REGISTRY.gauge("outbox_backlog_bytes", "Segment log bytes not yet sent")
+OUTBOX_SPILLED_BYTES = REGISTRY.counter("outbox_spilled_bytes_total", "Bytes appended to the outbox segment log")
+OUTBOX_SPILLED_EVENTS = REGISTRY.counter("outbox_spilled_events_total", "Events appended to the outbox segment log")
+OUTBOX_DRAINED_EVENTS = REGISTRY.counter("outbox_drained_events_total", "Events sent by the outbox drainer")
+OUTBOX_DRAIN_RATE = REGISTRY.gauge("outbox_drain_events_per_second", "Events sent by the outbox drainer per second over the last DRAIN_RATE_WINDOW_SECONDS")
+OUTBOX_SEND_FAILURES = REGISTRY.counter("outbox_send_failures_total", "Outbox sends that failed and were retried")
+OUTBOX_CORRUPT_RECORDS = REGISTRY.counter("outbox_corrupt_records_total", "Torn or corrupt segment log records skipped on replay")
+
+
+class SegmentLog:
+    """
+    Append-only log of event batches split into numbered segment files, with a
+    read cursor persisted in ack.json.
+
+    Appends always go to a segment created by this instance; segments left by
+    an earlier run are only read, so a record torn by a crash can end a
+    segment but never precede newer records. Not thread-safe (Outbox locks
+    around it).
+    """
+    def __init__(self, directory, segment_bytes=None, fsync_interval_seconds=None):
+        """
+        Args:
+            directory (str): Where the segments and ack.json live (created if missing).
+            segment_bytes (int): Start a new segment after this many bytes (default: config.OUTBOX_SEGMENT_BYTES).
+            fsync_interval_seconds (float): fsync appends at most this often; 0 fsyncs every append
+                (default: config.OUTBOX_FSYNC_INTERVAL_SECONDS).
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes or config.OUTBOX_SEGMENT_BYTES
+        self.fsync_interval_seconds = (config.OUTBOX_FSYNC_INTERVAL_SECONDS if fsync_interval_seconds is None
+                                       else fsync_interval_seconds)
+        os.makedirs(directory, exist_ok=True)
+        self._sizes = {}  # segment number -> bytes written
+        for name in os.listdir(directory):
+            if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX):
+                number = int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+                self._sizes[number] = os.path.getsize(self._path(number))
+        self._read_segment, self._read_offset = self._load_ack()
+        for number in [n for n in self._sizes if n < self._read_segment]:
+            self._delete(number)
+        if self._read_segment not in self._sizes:  # acknowledged to the end and deleted
+            self._read_segment, self._read_offset = min(self._sizes, default=self._read_segment + 1), 0
+        self._writer = None
+        self._write_segment = max(self._sizes, default=self._read_segment - 1)
+        self._reader = None
+        self._reader_segment = None
+        self._last_fsync = time.monotonic()
+
+    def _path(self, number):
+        return os.path.join(self.directory, f"{_SEGMENT_PREFIX}{number:010d}{_SEGMENT_SUFFIX}")
+
+    def _load_ack(self):
+        try:
+            with open(os.path.join(self.directory, _ACK_FILE), encoding="utf-8") as f:
+                ack = json.load(f)
+            return ack["segment"], ack["offset"]
+        except FileNotFoundError:
+            return min(self._sizes, default=0), 0
+
+    def _delete(self, number):
+        if self._reader_segment == number:
+            self._reader.close()
+            self._reader = self._reader_segment = None
+        os.remove(self._path(number))
+        del self._sizes[number]
+
+    def append(self, payload):
+        """Appends one record. Returns the bytes written."""
+        if self._writer is None or self._sizes[self._write_segment] >= self.segment_bytes:
+            self._roll()
+        record = _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        self._writer.write(record)
+        self._writer.flush()  # visible to the reader; fsync below is for durability
+        self._sizes[self._write_segment] += len(record)
+        if time.monotonic() - self._last_fsync >= self.fsync_interval_seconds:
+            self.sync()
+        return len(record)
+
+    def _roll(self):
+        if self._writer is not None:
+            self.sync()
+            self._writer.close()
+        self._write_segment += 1
+        self._writer = open(self._path(self._write_segment), "ab")
+        self._sizes[self._write_segment] = 0
+
+    def write_position(self):
+        """Position after the last appended record (see read())."""
+        return self._write_segment, self._sizes[self._write_segment]
+
+    def sync(self):
+        if self._writer is not None:
+            os.fsync(self._writer.fileno())
+        self._last_fsync = time.monotonic()
+
+    def has_unread(self):
+        return self._read_position() is not None
+
+    def _read_position(self):
+        """(segment, offset) of the next record, skipping fully read segments, or None."""
+        for number in sorted(n for n in self._sizes if n >= self._read_segment):
+            offset = self._read_offset if number == self._read_segment else 0
+            if offset + _RECORD_HEADER.size <= self._sizes[number]:
+                return number, offset
+        return None
+
+    def read(self):
+        """
+        Next unsent record as (payload, position after it), or None when the log
+        is drained. The cursor only moves on ack(), so reading again without an
+        ack returns the same record.
+        """
+        while True:
+            position = self._read_position()
+            if position is None:
+                return None
+            number, offset = position
+            if self._reader_segment != number:
+                if self._reader is not None:
+                    self._reader.close()
+                self._reader = open(self._path(number), "rb")
+                self._reader_segment = number
+            self._reader.seek(offset)
+            header = self._reader.read(_RECORD_HEADER.size)
+            length, crc = _RECORD_HEADER.unpack(header)
+            end = offset + _RECORD_HEADER.size + length
+            payload = self._reader.read(length) if end <= self._sizes[number] else b""
+            if len(payload) == length and zlib.crc32(payload) == crc:
+                return payload, (number, end)
+            # Torn write from a crash: the rest of this segment cannot be trusted.
+            print(f"Outbox: skipping corrupt record at {self._path(number)}:{offset}")
+            OUTBOX_CORRUPT_RECORDS.inc()
+            self.ack((number, self._sizes[number]))
+
+    def ack(self, position):
+        """Marks everything before `position` (from read()) as sent and drops finished segments."""
+        self._read_segment, self._read_offset = position
+        tmp_path = os.path.join(self.directory, _ACK_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segment": self._read_segment, "offset": self._read_offset}, f)
+        os.replace(tmp_path, os.path.join(self.directory, _ACK_FILE))
+        for number in [n for n in self._sizes if n < self._read_segment
+                       or (n == self._read_segment and (self._writer is None or n != self._write_segment)
+                           and self._read_offset >= self._sizes[n])]:
+            self._delete(number)
+
+    def backlog_bytes(self):
+        """Bytes of records not yet acknowledged."""
+        return sum(size - (self._read_offset if number == self._read_segment else 0)
+                   for number, size in self._sizes.items() if number >= self._read_segment)
+
+    def close(self):
+        if self._writer is not None:
+            self.sync()
+            self._writer.close()
+            self._writer = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = self._reader_segment = None
+
+
+class Outbox(Sink):
+    """
+    Sink wrapper that accepts batches immediately and delivers them to `sink`
+    from a background thread (see the module comment).
+
+    Usage:
+        outbox = Outbox(EventHubSink())
+        outbox.publish_events(events)  # returns at once, even while Event Hubs is down
+        outbox.close()                 # drains for up to drain_timeout_seconds, spills the rest
+    """
+    def __init__(self, sink, directory=None, max_memory_events=None, segment_bytes=None,
+                 fsync_interval_seconds=None, retry_base_seconds=None, retry_max_seconds=None,
+                 drain_timeout_seconds=None):
+        """
+        Args:
+            sink (Sink): Where batches are delivered (e.g. an EventHubSink).
+            directory (str): Segment log directory (default: config.OUTBOX_DIR).
+            max_memory_events (int): Events queued in memory before spilling to the log
+                (default: config.OUTBOX_MAX_MEMORY_EVENTS).
+            segment_bytes, fsync_interval_seconds: See SegmentLog.
+            retry_base_seconds (float): Delay before the first retry of a failed send, doubled per
+                attempt (default: config.OUTBOX_RETRY_BASE_SECONDS)...
+            retry_max_seconds (float): ...up to this (default: config.OUTBOX_RETRY_MAX_SECONDS).
+            drain_timeout_seconds (float): How long close() waits for the queue to drain
+                (default: config.OUTBOX_DRAIN_TIMEOUT_SECONDS).
+        """
+        self.sink = sink
+        self.directory = directory or config.OUTBOX_DIR
+        self.max_memory_events = config.OUTBOX_MAX_MEMORY_EVENTS if max_memory_events is None else max_memory_events
+        self.retry_base_seconds = retry_base_seconds or config.OUTBOX_RETRY_BASE_SECONDS
+        self.retry_max_seconds = retry_max_seconds or config.OUTBOX_RETRY_MAX_SECONDS
+        self.drain_timeout_seconds = (config.OUTBOX_DRAIN_TIMEOUT_SECONDS if drain_timeout_seconds is None
+                                      else drain_timeout_seconds)
+        self.log = SegmentLog(self.directory, segment_bytes, fsync_interval_seconds)
+        self._memory = deque()
+        self._memory_events = 0
+        # Once a batch is spilled, later ones follow it to the log until the
+        # drainer has read the log to the end, which keeps batches in order.
+        self._spilling = self.log.has_unread()
+        self._in_flight = None           # memory batch being sent
+        self._in_flight_position = None  # log position after its copy, once spilling has logged it
+        self._closed = False
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self.accepted_events = 0
+        self.spilled_events = 0
+        self.drained_events = 0
+        self.send_failures = 0
+        self._started = time.monotonic()
+        self._recent_sends = deque()  # (monotonic time, events) within DRAIN_RATE_WINDOW_SECONDS
+
+        OUTBOX_QUEUE_EVENTS.set_function(lambda: self._memory_events)
+        OUTBOX_BACKLOG_BYTES.set_function(self.backlog_bytes)
+        OUTBOX_DRAIN_RATE.set_function(self.drain_rate)
+        self._drainer = threading.Thread(target=self._drain, name="outbox-drainer", daemon=True)
+        self._drainer.start()
+        if self._spilling:
+            print(f"Outbox: resuming {self.backlog_bytes():,} bytes of unsent events from {self.directory}")
+
+    def publish_events(self, events):
+        """Queues `events` for delivery. Never blocks on the wrapped sink; returns len(events)."""
+        if not events:
+            return 0
+        with self._ready:
+            if not self._spilling and self._memory_events + len(events) <= self.max_memory_events:
+                self._memory.append(events)
+                self._memory_events += len(events)
+            else:
+                if not self._spilling:
+                    self._start_spilling()
+                self._spill(events)
+            self.accepted_events += len(events)
+            self._ready.notify()
+        return len(events)
+
+    def _start_spilling(self):
+        """
+        Moves the batch being sent and the memory queue to the log, ahead of
+        the batch that overflowed, so the log holds every unsent batch in order.
+        If the in-flight send then succeeds, its log copy is acknowledged
+        instead of being sent again.
+        """
+        if self._in_flight is not None:
+            self._spill(self._in_flight)
+            self._in_flight_position = self.log.write_position()
+        while self._memory:
+            self._spill(self._memory.popleft())
+        self._memory_events = 0
+
+    def _spill(self, events):
+        self._spilling = True
+        written = self.log.append(encode_event(events))
+        self.spilled_events += len(events)
+        OUTBOX_SPILLED_BYTES.inc(written)
+        OUTBOX_SPILLED_EVENTS.inc(len(events))
+
+    def _next(self):
+        """Next batch to send as (events, log position or None), waiting until there is one."""
+        with self._ready:
+            while not self._stop.is_set():
+                if self._memory:
+                    events = self._in_flight = self._memory.popleft()
+                    self._memory_events -= len(events)
+                    return events, None
+                record = self.log.read()
+                if record is not None:
+                    payload, position = record
+                    return _loads(payload), position
+                self._spilling = False
+                self._ready.wait()
+        return None
+
+    def _drain(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            events, position = item
+            attempt = 0
+            while not self._send(events):
+                delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt)
+                attempt += 1
+                if self._stop.wait(delay * random.uniform(0.5, 1.0)):
+                    return  # close() spills the in-flight batch
+            with self._ready:
+                if self._closed:
+                    return  # close() has already kept the batch in the log
+                if position is None:
+                    position = self._in_flight_position
+                if position is not None:
+                    self.log.ack(position)
+                self._in_flight = None
+                self._in_flight_position = None
+                self.drained_events += len(events)
+                self._recent_sends.append((time.monotonic(), len(events)))
+                self._ready.notify_all()
+            OUTBOX_DRAINED_EVENTS.inc(len(events))
+
+    def _send(self, events):
+        try:
+            self.sink.publish_events(events)
+            return True
+        except Exception as e:
+            self.send_failures += 1
+            OUTBOX_SEND_FAILURES.inc()
+            if self.send_failures == 1 or self.send_failures % 100 == 0:
+                print(f"Outbox: send failed ({type(e).__name__}: {e}); retrying ({self.send_failures} failures so far)")
+            return False
+
+    def backlog_bytes(self):
+        """Segment log bytes not yet sent."""
+        with self._lock:
+            return self.log.backlog_bytes()
+
+    def drain_rate(self):
+        """Events sent per second over the last DRAIN_RATE_WINDOW_SECONDS."""
+        with self._lock:
+            cutoff = time.monotonic() - DRAIN_RATE_WINDOW_SECONDS
+            while self._recent_sends and self._recent_sends[0][0] < cutoff:
+                self._recent_sends.popleft()
+            return sum(count for _, count in self._recent_sends) / DRAIN_RATE_WINDOW_SECONDS
+
+    def flush(self, timeout=None):
+        """Waits until everything accepted so far is sent. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._ready:
+            while self._memory or self._in_flight is not None or self.log.has_unread():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._ready.wait(remaining)
+        return True
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started
+        return {
+            "accepted_events": self.accepted_events,
+            "drained_events": self.drained_events,
+            "spilled_events": self.spilled_events,
+            "queued_events": self._memory_events,
+            "backlog_bytes": self.backlog_bytes(),
+            "send_failures": self.send_failures,
+            "avg_drain_events_per_second": self.drained_events / elapsed if elapsed else 0.0,
+        }
+
+    def close(self):
+        """
+        Gives the drainer up to drain_timeout_seconds to empty the queue, then
+        stops it and spills the in-flight and queued batches to the log for the
+        next run.
+        """
+        drained = self.flush(self.drain_timeout_seconds)
+        self._stop.set()
+        with self._ready:
+            self._ready.notify_all()
+        self._drainer.join(timeout=1.0)  # a send stuck past this is abandoned; its batch stays in the log
+        with self._ready:
+            self._closed = True
+            # Memory batches only exist while the log has nothing unread (or the
+            # in-flight one is already logged), so appending keeps the order.
+            leftover = list(self._memory)
+            if self._in_flight is not None and self._in_flight_position is None:
+                leftover.insert(0, self._in_flight)
+            self._memory.clear()
+            self._memory_events = 0
+            self._in_flight = None
+            for events in leftover:
+                self._spill(events)
+            backlog = self.log.backlog_bytes()
+            self.log.close()
+        if not drained:
+            print(f"Outbox: drain timed out; {backlog:,} bytes of unsent events kept in {self.directory} for the next run")
+        if not self._drainer.is_alive():
+            self.sink.close()  # a send stuck past the timeout still holds the connection
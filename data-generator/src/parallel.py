@@ -0,0 +1,182 @@
+# data_generator/src/parallel.py
+
+import multiprocessing
+import os
+import queue
+import signal
+from src import config
+from src.rate_controller import create_profile, format_rate_report
+
+
+def _worker_main(shard_index, num_shards, num_users, profile, stats_queue, stop_event):
+    """
+    Runs one generator shard: its own slice of users, its own sink, and a
+    1/num_shards share of the traffic profile.
+
+    Batches are paced by a RateController and the worker reports
+    (shard, seconds, target events, sent events, lag) to the coordinator every
+    WORKER_STATS_INTERVAL_SECONDS. Lag is how far behind its send schedule the
+    worker is, i.e. how much of the target it cannot keep up with.
+    """
+    # Ctrl+C goes to the whole process group; let the coordinator decide when to stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from src import event_generator, metrics
+    from src.rate_controller import RateController
+    from src.sinks import create_sink
+
+    event_generator.reset_sessions(num_users, shard_index=shard_index, num_shards=num_shards)
+    metrics.start(port_offset=1 + shard_index, label=f"shard-{shard_index}")
+    publisher = create_sink(outbox_dir=os.path.join(config.OUTBOX_DIR, f"shard-{shard_index}"))
+    rate_controller = RateController(profile, scale=1 / num_shards, log_reports=False,
+                                     report_interval_seconds=config.WORKER_STATS_INTERVAL_SECONDS,
+                                     sleep=stop_event.wait)
+    try:
+        while not stop_event.is_set():
+            batch_size = rate_controller.acquire()
+            if not batch_size:
+                break
+            events = event_generator.generate_clickstream_events(batch_size)
+            report = rate_controller.record(publisher.publish_events(events))
+            if report:
+                stats_queue.put((shard_index, *report, rate_controller.backlog_seconds()))
+    finally:
+        try:
+            publisher.publish_events(event_generator.flush_delayed_events())
+        except Exception as e:
+            print(f"Shard {shard_index}: could not send the events held back by disorder injection: {e}")
+        publisher.close()
+
+
+def _simulation_worker_main(shard_index, num_shards, num_users, seed, duration_seconds, results_queue, stop_event):
+    """
+    Runs one shard of a parallel simulation (see simulation.run_simulation) to
+    its own sink and reports (shard, events written) when it is done.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from src import metrics
+    from src.simulation import run_simulation
+    from src.sinks import create_sink
+
+    metrics.start(port_offset=1 + shard_index, label=f"shard-{shard_index}")
+    sink = create_sink(outbox_dir=os.path.join(config.OUTBOX_DIR, f"shard-{shard_index}"))
+    total = run_simulation(sink=sink, seed=seed, shard_index=shard_index, num_shards=num_shards,
+                           num_users=num_users, duration_seconds=duration_seconds, should_stop=stop_event.is_set)
+    results_queue.put((shard_index, total))
+
+
+def _shard_users(num_users, num_workers, shard_index):
+    return num_users // num_workers + (1 if shard_index < num_users % num_workers else 0)
+
+
+def _stop_workers(workers, stop_event):
+    """Asks the workers to stop and waits for them, terminating any that do not stop in time."""
+    stop_event.set()
+    for worker in workers:
+        worker.join(timeout=10)
+        if worker.is_alive():
+            print(f"Worker {worker.name} did not stop in time; terminating.")
+            worker.terminate()
+            worker.join()
+
+
+def run_parallel_simulation(num_workers=None, num_users=None, seed=None, duration_seconds=None):
+    """
+    Runs SIMULATION_MODE across `num_workers` processes, one simulation shard
+    each: the users and the event-time rate are split evenly, and shard i is
+    seeded by (seed, i), so the same seed and worker count always reproduce the
+    same events (in a different order across sinks than a single-process run).
+    `duration_seconds` defaults to config.SIM_DURATION_SECONDS. Returns the
+    number of events written.
+    """
+    num_workers = num_workers or config.NUM_WORKERS
+    num_users = num_users or config.NUM_USERS
+    seed = seed if seed is not None else config.SIM_SEED
+
+    ctx = multiprocessing.get_context("spawn")
+    results_queue = ctx.Queue()
+    stop_event = ctx.Event()
+    workers = []
+    for shard_index in range(num_workers):
+        worker = ctx.Process(
+            target=_simulation_worker_main,
+            args=(shard_index, num_workers, _shard_users(num_users, num_workers, shard_index), seed, duration_seconds,
+                  results_queue, stop_event),
+            name=f"simulation-shard-{shard_index}",
+        )
+        worker.start()
+        workers.append(worker)
+
+    print(f"Started {num_workers} simulation workers (seed {seed}). Press Ctrl+C to stop.")
+    totals = {}
+    try:
+        while len(totals) < num_workers and any(worker.is_alive() for worker in workers):
+            try:
+                shard_index, total = results_queue.get(timeout=config.WORKER_STATS_INTERVAL_SECONDS)
+            except queue.Empty:
+                continue
+            totals[shard_index] = total
+    except KeyboardInterrupt:
+        print("\nStopping simulation workers gracefully...")
+    finally:
+        _stop_workers(workers, stop_event)
+    # Shards stopped early still report their totals on the way out.
+    while True:
+        try:
+            shard_index, total = results_queue.get_nowait()
+        except queue.Empty:
+            break
+        totals[shard_index] = total
+    print(f"Parallel simulation finished: {sum(totals.values()):,} events from {len(totals)} of {num_workers} shards.")
+    return sum(totals.values())
+
+
+def run_parallel(num_workers=None, profile=None, num_users=None):
+    """
+    Runs the generator across `num_workers` processes until Ctrl+C.
+
+    The user population and the traffic profile's rate (default: create_profile())
+    are split evenly across workers. Each worker owns its users' sessions, so one user's events are always
+    produced, in order, by the same process and sink.
+    """
+    num_workers = num_workers or config.NUM_WORKERS
+    profile = profile or create_profile()
+    num_users = num_users or config.NUM_USERS
+
+    # "spawn" keeps workers independent of the parent's Event Hubs client and RNG
+    # state, and is the only start method available on Windows.
+    ctx = multiprocessing.get_context("spawn")
+    stats_queue = ctx.Queue()
+    stop_event = ctx.Event()
+    workers = []
+    for shard_index in range(num_workers):
+        worker = ctx.Process(
+            target=_worker_main,
+            args=(shard_index, num_workers, _shard_users(num_users, num_workers, shard_index), profile, stats_queue,
+                  stop_event),
+            name=f"generator-shard-{shard_index}",
+        )
+        worker.start()
+        workers.append(worker)
+
+    print(f"Started {num_workers} generator workers ({profile}). Press Ctrl+C to stop.")
+    latest = {}
+    try:
+        while any(worker.is_alive() for worker in workers):
+            try:
+                shard_index, seconds, target, sent, lag = stats_queue.get(timeout=config.WORKER_STATS_INTERVAL_SECONDS)
+            except queue.Empty:
+                continue
+            latest[shard_index] = (target / seconds, sent / seconds, lag)
+            if len(latest) == num_workers:
+                total_target = sum(target for target, _, _ in latest.values())
+                total_rate = sum(rate for _, rate, _ in latest.values())
+                max_lag = max(lag for _, _, lag in latest.values())
+                per_worker = ", ".join(f"{i}: {rate:.0f}/s" for i, (_, rate, _) in sorted(latest.items()))
+                print(f"{format_rate_report(1, total_target, total_rate)}, max lag {max_lag:.2f}s ({per_worker})")
+                latest.clear()
+    except KeyboardInterrupt:
+        print("\nStopping generator workers gracefully...")
+    finally:
+        _stop_workers(workers, stop_event)
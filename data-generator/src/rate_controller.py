@@ -0,0 +1,220 @@
+# data_generator/src/rate_controller.py
+
+import math
+import time
+from src import config
+
+
+class ConstantProfile:
+    """Flat `rate` events/sec."""
+    def __init__(self, rate):
+        self.rate = rate
+
+    def rate_at(self, elapsed):
+        return self.rate
+
+    def __str__(self):
+        return f"constant {self.rate:.0f}/s"
+
+
+class DailySineProfile:
+    """
+    Day/night traffic curve around `base_rate`:
+    base_rate * (1 + amplitude * cos(2*pi * (time_of_day - peak_hour) / day)).
+
+    `period_seconds` is how long one simulated day takes, so a full day can be
+    compressed into minutes for capacity tests. The curve starts at the time of
+    day of `start_time` (epoch seconds, default: now).
+    """
+    def __init__(self, base_rate, amplitude=0.5, peak_hour=20, period_seconds=86400, start_time=None):
+        self.base_rate = base_rate
+        self.amplitude = amplitude
+        self.peak_hour = peak_hour
+        self.period_seconds = period_seconds
+        start_time = time.time() if start_time is None else start_time
+        self._start_phase = (start_time % 86400) / 86400
+
+    def rate_at(self, elapsed):
+        day_fraction = self._start_phase + elapsed / self.period_seconds
+        return self.base_rate * (1 + self.amplitude * math.cos(2 * math.pi * (day_fraction - self.peak_hour / 24)))
+
+    def __str__(self):
+        return f"daily sine {self.base_rate:.0f}/s +/-{self.amplitude:.0%}"
+
+
+class StepRampProfile:
+    """Ramps up to `max_rate` in `steps` equal steps, each held for `step_seconds`, then holds."""
+    def __init__(self, max_rate, steps=5, step_seconds=60):
+        self.max_rate = max_rate
+        self.steps = steps
+        self.step_seconds = step_seconds
+
+    def rate_at(self, elapsed):
+        step = min(self.steps, int(elapsed // self.step_seconds) + 1)
+        return self.max_rate * step / self.steps
+
+    def __str__(self):
+        return f"step ramp to {self.max_rate:.0f}/s in {self.steps} x {self.step_seconds}s"
+
+
+class FlashSaleProfile:
+    """
+    `base_rate`, with a burst of `multiplier` x base_rate lasting `duration_seconds`
+    that starts `start_seconds` into every `period_seconds` (once, if no period).
+    """
+    def __init__(self, base_rate, multiplier=10, start_seconds=300, duration_seconds=120, period_seconds=None):
+        self.base_rate = base_rate
+        self.multiplier = multiplier
+        self.start_seconds = start_seconds
+        self.duration_seconds = duration_seconds
+        self.period_seconds = period_seconds
+
+    def rate_at(self, elapsed):
+        if self.period_seconds:
+            elapsed %= self.period_seconds
+        in_burst = self.start_seconds <= elapsed < self.start_seconds + self.duration_seconds
+        return self.base_rate * (self.multiplier if in_burst else 1)
+
+    def __str__(self):
+        return f"flash sale {self.base_rate:.0f}/s, x{self.multiplier} for {self.duration_seconds}s"
+
+
+def create_profile(name=None, rate=None, start_time=None):
+    """
+    Builds the traffic profile `name` (default: config.TRAFFIC_PROFILE) around
+    `rate` events/sec. `start_time` (epoch seconds) anchors the daily curve;
+    simulation mode passes its virtual start time.
+    """
+    name = name or config.TRAFFIC_PROFILE
+    rate = rate if rate is not None else config.TARGET_EVENTS_PER_SECOND
+    if name == "constant":
+        return ConstantProfile(rate)
+    if name == "daily_sine":
+        return DailySineProfile(rate, config.DAILY_SINE_AMPLITUDE, config.DAILY_SINE_PEAK_HOUR,
+                                config.DAILY_SINE_PERIOD_SECONDS, start_time)
+    if name == "step_ramp":
+        return StepRampProfile(rate, config.STEP_RAMP_STEPS, config.STEP_RAMP_STEP_SECONDS)
+    if name == "flash_sale":
+        return FlashSaleProfile(rate, config.FLASH_SALE_MULTIPLIER, config.FLASH_SALE_START_SECONDS,
+                                config.FLASH_SALE_DURATION_SECONDS, config.FLASH_SALE_PERIOD_SECONDS)
+    raise ValueError(f"Unknown traffic profile '{name}'. Choose constant, daily_sine, step_ramp or flash_sale.")
+
+
+class RateController:
+    """
+    Paces the generator loop to a traffic profile with a token bucket.
+
+    Tokens accrue at the profile's current rate for all elapsed time on the
+    monotonic clock, including the time the caller spends generating and
+    sending, so that time is made up for instead of silently lowering the rate.
+    acquire() blocks until roughly one tick's worth of events (rate *
+    `tick_seconds`, at most `max_batch`) is available and returns the batch size
+    to produce. The bucket holds at most `burst_seconds` of traffic, which bounds
+    catch-up after a stall.
+
+    Callers report what was actually sent with record(); every
+    `report_interval_seconds` the target and achieved rates are printed.
+    """
+    def __init__(self, profile, max_batch=None, tick_seconds=None, burst_seconds=1.0,
+                 report_interval_seconds=None, scale=1.0, log_reports=True, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            profile: Traffic profile (see create_profile()).
+            max_batch (int): Largest batch acquire() returns.
+            tick_seconds (float): Target spacing of batches at the current rate.
+            burst_seconds (float): Bucket capacity, in seconds of traffic.
+            report_interval_seconds (float): How often record() reports target vs. achieved.
+            scale (float): Multiplier on the profile rate, e.g. 1/num_workers for one shard.
+            log_reports (bool): Print reports (otherwise they are only returned by record()).
+            clock, sleep: Time source and sleep function (sleep can be an Event.wait).
+        """
+        self.profile = profile
+        self.max_batch = max_batch or config.MAX_EVENTS_PER_BATCH
+        self.tick_seconds = tick_seconds or config.SLEEP_INTERVAL_SECONDS
+        self.burst_seconds = burst_seconds
+        self.report_interval_seconds = report_interval_seconds or config.RATE_REPORT_INTERVAL_SECONDS
+        self.scale = scale
+        self.log_reports = log_reports
+        self.clock = clock
+        self.sleep = sleep
+
+        self.tokens = 0.0
+        self._start = self.clock()
+        self._last_refill = self._start
+        self._window_start = self._start
+        self._window_target = 0.0
+        self._window_sent = 0
+        self.total_sent = 0
+
+    def current_rate(self, now=None):
+        now = self.clock() if now is None else now
+        return max(0.0, self.profile.rate_at(now - self._start) * self.scale)
+
+    def _poll(self):
+        """Refills the bucket. Returns (batch_size, 0) if a batch is due, else (0, seconds_to_wait)."""
+        now = self.clock()
+        rate = self.current_rate(now)
+        credit = rate * (now - self._last_refill)
+        self._last_refill = now
+        self._window_target += credit
+        self.tokens = min(self.tokens + credit, max(rate * self.burst_seconds, self.max_batch))
+
+        wanted = min(self.max_batch, max(1.0, rate * self.tick_seconds))
+        # The slack absorbs rounding in rate * elapsed, which would otherwise ask for a wait
+        # too short to move the clock and spin.
+        if self.tokens >= wanted - 1e-6:
+            batch = min(self.max_batch, max(1, round(self.tokens)))
+            self.tokens -= batch
+            return batch, 0.0
+        wait = (wanted - self.tokens) / rate if rate > 0 else self.tick_seconds
+        return 0, min(wait, self.tick_seconds)
+
+    def acquire(self):
+        """Blocks until a batch is due and returns its size (1..max_batch)."""
+        while True:
+            batch, wait = self._poll()
+            if batch:
+                return batch
+            # An Event.wait() sleep returns True once set: give up with an empty batch.
+            if self.sleep(wait):
+                return 0
+
+    async def acquire_async(self):
+        """acquire() for asyncio loops."""
+        import asyncio
+        while True:
+            batch, wait = self._poll()
+            if batch:
+                return batch
+            await asyncio.sleep(wait)
+
+    def backlog_seconds(self):
+        """How far behind its schedule the caller is: unspent tokens, in seconds of traffic."""
+        rate = self.current_rate()
+        return self.tokens / rate if rate > 0 else 0.0
+
+    def record(self, sent):
+        """
+        Records `sent` delivered events. Once per report interval, returns (and
+        prints, if log_reports) (seconds, target_events, sent_events) for the
+        interval; returns None otherwise.
+        """
+        self._window_sent += sent
+        self.total_sent += sent
+        now = self.clock()
+        elapsed = now - self._window_start
+        if elapsed < self.report_interval_seconds:
+            return None
+        report = (elapsed, self._window_target, self._window_sent)
+        if self.log_reports:
+            print(format_rate_report(*report) + f" - {self.profile}")
+        self._window_start = now
+        self._window_target = 0.0
+        self._window_sent = 0
+        return report
+
+
+def format_rate_report(seconds, target_events, sent_events):
+    target, achieved = target_events / seconds, sent_events / seconds
+    ratio = f" ({achieved / target:.1%})" if target else ""
+    return f"Target {target:,.0f} events/sec, achieved {achieved:,.0f} events/sec{ratio}"
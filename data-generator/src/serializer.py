@@ -0,0 +1,138 @@
+# data_generator/src/serializer.py
+
+import json
+from src.metrics import RATIO_BUCKETS, REGISTRY
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library encoder
+    orjson = None
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+BINARY_CONTENT_TYPE = "application/vnd.clickstream.event+binary" # Length-prefixed wire_format records
+
+# Application property marking packed and binary messages. The Event Hubs Spark
+# connector exposes application properties as the `properties` map column, which
+# is what the bronze notebook checks before splitting or decoding a body.
+FORMAT_PROPERTY = "format"
+PACKED_FORMAT = "ndjson"
+BINARY_FORMAT = "binary"
+ENCODINGS = ("json", "binary")
+
+# Publisher metrics, shared by EventHubPublisher and AsyncEventHubPublisher.
+SERIALIZE_SECONDS = REGISTRY.histogram("serialize_seconds", "Time to encode (and pack) the events of one publish call")
+SERIALIZED_BYTES = REGISTRY.counter("serialized_bytes_total", "Encoded message body bytes")
+BATCH_BUILD_SECONDS = REGISTRY.histogram("batch_build_seconds", "Time to fill one EventDataBatch")
+BATCH_FILL_RATIO = REGISTRY.histogram("batch_fill_ratio", "Batch size at send / max batch size", RATIO_BUCKETS)
+BATCH_SPLITS = REGISTRY.counter("batch_splits_total", "Batches sent early because the next message did not fit")
+SEND_BATCH_SECONDS = REGISTRY.histogram("send_batch_seconds", "send_batch() round trip")
+MESSAGES_SENT = REGISTRY.counter("messages_sent_total", "EventData messages sent")
+BATCHES_SENT = REGISTRY.counter("batches_sent_total", "Batches sent")
+EVENTS_PUBLISHED = REGISTRY.counter("events_published_total", "Events handed to a publisher")
+
+
+def encode_event(event):
+    """Serializes one event to compact JSON bytes (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(event)
+    return json.dumps(event, separators=(",", ":")).encode("utf-8")
+
+
+def get_encoder(encoding):
+    """
+    Per-event encoder for an EVENT_ENCODING: "json" (encode_event) or "binary"
+    (wire_format.encode_framed, length-prefixed records that can be concatenated).
+    """
+    if encoding == "json":
+        return encode_event
+    if encoding == "binary":
+        from src import wire_format  # imports this module
+        return wire_format.encode_framed
+    raise ValueError(f"Unknown event encoding '{encoding}'. Use one of: {', '.join(ENCODINGS)}")
+
+
+def pack_payloads(payloads, max_message_bytes, separator=b"\n"):
+    """
+    Groups encoded events into message bodies of at most `max_message_bytes`
+    each (a single event larger than that gets its own body), joined by
+    `separator`: newline-delimited JSON, or b"" for self-delimiting binary records.
+    """
+    messages = []
+    current = []
+    current_size = 0
+    for payload in payloads:
+        added = len(payload) + (len(separator) if current else 0)
+        if current and current_size + added > max_message_bytes:
+            messages.append(separator.join(current))
+            current = []
+            current_size = 0
+            added = len(payload)
+        current.append(payload)
+        current_size += added
+    if current:
+        messages.append(separator.join(current))
+    return messages
+
+
+def make_event_data(body, packed=False, encoding="json"):
+    """
+    Wraps an encoded body in EventData. Packed and binary bodies are tagged with
+    their content type and format; single JSON events are left untagged, since
+    every extra AMQP property is encoded again for each message and costs more
+    than the body itself at this size (pack binary events to amortize it too).
+    """
+    from azure.eventhub import EventData
+    event_data = EventData(body)
+    if encoding == "binary":
+        event_data.content_type = BINARY_CONTENT_TYPE
+        event_data.properties = {FORMAT_PROPERTY: BINARY_FORMAT}
+    elif packed:
+        event_data.content_type = NDJSON_CONTENT_TYPE
+        event_data.properties = {FORMAT_PROPERTY: PACKED_FORMAT}
+    return event_data
+
+
+def measure_overhead(packed=False, partition_key=None, encoding="json"):
+    """
+    Returns (batch_overhead, message_overhead) in bytes for messages of this shape.
+
+    Measured once against a real EventDataBatch with a body large enough to use
+    the widest length encoding, so it is an upper bound for every body size.
+    """
+    from azure.eventhub import EventDataBatch
+    batch = EventDataBatch(max_size_in_bytes=1024 * 1024, partition_key=partition_key)
+    batch_overhead = batch.size_in_bytes
+    body = b"x" * 1024
+    batch.add(make_event_data(body, packed, encoding))
+    return batch_overhead, batch.size_in_bytes - batch_overhead - len(body)
+
+
+class BatchSizeTracker:
+    """
+    Tracks the encoded size of an EventDataBatch being filled, so callers can
+    start a new batch before an add would overflow instead of catching the
+    ValueError from EventDataBatch.add().
+    """
+    def __init__(self, max_size_in_bytes, packed=False, partition_key=None, encoding="json"):
+        self.max_size_in_bytes = max_size_in_bytes
+        self.batch_overhead, self.message_overhead = measure_overhead(packed, partition_key, encoding)
+        self.size = self.batch_overhead
+        self.count = 0
+
+    def max_body_bytes(self):
+        """Largest body that fits in an otherwise empty batch."""
+        return self.max_size_in_bytes - self.batch_overhead - self.message_overhead
+
+    def fits(self, body_len):
+        return self.count == 0 or self.size + body_len + self.message_overhead <= self.max_size_in_bytes
+
+    def add(self, body_len):
+        self.size += body_len + self.message_overhead
+        self.count += 1
+
+    def reset(self):
+        self.size = self.batch_overhead
+        self.count = 0
+
+    def fill_ratio(self):
+        return self.size / self.max_size_in_bytes
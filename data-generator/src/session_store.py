@@ -0,0 +1,213 @@
+# data_generator/src/session_store.py
+
+import sys
+import time
+from array import array
+import numpy as np
+
+# One NumPy column per session attribute. Strings are never stored here: ids are
+# random integers formatted on output, and categorical values are codes into the
+# vocabularies kept by event_generator.
+SESSION_FIELDS = {
+    "user_key": np.uint32,         # user_{user_key:08x}
+    "session_key": np.uint64,      # session_{session_key:012x}
+    "last_event": np.int8,         # Markov state code
+    "last_page": np.int32,         # Page code
+    "current_product": np.int32,   # Product index, -1 when nothing is being viewed
+    "cart_size": np.int32,
+    "is_new_user": np.bool_,
+    "referral_source": np.int8,
+    "device_type": np.int8,
+    "geo_country": np.int8,
+    "geo_city": np.int16,
+    "os": np.int8,
+    "browser": np.int8,
+    "last_seen": np.float64,       # Store clock reading of the last event
+}
+
+
+class SessionStore:
+    """
+    Bounded, array-backed store of per-user session state.
+
+    Each user occupies a slot; slot attributes live in the NumPy columns listed in
+    SESSION_FIELDS (e.g. `store.last_event[slot]`), and cart contents are kept as
+    arrays of product indices. Live slots are also kept in a dense array so a
+    random active user can be picked in O(1).
+
+    Sessions are evicted when they have been idle longer than `idle_timeout_seconds`
+    (checked every `sweep_interval_seconds`), or, once `max_sessions` is reached,
+    by approximate LRU: the least recently seen of a few randomly sampled sessions
+    makes room for the new one.
+    """
+
+    def __init__(self, max_sessions=None, idle_timeout_seconds=None, initial_capacity=1024,
+                 eviction_sample_size=5, sweep_interval_seconds=None, clock=time.monotonic, rng=None):
+        self.max_sessions = max_sessions
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.eviction_sample_size = eviction_sample_size
+        if sweep_interval_seconds is None and idle_timeout_seconds:
+            sweep_interval_seconds = idle_timeout_seconds / 10
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.clock = clock
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+        self._capacity = 0
+        self._size = 0
+        self._live = np.empty(0, dtype=np.int32)       # position -> slot
+        self._position = np.empty(0, dtype=np.int32)   # slot -> position, -1 when free
+        self._free = np.empty(0, dtype=np.int32)       # stack of free slots
+        self._num_free = 0
+        self.carts = []
+        for name, dtype in SESSION_FIELDS.items():
+            setattr(self, name, np.empty(0, dtype=dtype))
+        self._grow(initial_capacity)
+        self._next_sweep = self.clock() + (self.sweep_interval_seconds or 0)
+
+        self.evictions = 0
+        self.idle_evictions = 0
+        self.lru_evictions = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def live_slots(self):
+        """Slots of all resident sessions (a view; do not hold on to it across updates)."""
+        return self._live[:self._size]
+
+    def _grow(self, new_capacity):
+        """Resizes every column to `new_capacity` slots."""
+        old = self._capacity
+        for name in SESSION_FIELDS:
+            column = getattr(self, name)
+            grown = np.zeros(new_capacity, dtype=column.dtype)
+            grown[:old] = column
+            setattr(self, name, grown)
+        live = np.empty(new_capacity, dtype=np.int32)
+        live[:self._size] = self._live[:self._size]
+        self._live = live
+        position = np.full(new_capacity, -1, dtype=np.int32)
+        position[:old] = self._position
+        self._position = position
+        self.carts.extend([None] * (new_capacity - old))
+        free = np.empty(new_capacity, dtype=np.int32)
+        free[:self._num_free] = self._free[:self._num_free]
+        added = new_capacity - old
+        free[self._num_free:self._num_free + added] = np.arange(new_capacity - 1, old - 1, -1)
+        self._free = free
+        self._num_free += added
+        self._capacity = new_capacity
+
+    def sample_slots(self, k):
+        """Returns `k` slots drawn uniformly (with replacement) from the resident sessions."""
+        return self._live[self.rng.integers(0, self._size, size=k)]
+
+    def random_slot(self, u):
+        """Maps a uniform draw `u` in [0, 1) to a resident slot."""
+        return int(self._live[int(u * self._size)])
+
+    def make_room(self, k):
+        """Evicts sessions (approximate LRU) until `k` more fit under `max_sessions`."""
+        if self.max_sessions is None:
+            return
+        while self._size and self._size + k > self.max_sessions:
+            sample = self.sample_slots(min(self.eviction_sample_size, self._size))
+            self._release(int(sample[np.argmin(self.last_seen[sample])]))
+            self.lru_evictions += 1
+            self.evictions += 1
+
+    def allocate(self, user_key):
+        """Claims a slot for a new user and returns it. Session attributes are left to the caller."""
+        return int(self.allocate_many(np.array([user_key]))[0])
+
+    def allocate_many(self, user_keys):
+        """Claims one slot per entry of `user_keys` and returns the slots as an array."""
+        k = len(user_keys)
+        self.make_room(k)
+        if self._num_free < k:
+            self._grow(max(self._capacity * 2, self._capacity + k - self._num_free))
+        slots = self._free[self._num_free - k:self._num_free][::-1].copy()
+        self._num_free -= k
+        positions = np.arange(self._size, self._size + k, dtype=np.int32)
+        self._live[positions] = slots
+        self._position[slots] = positions
+        self._size += k
+        self.user_key[slots] = user_keys
+        self.last_seen[slots] = self.clock()
+        return slots
+
+    def _release(self, slot):
+        """Frees `slot`, moving the last live slot into its position."""
+        position = self._position[slot]
+        last = self._live[self._size - 1]
+        self._live[position] = last
+        self._position[last] = position
+        self._position[slot] = -1
+        self._size -= 1
+        self.carts[slot] = None
+        self.cart_size[slot] = 0
+        self._free[self._num_free] = slot
+        self._num_free += 1
+
+    def touch(self, slots, now=None):
+        """Marks `slots` as active now and runs an idle sweep when one is due."""
+        now = self.clock() if now is None else now
+        self.last_seen[slots] = now
+        if self.sweep_interval_seconds and now >= self._next_sweep:
+            self.evict_idle(now)
+
+    def evict_idle(self, now=None):
+        """Evicts every session idle for longer than `idle_timeout_seconds`. Returns the count."""
+        if not self.idle_timeout_seconds:
+            return 0
+        now = self.clock() if now is None else now
+        self._next_sweep = now + (self.sweep_interval_seconds or 0)
+        live = self._live[:self._size]
+        idle = live[self.last_seen[live] < now - self.idle_timeout_seconds]
+        for slot in idle.tolist():
+            self._release(slot)
+        self.idle_evictions += len(idle)
+        self.evictions += len(idle)
+        return len(idle)
+
+    # --- Carts (product indices) ---
+
+    def cart(self, slot):
+        """Returns the product indices in the cart of `slot` (empty sequence if none)."""
+        return self.carts[slot] or ()
+
+    def cart_add(self, slot, product):
+        if self.carts[slot] is None:
+            self.carts[slot] = array("i")
+        self.carts[slot].append(product)
+        self.cart_size[slot] += 1
+
+    def cart_pop(self, slot, index):
+        self.cart_size[slot] -= 1
+        return self.carts[slot].pop(index)
+
+    def cart_clear(self, slot):
+        self.carts[slot] = None
+        self.cart_size[slot] = 0
+
+    # --- Introspection ---
+
+    def resident_bytes(self):
+        """Approximate memory held by the store: columns, slot bookkeeping and carts."""
+        total = sum(getattr(self, name).nbytes for name in SESSION_FIELDS)
+        total += self._live.nbytes + self._position.nbytes + self._free.nbytes
+        total += sys.getsizeof(self.carts)
+        total += sum(sys.getsizeof(cart) for cart in self.carts if cart is not None)
+        return total
+
+    def stats(self):
+        """Counters for monitoring."""
+        return {
+            "active_sessions": self._size,
+            "capacity": self._capacity,
+            "evictions": self.evictions,
+            "idle_evictions": self.idle_evictions,
+            "lru_evictions": self.lru_evictions,
+            "resident_bytes": self.resident_bytes(),
+        }
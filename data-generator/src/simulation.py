@@ -0,0 +1,128 @@
+# data_generator/src/simulation.py
+
+import datetime
+import time
+import numpy as np
+from src import config
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def format_timestamp(epoch_us):
+    """Formats epoch microseconds like the live generator: 2024-01-01T00:00:00.000000Z."""
+    return (_EPOCH + datetime.timedelta(microseconds=int(epoch_us))).isoformat(timespec="microseconds") + "Z"
+
+
+def format_timestamps(epoch_us):
+    """Vectorized format_timestamp() for an int64 array of epoch microseconds."""
+    return [ts + "Z" for ts in np.datetime_as_string(epoch_us.astype("datetime64[us]"), unit="us").tolist()]
+
+
+def parse_timestamp(value):
+    """Parses an ISO-8601 UTC time ("2024-01-01T00:00:00", optional "Z") to epoch seconds."""
+    parsed = datetime.datetime.fromisoformat(value.rstrip("Z"))
+    return (parsed - _EPOCH).total_seconds()
+
+
+class SimulationClock:
+    """
+    Virtual event-time clock for simulation mode.
+
+    Events arrive as a Poisson process: each call to advance() moves the clock
+    forward by exponentially distributed gaps whose mean follows the traffic
+    profile's rate at the current virtual time, so a week of traffic with
+    realistic gaps is produced as fast as the generator can run. now() is in
+    virtual epoch seconds and doubles as the SessionStore clock, so idle session
+    timeouts are measured in event time too.
+    """
+    def __init__(self, start, profile, seed=None):
+        """
+        Args:
+            start (float): Virtual start time, epoch seconds.
+            profile: Traffic profile (rate_at(elapsed_seconds) -> events/sec).
+            seed: Seed (int or sequence of ints) for the gap draws; None for a random stream.
+        """
+        self.start = start
+        self.profile = profile
+        self.rng = np.random.default_rng(np.random.SeedSequence(seed).spawn(1)[0])
+        self._now_us = float(round(start * 1_000_000))
+
+    def now(self):
+        return self._now_us / 1_000_000
+
+    def elapsed(self):
+        return self.now() - self.start
+
+    def current_rate(self):
+        # Clamp so a profile trough of 0 events/sec pauses traffic instead of dividing by zero.
+        return max(self.profile.rate_at(self.elapsed()), 1e-3)
+
+    def advance(self, n):
+        """Returns the next `n` event times as int64 epoch microseconds, moving the clock past them."""
+        gaps = self.rng.exponential(1_000_000 / self.current_rate(), size=n)
+        # Accumulated in float microseconds from the current time, one gap at a time, so the
+        # times do not depend on how the draws are split into calls (batch or per-event path).
+        times = np.cumsum(np.concatenate(([self._now_us], gaps)))[1:]
+        if n:
+            self._now_us = float(times[-1])
+        return times.astype(np.int64)
+
+    def next_timestamp(self):
+        return format_timestamp(self.advance(1)[0])
+
+
+def run_simulation(sink=None, seed=None, start=None, duration_seconds=None, events_per_second=None,
+                   profile_name=None, batch_size=None, disorder=None, shard_index=0, num_shards=1, num_users=None,
+                   should_stop=None):
+    """
+    Generates `duration_seconds` of event-time traffic as fast as possible and
+    writes it to `sink` (default: create_sink()). The same seed always produces
+    the same event stream. `disorder` (a disorder.Disorder; default: from the
+    DISORDER_* settings) delays, replays and duplicates deliveries. Returns the
+    number of events written.
+
+    With `num_shards` > 1 this runs shard `shard_index` of a parallel simulation
+    (see parallel.run_parallel_simulation): `num_users` users of its own
+    (default: config.NUM_USERS) at 1/num_shards of the rate, on a clock seeded
+    by (seed, shard_index), so every shard is reproducible on its own.
+    `should_stop` is polled between batches to end the run early.
+    """
+    from src import event_generator
+    from src.rate_controller import create_profile
+    from src.sinks import create_sink
+
+    seed = seed if seed is not None else config.SIM_SEED
+    start = parse_timestamp(start or config.SIM_START)
+    duration_seconds = duration_seconds or config.SIM_DURATION_SECONDS
+    events_per_second = events_per_second or config.SIM_EVENTS_PER_SECOND
+    batch_size = batch_size or config.SIM_BATCH_SIZE
+    num_users = num_users or config.NUM_USERS
+    end = start + duration_seconds
+
+    profile = create_profile(profile_name, events_per_second / num_shards, start_time=start)
+    clock = SimulationClock(start, profile, seed=seed if num_shards == 1 else [seed, shard_index])
+    event_generator.reset_sessions(num_users, shard_index=shard_index, num_shards=num_shards, seed=seed, clock=clock,
+                                   disorder=disorder)
+    sink = sink or create_sink()
+
+    shard = f"shard {shard_index}/{num_shards}, " if num_shards > 1 else ""
+    print(f"Simulating {duration_seconds / 3600:.1f}h of event time from {format_timestamp(start * 1_000_000)} "
+          f"({clock.profile}, {shard}seed {seed}).")
+    total = 0
+    wall_start = time.monotonic()
+    next_report = wall_start + config.RATE_REPORT_INTERVAL_SECONDS
+    try:
+        while clock.now() < end and not (should_stop and should_stop()):
+            # Size the last batch so the run ends close to `end` instead of a full batch past it.
+            remaining = int((end - clock.now()) * clock.current_rate()) + 1
+            events = event_generator.generate_clickstream_events(min(batch_size, remaining))
+            total += sink.publish_events(events)
+            if time.monotonic() >= next_report:
+                print(f"Simulated up to {format_timestamp(clock.now() * 1_000_000)}: {total:,} events, "
+                      f"{total / (time.monotonic() - wall_start):,.0f} events/sec")
+                next_report += config.RATE_REPORT_INTERVAL_SECONDS
+        total += sink.publish_events(event_generator.flush_delayed_events())
+    finally:
+        sink.close()
+    print(f"Simulation finished: {total:,} events in {time.monotonic() - wall_start:.1f}s.")
+    return total
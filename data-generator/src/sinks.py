@@ -0,0 +1,303 @@
+# data_generator/src/sinks.py
+
+import bisect
+import gzip
+import itertools
+import os
+import time
+import uuid
+from src import config
+from src.serializer import encode_event
+
+
+class Sink:
+    """
+    Destination for generated events.
+
+    Implementations take lists of event dicts in publish_events() and must
+    release their resources in close(). Select one with create_sink().
+    """
+    def publish_events(self, events):
+        """Writes/sends `events` (list of dicts). Returns the number of events accepted."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class EventHubSink(Sink):
+    """Sends events to Azure Event Hubs through EventHubPublisher."""
+
+    def __init__(self, producer=None, packed=None, encoding=None):
+        from src.eventhub_publisher import EventHubPublisher
+        self.publisher = EventHubPublisher(producer=producer, packed=packed, encoding=encoding)
+
+    def publish_events(self, events):
+        return self.publisher.publish_events(events) or 0
+
+    def close(self):
+        self.publisher.close()
+
+
+class _RotatingFileSink(Sink):
+    """
+    Common buffering, partitioning and rotation logic for the file sinks.
+
+    Events are partitioned Hive-style by event date
+    (`<output_dir>/event_date=YYYY-MM-DD/part-*.ext`), so Spark's file source
+    picks the directory up directly and exposes `event_date` as a column. Files
+    are written under a "." prefixed name, which Spark ignores, and renamed to
+    their final name when rotated, so a streaming reader never sees a partial
+    file. A file is rotated once it reaches `max_file_bytes` or has been open
+    for `rotate_seconds`.
+
+    A flush that would take a file past `max_file_bytes` is split across files.
+    Uncompressed NDJSON is split on exact line sizes; compressed output in
+    chunks sized from the bytes per event written so far, so those files can
+    end up a few percent larger (the estimate's error, plus the gzip trailer or
+    Parquet footer).
+    """
+    extension = ""
+
+    def __init__(self, output_dir=None, max_file_bytes=None, rotate_seconds=None, buffer_events=None):
+        self.output_dir = output_dir or config.OUTPUT_DIR
+        self.max_file_bytes = max_file_bytes or config.FILE_ROTATE_BYTES
+        self.rotate_seconds = rotate_seconds or config.FILE_ROTATE_SECONDS
+        self.buffer_events = buffer_events or config.FILE_BUFFER_EVENTS
+        self._buffers = {}  # event_date -> [events]
+        self._buffered = 0
+        self._files = {}    # event_date -> open file state (see _open_file)
+        self._event_bytes = None  # bytes per event written, to size chunks
+        self.files_written = 0
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def publish_events(self, events):
+        for event in events:
+            event_date = (event.get("timestamp") or "")[:10] or "unknown"
+            self._buffers.setdefault(event_date, []).append(event)
+        self._buffered += len(events)
+        if self._buffered >= self.buffer_events:
+            self.flush()
+        else:
+            self._rotate_expired()
+        return len(events)
+
+    def flush(self):
+        """Writes all buffered events to their partition files."""
+        for event_date, events in self._buffers.items():
+            if events:
+                self._write_partition(event_date, events)
+        self._buffers = {}
+        self._buffered = 0
+        self._rotate_expired()
+
+    def _write_partition(self, event_date, events):
+        """Writes `events` to the partition's file, starting a new one each time it fills up."""
+        records = self._encode(events)
+        sizes = self._record_sizes(records)
+        ends = list(itertools.accumulate(sizes)) if sizes is not None else None
+        if self._event_bytes is None:
+            # JSON size: exact for NDJSON, an overestimate for compressed output.
+            self._event_bytes = sizes[0] if sizes is not None else len(encode_event(events[0])) + 1
+        start = 0
+        while start < len(records):
+            state = self._files.get(event_date)
+            if state is None:
+                state = self._files[event_date] = self._open_file(event_date)
+            size = self._file_size(state)
+            room = self.max_file_bytes - size
+            if ends is not None:
+                offset = ends[start - 1] if start else 0
+                count = bisect.bisect_right(ends, offset + room, lo=start) - start
+            else:
+                count = int(room // self._event_bytes)
+            if size and count < 1:
+                self._finish(event_date)
+                continue
+            count = min(max(1, count), len(records) - start)
+            self._write(state, records[start:start + count])
+            written = self._file_size(state) - size
+            if written > 0:
+                self._event_bytes = written / count
+            start += count
+            if self._file_size(state) >= self.max_file_bytes:
+                self._finish(event_date)
+
+    def _rotate_expired(self):
+        now = time.monotonic()
+        for event_date in [d for d, state in self._files.items() if now - state["opened"] >= self.rotate_seconds]:
+            self._finish(event_date)
+
+    def _open_file(self, event_date):
+        directory = os.path.join(self.output_dir, f"event_date={event_date}")
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}{self.extension}"
+        return {
+            "path": os.path.join(directory, name),
+            "tmp_path": os.path.join(directory, "." + name),
+            "opened": time.monotonic(),
+        }
+
+    def _finish(self, event_date):
+        state = self._files.pop(event_date)
+        self._close_file(state)
+        os.replace(state["tmp_path"], state["path"])
+        self.files_written += 1
+
+    def close(self):
+        self.flush()
+        for event_date in list(self._files):
+            self._finish(event_date)
+        print(f"{type(self).__name__} closed: {self.files_written} files written to {self.output_dir}")
+
+    # Format-specific hooks
+    def _encode(self, events):
+        """The records _write() takes for `events` (one per event)."""
+        return events
+
+    def _record_sizes(self, records):
+        """Exact bytes each record adds to the file, or None when that is only known after writing."""
+        return None
+
+    def _write(self, state, records):
+        raise NotImplementedError
+
+    def _file_size(self, state):
+        raise NotImplementedError
+
+    def _close_file(self, state):
+        raise NotImplementedError
+
+
+class NdjsonFileSink(_RotatingFileSink):
+    """
+    Writes events as newline-delimited JSON, optionally gzip-compressed.
+
+    The lines are encoded exactly like EventHubPublisher message bodies, so the
+    bronze `from_json` parsing works on them unchanged
+    (spark.readStream.format("text") or format("json") with clickstreamSchema).
+    """
+    def __init__(self, compression=None, **kwargs):
+        self.compression = compression if compression is not None else config.FILE_COMPRESSION
+        if self.compression not in (None, "", "gzip"):
+            raise ValueError(f"Unsupported NDJSON compression: {self.compression}")
+        self.extension = ".ndjson.gz" if self.compression == "gzip" else ".ndjson"
+        super().__init__(**kwargs)
+
+    def _encode(self, events):
+        return [encode_event(event) + b"\n" for event in events]
+
+    def _record_sizes(self, records):
+        return None if self.compression else [len(line) for line in records]
+
+    def _write(self, state, records):
+        if "file" not in state:
+            raw = open(state["tmp_path"], "wb")
+            state["raw"] = raw
+            state["file"] = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) if self.compression else raw
+        state["file"].write(b"".join(records))
+        if self.compression:
+            state["file"].flush()  # so the file size includes what zlib has buffered
+
+    def _file_size(self, state):
+        return state["raw"].tell() if "raw" in state else 0
+
+    def _close_file(self, state):
+        state["file"].close()
+        state["raw"].close()
+
+
+class ParquetFileSink(_RotatingFileSink):
+    """
+    Writes events to Parquet via PyArrow, one row group per flush.
+
+    Columns follow the bronze clickstreamSchema, plus disorder.TRUTH_COLUMNS
+    (null unless disorder injection is on). `product_price` is a double with
+    from_json's rule for the JSON sinks: a number is kept, anything else (the
+    one-element lists the generator sends for single-item events) is null, so
+    a backfill from Parquet gives the same bronze and silver as NDJSON or
+    Event Hubs.
+
+    Each chunk of a flush is written as a row group straight to the file, so
+    files rotate on the bytes actually written (compressed, before the footer).
+    """
+    extension = ".parquet"
+
+    def __init__(self, compression=None, **kwargs):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("ParquetFileSink requires pyarrow (pip install pyarrow)") from e
+        self._pa = pa
+        self._pq = pq
+        self.compression = compression or config.FILE_COMPRESSION or "snappy"
+        self.schema = pa.schema([
+            ("user_id", pa.string()),
+            ("session_id", pa.string()),
+            ("timestamp", pa.string()),
+            ("event_type", pa.string()),
+            ("page_url", pa.string()),
+            ("product_id", pa.list_(pa.string())),
+            ("product_name", pa.list_(pa.string())),
+            ("product_brand", pa.list_(pa.string())),
+            ("product_price", pa.float64()),
+            ("category", pa.string()),
+            ("browser", pa.string()),
+            ("os", pa.string()),
+            ("ip_address", pa.string()),
+            ("referral_source", pa.string()),
+            ("device_type", pa.string()),
+            ("geo_country", pa.string()),
+            ("geo_city", pa.string()),
+            ("is_new_user", pa.bool_()),
+            ("cart_size", pa.int32()),
+            # Ground truth of disorder injection (src/disorder.py), null without it.
+            ("lateness_ms", pa.int64()),
+            ("is_duplicate", pa.bool_()),
+            ("is_replay", pa.bool_()),
+        ])
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def _price(value):
+        return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+    def _write(self, state, events):
+        if "writer" not in state:
+            state["file"] = self._pa.OSFile(state["tmp_path"], "wb")
+            state["writer"] = self._pq.ParquetWriter(state["file"], self.schema, compression=self.compression)
+        columns = {name: [event.get(name) for event in events] for name in self.schema.names}
+        columns["product_price"] = [self._price(value) for value in columns["product_price"]]
+        table = self._pa.table(columns, schema=self.schema)
+        state["writer"].write_table(table)
+
+    def _file_size(self, state):
+        return state["file"].tell() if "file" in state else 0
+
+    def _close_file(self, state):
+        state["writer"].close()
+        state["file"].close()
+
+
+SINKS = {
+    "eventhub": EventHubSink,
+    "ndjson": NdjsonFileSink,
+    "parquet": ParquetFileSink,
+}
+
+
+def create_sink(name=None, outbox_dir=None, **kwargs):
+    """
+    Builds the sink named `name` (default: config.SINK). With config.USE_OUTBOX
+    the eventhub sink is wrapped in an Outbox kept in `outbox_dir`
+    (default: config.OUTBOX_DIR).
+    """
+    name = name or config.SINK
+    if name not in SINKS:
+        raise ValueError(f"Unknown sink '{name}'. Choose one of: {', '.join(SINKS)}")
+    sink = SINKS[name](**kwargs)
+    if config.USE_OUTBOX and name == "eventhub":
+        from src.outbox import Outbox
+        return Outbox(sink, directory=outbox_dir)
+    return sink
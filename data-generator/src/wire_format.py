@@ -0,0 +1,209 @@
+# data_generator/src/wire_format.py
+#
+# Binary event encoding (EVENT_ENCODING = "binary"), versioned by
+# schemas/clickstream_event.json and decoded in bronze by
+# pipeline/clickstream_pipeline/wire_format.py.
+#
+# Record layout (little-endian):
+#   u8 schema version | fixed block | string bytes | escaped enum values
+#
+# The fixed block holds every field of that version, in schema order:
+#   string       u16 byte length (0xFFFF: null)
+#   string_list  u8 item count (0xFF: null), u16 byte length of the items joined by "\x1f"
+#   enum         u8 code: 0 null, 1..n the symbols, 255 a value outside the symbols
+#   timestamp    i64 microseconds since the Unix epoch, UTC (INT64_MIN: null)
+#   double       u8 tag (0 null, 1 number, 2 one-element array) + f64
+#   boolean      u8: 0 null, 1 false, 2 true
+#   int          i32 (INT32_MIN: null)
+#   long         i64 (INT64_MIN: null)
+# It is followed by the bytes of the string and string_list fields in field
+# order, then, for each enum coded 255, its value as u16 length + bytes.
+#
+# An event that does not fit the layout (a value of an unexpected type, a
+# string over 64 KiB, ...) is written as version 0: the JSON encoding of the
+# whole event, which bronze parses like any JSON message. In a message body
+# every record is preceded by its length (unsigned LEB128), so a packed body is
+# just records back to back.
+
+import datetime
+import json
+import os
+import struct
+
+from src.serializer import encode_event
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                           "schemas", "clickstream_event.json")
+
+JSON_VERSION = 0
+LIST_SEPARATOR = "\x1f"
+
+_NULL_LENGTH = 0xFFFF
+_NULL_COUNT = 0xFF
+_ESCAPE = 255
+_INT32_MIN, _INT32_MAX = -2**31, 2**31 - 1
+_INT64_MIN, _INT64_MAX = -2**63, 2**63 - 1
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+# struct codes of each field type's slots in the fixed block.
+FIXED_FORMATS = {
+    "string": "H",
+    "string_list": "BH",
+    "enum": "B",
+    "timestamp": "q",
+    "double": "Bd",
+    "boolean": "B",
+    "int": "i",
+    "long": "q",
+}
+
+
+class _Unencodable(Exception):
+    """The event does not fit the binary layout and is sent as JSON instead."""
+
+
+def load_schema(path=SCHEMA_PATH):
+    """Parsed schema file: {version: [field dicts]}."""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    return {entry["version"]: entry["fields"] for entry in spec["versions"]}
+
+
+def _timestamp_micros(value):
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise _Unencodable(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)  # bronze reads zone-less times as UTC
+    return (parsed - _EPOCH) // _MICROSECOND
+
+
+class RecordWriter:
+    """Encodes event dicts with one schema version (see the layout above)."""
+
+    def __init__(self, version, fields):
+        self.version = version
+        self.fields = [(field["name"], field["type"],
+                        dict({None: 0}, **{symbol: code for code, symbol in enumerate(field.get("symbols", []), 1)}))
+                       for field in fields]
+        self._struct = struct.Struct("<B" + "".join(FIXED_FORMATS[kind] for _, kind, _ in self.fields))
+
+    def encode(self, event):
+        """One record (without the length prefix). Raises _Unencodable when the event does not fit."""
+        fixed = [self.version]
+        strings = []
+        escapes = []
+        get = event.get
+        for name, kind, codes in self.fields:
+            value = get(name)
+            if value is None:
+                fixed.extend(_NULLS[kind])
+            elif kind == "enum":
+                if type(value) is not str:
+                    raise _Unencodable(name)
+                code = codes.get(value)
+                if code is None:
+                    data = value.encode("utf-8")
+                    if len(data) >= _NULL_LENGTH:
+                        raise _Unencodable(name)
+                    escapes.append(struct.pack("<H", len(data)) + data)
+                    code = _ESCAPE
+                fixed.append(code)
+            elif kind == "string":
+                if type(value) is not str:
+                    raise _Unencodable(name)
+                data = value.encode("utf-8")
+                if len(data) >= _NULL_LENGTH:
+                    raise _Unencodable(name)
+                fixed.append(len(data))
+                strings.append(data)
+            elif kind == "string_list":
+                if type(value) is not list or len(value) >= _NULL_COUNT \
+                        or not all(type(item) is str and LIST_SEPARATOR not in item for item in value):
+                    raise _Unencodable(name)
+                data = LIST_SEPARATOR.join(value).encode("utf-8")
+                if len(data) >= _NULL_LENGTH:
+                    raise _Unencodable(name)
+                fixed.append(len(value))
+                fixed.append(len(data))
+                strings.append(data)
+            elif kind == "timestamp":
+                if type(value) is not str:
+                    raise _Unencodable(name)
+                fixed.append(_timestamp_micros(value))
+            elif kind == "double":
+                if type(value) is float or type(value) is int:
+                    fixed.append(1)
+                elif type(value) is list and len(value) == 1 and type(value[0]) in (float, int):
+                    fixed.append(2)
+                    value = value[0]
+                else:
+                    raise _Unencodable(name)
+                fixed.append(float(value))
+            elif kind == "boolean":
+                if type(value) is not bool:
+                    raise _Unencodable(name)
+                fixed.append(2 if value else 1)
+            elif kind == "int":
+                if type(value) is not int or not _INT32_MIN < value <= _INT32_MAX:
+                    raise _Unencodable(name)
+                fixed.append(value)
+            else:  # long
+                if type(value) is not int or not _INT64_MIN < value <= _INT64_MAX:
+                    raise _Unencodable(name)
+                fixed.append(value)
+        try:
+            return self._struct.pack(*fixed) + b"".join(strings) + b"".join(escapes)
+        except (struct.error, OverflowError):  # e.g. a timestamp outside the int64 range
+            raise _Unencodable(self.version)
+
+
+_NULLS = {
+    "string": (_NULL_LENGTH,),
+    "string_list": (_NULL_COUNT, 0),
+    "enum": (0,),
+    "timestamp": (_INT64_MIN,),
+    "double": (0, 0.0),
+    "boolean": (0,),
+    "int": (_INT32_MIN,),
+    "long": (_INT64_MIN,),
+}
+
+
+def frame(record):
+    """Prefixes a record with its length (unsigned LEB128)."""
+    n = len(record)
+    if n < 0x80:
+        return bytes((n,)) + record
+    prefix = bytearray()
+    while n >= 0x80:
+        prefix.append((n & 0x7F) | 0x80)
+        n >>= 7
+    prefix.append(n)
+    return bytes(prefix) + record
+
+
+SCHEMA = load_schema()
+WRITER_VERSION = max(SCHEMA)
+_writer = RecordWriter(WRITER_VERSION, SCHEMA[WRITER_VERSION])
+# Version 1 lacks the disorder ground truth (version 2's lateness_ms, is_duplicate
+# and is_replay); events without it are written as version 1, 10 bytes shorter.
+_plain_writer = RecordWriter(1, SCHEMA[1])
+
+
+def encode_record(event):
+    """
+    One event as a binary record of the latest schema version, or of version 1
+    when it carries no disorder ground truth (JSON record if it does not fit).
+    """
+    try:
+        return (_writer if "lateness_ms" in event else _plain_writer).encode(event)
+    except _Unencodable:
+        return bytes((JSON_VERSION,)) + encode_event(event)
+
+
+def encode_framed(event):
+    """encode_record() with its length prefix: a message body, or one entry of a packed body."""
+    return frame(encode_record(event))
@@ -0,0 +1,9 @@
+# data_generator/tests/conftest.py
+#
+# Makes the generator's src package importable, like the benchmarks do.
+# Run from the data-generator directory:  python -m pytest tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,139 @@
+# data_generator/tests/test_async_eventhub_publisher.py
+
+import asyncio
+import json
+import random
+
+import pytest
+from azure.eventhub.exceptions import EventHubError
+
+from src.async_eventhub_publisher import AsyncEventHubPublisher
+from src.fake_producer import FakeAsyncEventHubProducer
+
+
+class _RecordingProducer(FakeAsyncEventHubProducer):
+    """Keeps every delivered event per partition and the most concurrent sends seen per partition."""
+
+    def __init__(self, max_jitter_seconds=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.max_jitter_seconds = max_jitter_seconds
+        self._jitter = random.Random(0)
+        self.delivered = {}
+        self.sending = {}
+        self.max_concurrent = {}
+
+    async def send_batch(self, batch):
+        partition = batch._partition_id
+        self.sending[partition] = self.sending.get(partition, 0) + 1
+        self.max_concurrent[partition] = max(self.max_concurrent.get(partition, 0), self.sending[partition])
+        try:
+            await asyncio.sleep(self._jitter.random() * self.max_jitter_seconds)
+            await super().send_batch(batch)
+        finally:
+            self.sending[partition] -= 1
+        self.delivered.setdefault(partition, []).extend(json.loads(e.body_as_str()) for e in batch._internal_events)
+
+
+def _events(sessions, per_session):
+    return [{"session_id": f"session_{s}", "seq": i} for i in range(per_session) for s in range(sessions)]
+
+
+def _publisher(producer, **kwargs):
+    return AsyncEventHubPublisher(producer=producer, encoding="json", max_in_flight=4, max_batch_events=20,
+                                  linger_seconds=0.01, retry_base_seconds=0.001, **kwargs)
+
+
+def test_each_partition_sends_one_batch_at_a_time_in_order():
+    producer = _RecordingProducer(max_jitter_seconds=0.005, partition_count=4)
+
+    async def run():
+        publisher = _publisher(producer)
+        await publisher.start()
+        for start in range(0, 2000, 100):
+            await publisher.publish_events(_events(50, 40)[start:start + 100])
+        await publisher.close()
+        return publisher.stats()
+
+    stats = asyncio.run(run())
+    assert stats["sent_events"] == 2000 and stats["failed_events"] == 0
+    assert max(producer.max_concurrent.values()) == 1
+    assert max(producer.sending.values()) == 0
+    sessions = {}
+    for partition, events in producer.delivered.items():
+        for event in events:
+            seen = sessions.setdefault(event["session_id"], (partition, []))
+            assert seen[0] == partition  # a session never changes partition
+            seen[1].append(event["seq"])
+    assert len(sessions) == 50
+    assert all(seqs == list(range(40)) for _, seqs in sessions.values())
+
+
+def test_failed_sends_are_retried_then_counted_and_raised():
+    producer = _RecordingProducer(partition_count=2)
+    producer.fail_for(60)
+
+    async def run():
+        publisher = _publisher(producer, send_retries=2)
+        await publisher.start()
+        await publisher.publish_events(_events(10, 10))
+        with pytest.raises(EventHubError):
+            await publisher.flush()
+        stats = publisher.stats()
+        await publisher.close()  # the failure was already raised by flush()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["sent_events"] == 0
+    assert stats["failed_events"] == 100
+    assert stats["retried_sends"] == 2 * stats["failed_batches"]
+    assert producer.failed_sends == 3 * stats["failed_batches"]
+
+
+def test_send_failure_is_raised_from_the_next_publish():
+    producer = _RecordingProducer(partition_count=1)
+    producer.fail_for(60)
+
+    async def run():
+        publisher = _publisher(producer, send_retries=0)
+        await publisher.start()
+        await publisher.publish_events(_events(1, 20))  # fills one batch
+        await asyncio.sleep(0.05)
+        with pytest.raises(EventHubError):
+            await publisher.publish_events(_events(1, 1))
+        producer.fail_for(0)
+        await publisher.close()
+
+    asyncio.run(run())
+
+
+def test_transient_failures_recover_without_losing_events():
+    producer = _RecordingProducer(partition_count=4, failure_rate=0.3, seed=1)
+
+    async def run():
+        publisher = _publisher(producer, send_retries=10)
+        await publisher.start()
+        await publisher.publish_events(_events(20, 20))
+        await publisher.close()
+        return publisher.stats()
+
+    stats = asyncio.run(run())
+    assert stats["retried_sends"] > 0
+    assert stats["sent_events"] == 400 and stats["failed_events"] == 0
+    assert sum(len(events) for events in producer.delivered.values()) == 400
+
+
+def test_linger_flushes_keep_order_when_the_queue_is_full():
+    # Slow sends and a one-batch queue: linger flushes wait on a full queue while publish() flushes too.
+    producer = _RecordingProducer(max_jitter_seconds=0.004, partition_count=1)
+
+    async def run():
+        publisher = AsyncEventHubPublisher(producer=producer, encoding="json", max_in_flight=1, max_batch_events=7,
+                                           linger_seconds=0.001, max_queued_batches=1)
+        await publisher.start()
+        for start in range(0, 600, 3):
+            await publisher.publish_events([{"session_id": "session_0", "seq": i} for i in range(start, start + 3)])
+            await asyncio.sleep(0.0005)
+        await publisher.close()
+
+    asyncio.run(run())
+    assert [event["seq"] for event in producer.delivered["0"]] == list(range(600))
@@ -0,0 +1,164 @@
+# data_generator/tests/test_disorder.py
+#
+# Disorder injection: events come out in arrival order, every generated event
+# is delivered (once, plus its duplicate if any), per-session event-time order
+# is recoverable from the delivered events, the ground-truth columns agree with
+# the delivery order, and duplicate and partition-drop rates follow the
+# settings. Runs the generator on a simulation clock, so event time is seeded.
+
+import json
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from src import event_generator
+from src.disorder import TRUTH_COLUMNS, Disorder, _epoch_micros
+from src.rate_controller import create_profile
+from src.simulation import SimulationClock, format_timestamp, parse_timestamp
+
+SEED = 3
+NUM_USERS = 200
+EVENTS = 20_000
+BATCH = 1000
+EVENTS_PER_SECOND = 2
+START = parse_timestamp("2024-01-01T00:00:00")
+
+
+def _reset(disorder=None):
+    clock = SimulationClock(START, create_profile("constant", EVENTS_PER_SECOND, start_time=START), seed=SEED)
+    event_generator.reset_sessions(NUM_USERS, seed=SEED, clock=clock, disorder=disorder)
+
+
+def _key(event):
+    """The generated fields of an event, hashable."""
+    return json.dumps({name: value for name, value in event.items() if name not in TRUTH_COLUMNS}, sort_keys=True)
+
+
+def _generated():
+    """The seeded stream without disorder, in generation order."""
+    _reset()
+    return [event for _ in range(EVENTS // BATCH) for event in event_generator.generate_clickstream_events(BATCH)]
+
+
+def _delivered(disorder):
+    """The same stream through `disorder`, in delivery order, flushed at the end."""
+    _reset(disorder)
+    delivered = [event for _ in range(EVENTS // BATCH) for event in event_generator.generate_clickstream_events(BATCH)]
+    delivered += event_generator.flush_delayed_events()
+    assert len(disorder) == 0
+    return delivered
+
+
+@pytest.fixture(scope="module")
+def generated():
+    return _generated()
+
+
+def _assert_ground_truth(delivered):
+    """lateness_ms is how far the latest event time delivered before (or with) each event is ahead of it."""
+    latest = None
+    for event, event_time in zip(delivered, _epoch_micros([event["timestamp"] for event in delivered]).tolist()):
+        latest = event_time if latest is None else max(latest, event_time)
+        assert event["lateness_ms"] == (latest - event_time) // 1000
+        assert isinstance(event["is_duplicate"], bool) and isinstance(event["is_replay"], bool)
+
+
+def _assert_same_events(generated, delivered):
+    """Every generated event is delivered exactly once as an original; duplicates are copies of one."""
+    originals = [event for event in delivered if not event["is_duplicate"]]
+    assert Counter(map(_key, originals)) == Counter(map(_key, generated))
+    keys = set(map(_key, generated))
+    assert all(_key(event) in keys for event in delivered if event["is_duplicate"])
+    # Per session, the originals sorted by event time are the generated session, event for event.
+    sessions = {}
+    for event in generated:
+        sessions.setdefault(event["session_id"], []).append(_key(event))
+    recovered = {}
+    for event in sorted(originals, key=lambda event: event["timestamp"]):
+        recovered.setdefault(event["session_id"], []).append(_key(event))
+    assert recovered == sessions
+
+
+def test_arrival_order_and_hold_back():
+    disorder = Disorder(delay="exponential", delay_seconds=10, duplicate_rate=0, partition_drop_interval_seconds=0)
+    delays = iter([[0, 25_000_000, 5_000_000], [0, 0]])
+    disorder._delays = lambda n: np.array(next(delays), dtype=np.int64)
+    first = [{"session_id": f"s{i}", "timestamp": format_timestamp(START * 1_000_000 + i * 1_000_000)}
+             for i in range(3)]
+    # Clock at 2 s: only s0 (no delay) is due; s1 is due at 26 s, s2 at 7 s.
+    assert [event["session_id"] for event in disorder.apply(first)] == ["s0"]
+    assert len(disorder) == 2
+    later = [{"session_id": "s3", "timestamp": format_timestamp(START * 1_000_000 + 10_000_000)},
+             {"session_id": "s4", "timestamp": format_timestamp(START * 1_000_000 + 30_000_000)}]
+    # Clock at 30 s: everything is due, in arrival order 7 s, 10 s, 26 s, 30 s.
+    delivered = disorder.apply(later)
+    assert [event["session_id"] for event in delivered] == ["s2", "s3", "s1", "s4"]
+    assert [event["lateness_ms"] for event in delivered] == [0, 0, 9000, 0]
+    assert len(disorder) == 0 and disorder.flush() == []
+
+
+@pytest.mark.parametrize("delay", ["exponential", "lognormal", "pareto"])
+def test_delays_keep_every_event_and_its_session_order(generated, delay):
+    disorder = Disorder(delay=delay, delay_seconds=30, late_fraction=0.5, duplicate_rate=0,
+                        partition_drop_interval_seconds=0, seed=SEED)
+    delivered = _delivered(disorder)
+    assert len(delivered) == EVENTS
+    _assert_same_events(generated, delivered)
+    _assert_ground_truth(delivered)
+    assert disorder.late_events == sum(event["lateness_ms"] > 0 for event in delivered) > 0
+    assert not any(event["is_duplicate"] or event["is_replay"] for event in delivered)
+
+
+def test_duplicate_rate_matches_the_setting(generated):
+    disorder = Disorder(delay="exponential", delay_seconds=30, duplicate_rate=0.05,
+                        partition_drop_interval_seconds=0, seed=SEED)
+    delivered = _delivered(disorder)
+    duplicates = sum(event["is_duplicate"] for event in delivered)
+    assert len(delivered) == EVENTS + duplicates == EVENTS + disorder.duplicate_events
+    assert duplicates / EVENTS == pytest.approx(0.05, abs=0.01)
+    _assert_same_events(generated, delivered)
+    _assert_ground_truth(delivered)
+
+
+def test_partition_drops_replay_the_expected_share(generated):
+    # One of 4 partitions dropped for 30 s every 120 s on average: ~1/16 of the events.
+    disorder = Disorder(delay="none", duplicate_rate=0, partitions=4, partition_drop_interval_seconds=120,
+                        partition_drop_seconds=30, seed=SEED)
+    delivered = _delivered(disorder)
+    replayed = [event for event in delivered if event["is_replay"]]
+    assert len(replayed) == disorder.replayed_events
+    assert len(replayed) / EVENTS == pytest.approx(30 / 120 / 4, rel=0.35)
+    # Replayed events are the only late ones: delay is off.
+    assert all(event["is_replay"] for event in delivered if event["lateness_ms"] > 0)
+    _assert_same_events(generated, delivered)
+    _assert_ground_truth(delivered)
+
+
+def _disorder():
+    return Disorder(delay="lognormal", delay_seconds=30, duplicate_rate=0.02, partition_drop_interval_seconds=300,
+                    partition_drop_seconds=60, seed=SEED)
+
+
+def test_per_event_path_delivers_one_event_per_call():
+    _reset()
+    generated = [event_generator.generate_clickstream_event() for _ in range(6000)]
+    _reset(_disorder())
+    delivered = [event_generator.generate_clickstream_event() for _ in range(5000)]
+    assert all(event is not None for event in delivered)
+    delivered += event_generator.flush_delayed_events()
+    # Duplicates fill some calls, so fewer than 5000 events were generated; all of them are delivered.
+    originals = [event for event in delivered if not event["is_duplicate"]]
+    assert len(originals) < 5000 < len(delivered)
+    _assert_same_events(generated[:len(originals)], delivered)
+    _assert_ground_truth(delivered)
+
+
+def test_columnar_batches_carry_the_ground_truth():
+    _reset(_disorder())
+    rows = [event for _ in range(5) for event in event_generator.generate_clickstream_events(BATCH)]
+    _reset(_disorder())
+    batches = [event_generator.generate_clickstream_events(BATCH, columnar=True) for _ in range(5)]
+    assert all(set(TRUTH_COLUMNS) <= set(batch) for batch in batches)
+    columns = [event for batch in batches for event in (dict(zip(batch, values)) for values in zip(*batch.values()))]
+    assert columns == rows
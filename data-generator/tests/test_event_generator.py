@@ -0,0 +1,90 @@
+# data_generator/tests/test_event_generator.py
+#
+# The batch path (generate_clickstream_events) and the per-event path
+# (generate_clickstream_event) must follow the same session, cart, checkout and
+# purchase rules. Both are run on the same seeded population and every event
+# is replayed against a model of its session.
+
+from collections import Counter
+
+import pytest
+
+from src import event_generator
+from src.catalog import get_catalog
+
+SEED = 42
+NUM_USERS = 200
+EVENTS = 20_000
+SESSION_ATTRIBUTES = ["user_id", "browser", "os", "referral_source", "device_type", "geo_country", "geo_city",
+                      "is_new_user"]
+PAGE_BY_EVENT = {"add_to_cart": "/cart", "remove_from_cart": "/cart", "checkout": "/checkout",
+                 "purchase": "/purchase_success", "search": "/search_results"}
+
+
+def _batch_events():
+    event_generator.reset_sessions(NUM_USERS, seed=SEED)
+    return [event for _ in range(EVENTS // 1000) for event in event_generator.generate_clickstream_events(1000)]
+
+
+def _single_events():
+    event_generator.reset_sessions(NUM_USERS, seed=SEED)
+    return [event_generator.generate_clickstream_event() for _ in range(EVENTS)]
+
+
+@pytest.fixture(scope="module", params=["batch", "per_event"])
+def events(request):
+    return _batch_events() if request.param == "batch" else _single_events()
+
+
+def _products():
+    catalog = get_catalog()
+    return {catalog.ids[p]: (catalog.names[p], catalog.brand(p), catalog.price(p), catalog.category(p))
+            for p in range(len(catalog))}
+
+
+def test_cart_checkout_and_purchase_rules(events):
+    products = _products()
+    carts = {}
+    for event in events:
+        cart = carts.setdefault(event["session_id"], [])
+        event_type = event["event_type"]
+        if event_type in PAGE_BY_EVENT:
+            assert event["page_url"] == PAGE_BY_EVENT[event_type]
+        if event_type == "add_to_cart":
+            cart.extend(event["product_id"])
+        elif event_type == "remove_from_cart":
+            assert event["product_id"][0] in cart
+            cart.remove(event["product_id"][0])
+        elif event_type == "checkout":
+            assert cart, "checkout with an empty cart"
+        elif event_type == "purchase":
+            assert sorted(event["product_id"]) == sorted(cart)
+            assert event["product_price"] == round(sum(products[p][2] for p in cart), 2)
+            assert event["product_name"] == [products[p][0] for p in event["product_id"]]
+            assert event["product_brand"] == list(dict.fromkeys(products[p][1] for p in event["product_id"]))
+            assert event["category"] == "Mixed"
+            cart.clear()
+        assert event["cart_size"] == len(cart)
+
+        if event_type != "purchase" and event["product_id"] is not None:
+            name, brand, price, category = products[event["product_id"][0]]
+            assert len(event["product_id"]) == 1
+            assert event["product_name"] == [name]
+            assert event["product_brand"] == [brand]
+            assert event["product_price"] == [price]
+            assert event["category"] == category
+
+
+def test_session_attributes_are_fixed_per_session(events):
+    sessions = {}
+    for event in events:
+        attributes = tuple(event[name] for name in SESSION_ATTRIBUTES)
+        assert sessions.setdefault(event["session_id"], attributes) == attributes
+
+
+def test_batch_and_per_event_paths_have_the_same_event_mix():
+    batch = Counter(event["event_type"] for event in _batch_events())
+    single = Counter(event["event_type"] for event in _single_events())
+    assert set(batch) == set(single)
+    for event_type in batch:
+        assert abs(batch[event_type] - single[event_type]) / EVENTS < 0.02, event_type
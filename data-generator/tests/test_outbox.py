@@ -0,0 +1,168 @@
+# data_generator/tests/test_outbox.py
+
+import os
+import threading
+
+from src.outbox import Outbox, SegmentLog
+from src.sinks import Sink
+
+
+class _RecordingSink(Sink):
+    """Keeps the batch number of every delivered batch; raises while `failing` is set."""
+
+    def __init__(self, failing=False):
+        self.failing = threading.Event()
+        if failing:
+            self.failing.set()
+        self.batches = []
+        self.closed = False
+
+    def publish_events(self, events):
+        if self.failing.is_set():
+            raise RuntimeError("sink down")
+        self.batches.append(events[0]["batch"])
+        return len(events)
+
+    def close(self):
+        self.closed = True
+
+
+def _batch(number, size=5):
+    return [{"batch": number, "seq": i} for i in range(size)]
+
+
+def _outbox(sink, directory, **kwargs):
+    kwargs.setdefault("max_memory_events", 10)
+    return Outbox(sink, directory=str(directory), retry_base_seconds=0.001, retry_max_seconds=0.01,
+                  fsync_interval_seconds=60, **kwargs)
+
+
+def test_batches_spill_to_the_log_and_drain_in_order(tmp_path):
+    sink = _RecordingSink(failing=True)
+    outbox = _outbox(sink, tmp_path)
+    for number in range(20):
+        assert outbox.publish_events(_batch(number)) == 5
+    assert outbox.stats()["spilled_events"] > 0
+    sink.failing.clear()
+    assert outbox.flush(timeout=10)
+    outbox.close()
+    assert sink.batches == list(range(20))
+    assert sink.closed
+
+
+def test_memory_queue_is_used_until_it_is_full(tmp_path):
+    sink = _RecordingSink()
+    outbox = _outbox(sink, tmp_path, max_memory_events=1000)
+    for number in range(10):
+        outbox.publish_events(_batch(number))
+    assert outbox.flush(timeout=10)
+    outbox.close()
+    assert sink.batches == list(range(10))
+    assert outbox.stats()["spilled_events"] == 0
+
+
+def test_restart_replays_unsent_batches_in_acceptance_order(tmp_path):
+    down = _RecordingSink(failing=True)
+    outbox = _outbox(down, tmp_path, drain_timeout_seconds=0)
+    for number in range(12):
+        outbox.publish_events(_batch(number))
+    outbox.close()
+    assert down.batches == []
+
+    sink = _RecordingSink()
+    outbox = _outbox(sink, tmp_path)
+    outbox.publish_events(_batch(12))
+    assert outbox.flush(timeout=10)
+    outbox.close()
+    assert sink.batches == list(range(13))
+    assert outbox.backlog_bytes() == 0
+
+
+def test_close_spills_the_in_flight_batch_ahead_of_the_memory_queue(tmp_path):
+    down = _RecordingSink(failing=True)
+    outbox = _outbox(down, tmp_path, max_memory_events=100, drain_timeout_seconds=0.05)
+    for number in range(6):
+        outbox.publish_events(_batch(number))
+    assert outbox.stats()["spilled_events"] == 0  # batch 0 is being retried, 1-5 wait in memory
+    outbox.close()
+
+    sink = _RecordingSink()
+    outbox = _outbox(sink, tmp_path)
+    assert outbox.flush(timeout=10)
+    outbox.close()
+    assert sink.batches == list(range(6))
+
+
+def test_spilling_after_a_stall_keeps_order(tmp_path):
+    # The in-flight batch is logged when spilling starts; if its send then
+    # succeeds the log copy is acknowledged instead of being sent again.
+    sink = _RecordingSink(failing=True)
+    outbox = _outbox(sink, tmp_path, max_memory_events=10)
+    for number in range(8):
+        outbox.publish_events(_batch(number))
+    sink.failing.clear()
+    for number in range(8, 12):
+        outbox.publish_events(_batch(number))
+    assert outbox.flush(timeout=10)
+    outbox.close()
+    assert sink.batches == list(range(12))
+
+
+def _segments(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".log"))
+
+
+def test_torn_record_ends_its_segment_and_newer_records_are_still_read(tmp_path):
+    log = SegmentLog(str(tmp_path), fsync_interval_seconds=60)
+    for payload in (b"first", b"second", b"third"):
+        log.append(payload)
+    log.close()
+    segment = _segments(tmp_path)[0]
+    with open(segment, "r+b") as f:
+        f.truncate(os.path.getsize(segment) - 2)  # crash halfway through the last record
+
+    log = SegmentLog(str(tmp_path), fsync_interval_seconds=60)
+    log.append(b"after restart")
+    payloads = []
+    while (record := log.read()) is not None:
+        payloads.append(record[0])
+        log.ack(record[1])
+    log.close()
+    assert payloads == [b"first", b"second", b"after restart"]
+
+
+def test_record_with_a_bad_checksum_is_skipped(tmp_path):
+    log = SegmentLog(str(tmp_path), fsync_interval_seconds=60)
+    log.append(b"good")
+    log.append(b"flipped")
+    log.close()
+    segment = _segments(tmp_path)[0]
+    with open(segment, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"X")
+
+    log = SegmentLog(str(tmp_path), fsync_interval_seconds=60)
+    record = log.read()
+    assert record[0] == b"good"
+    log.ack(record[1])
+    assert log.read() is None
+    assert not log.has_unread()
+    log.close()
+
+
+def test_outbox_restarts_past_a_torn_segment(tmp_path):
+    down = _RecordingSink(failing=True)
+    outbox = _outbox(down, tmp_path, max_memory_events=0, drain_timeout_seconds=0)
+    for number in range(4):
+        outbox.publish_events(_batch(number))
+    outbox.close()
+    segment = _segments(tmp_path)[-1]
+    with open(segment, "r+b") as f:
+        f.truncate(os.path.getsize(segment) - 3)
+
+    sink = _RecordingSink()
+    outbox = _outbox(sink, tmp_path)
+    outbox.publish_events(_batch(4))
+    assert outbox.flush(timeout=10)
+    outbox.close()
+    assert sink.batches == [0, 1, 2, 4]
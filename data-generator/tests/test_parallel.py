@@ -0,0 +1,103 @@
+# data_generator/tests/test_parallel.py
+#
+# Sharding across worker processes: shards simulate disjoint users and
+# sessions and are reproducible on their own, a parallel simulation writes
+# every shard's events and its workers exit cleanly, and live workers stop
+# and close their sinks when the coordinator asks them to.
+
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from src import parallel, simulation
+from src.rate_controller import create_profile
+
+SEED = 9
+NUM_SHARDS = 3
+NUM_USERS = 300
+DURATION_SECONDS = 3600
+EVENTS_PER_SECOND = 3
+
+
+class _ListSink:
+    def __init__(self):
+        self.events = []
+
+    def publish_events(self, events):
+        self.events.extend(events)
+        return len(events)
+
+    def close(self):
+        pass
+
+
+def _run_shard(shard_index, num_shards=NUM_SHARDS):
+    sink = _ListSink()
+    simulation.run_simulation(sink=sink, seed=SEED, start="2024-01-01T00:00:00", duration_seconds=DURATION_SECONDS,
+                              events_per_second=EVENTS_PER_SECOND, profile_name="constant", shard_index=shard_index,
+                              num_shards=num_shards,
+                              num_users=parallel._shard_users(NUM_USERS, num_shards, shard_index))
+    return sink.events
+
+
+def _ndjson_events(directory):
+    events = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            assert not name.startswith("."), f"unfinished file {name}"
+            with open(os.path.join(root, name), encoding="utf-8") as f:
+                events.extend(json.loads(line) for line in f if line.strip())
+    return events
+
+
+@pytest.fixture
+def ndjson_output(tmp_path, monkeypatch):
+    """Points spawned workers (which read src.config from the environment) at an NDJSON sink in tmp_path."""
+    monkeypatch.setenv("SINK", "ndjson")
+    monkeypatch.setenv("OUTPUT_DIR", str(tmp_path))
+    monkeypatch.delenv("METRICS_PORT", raising=False)
+    monkeypatch.setattr(parallel.config, "OUTPUT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_simulation_shards_have_distinct_users_and_sessions():
+    shards = [_run_shard(shard_index) for shard_index in range(NUM_SHARDS)]
+    users = [{event["user_id"] for event in events} for events in shards]
+    sessions = [{event["session_id"] for event in events} for events in shards]
+    for i in range(NUM_SHARDS):
+        for j in range(i + 1, NUM_SHARDS):
+            assert not users[i] & users[j]
+            assert not sessions[i] & sessions[j]
+    # The rate is split across shards: together they produce about one single-process run.
+    total = sum(len(events) for events in shards)
+    assert total == pytest.approx(len(_run_shard(0, num_shards=1)), rel=0.1)
+    assert _run_shard(1) == shards[1]
+
+
+def test_parallel_simulation_writes_every_shard_and_exits(ndjson_output):
+    total = parallel.run_parallel_simulation(num_workers=2, num_users=100, seed=SEED, duration_seconds=600)
+    events = _ndjson_events(ndjson_output)
+    assert total == len(events) > 0
+    # Each session belongs to one user.
+    assert len({(event["session_id"], event["user_id"]) for event in events}) == \
+        len({event["session_id"] for event in events})
+    assert not multiprocessing.active_children()
+
+
+def test_live_workers_stop_and_close_their_sinks(ndjson_output):
+    ctx = multiprocessing.get_context("spawn")
+    stats_queue = ctx.Queue()
+    stop_event = ctx.Event()
+    profile = create_profile("constant", 200)
+    workers = [ctx.Process(target=parallel._worker_main, args=(i, 2, 50, profile, stats_queue, stop_event))
+               for i in range(2)]
+    for worker in workers:
+        worker.start()
+    # Wait until a worker has reported its throughput, i.e. both are generating.
+    stats_queue.get(timeout=60)
+    parallel._stop_workers(workers, stop_event)
+    assert [worker.exitcode for worker in workers] == [0, 0]
+    # Closing the sinks flushed the buffered events and renamed the files.
+    assert _ndjson_events(ndjson_output)
@@ -0,0 +1,90 @@
+# data_generator/tests/test_rate_controller.py
+#
+# The token bucket on a fake clock: for every traffic profile the events handed
+# out per window track the profile's rate integrated over that window, batches
+# never exceed max_batch, and a stall is made up for at most burst_seconds'
+# worth at a time.
+
+import pytest
+
+from src.rate_controller import (ConstantProfile, DailySineProfile, FlashSaleProfile, RateController,
+                                 StepRampProfile)
+
+MAX_BATCH = 500
+TICK_SECONDS = 0.3
+WINDOW_SECONDS = 10
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _run(profile, seconds, work_seconds=0.01, stall=None):
+    """
+    Drives a RateController like the generator loop for `seconds` of fake time,
+    spending `work_seconds` generating and sending each batch (`stall`: a
+    (start, seconds) pause of the loop). Returns [(elapsed, batch size)].
+    """
+    clock = _FakeClock()
+    controller = RateController(profile, max_batch=MAX_BATCH, tick_seconds=TICK_SECONDS, log_reports=False,
+                                clock=clock, sleep=clock.sleep)
+    start = clock.now
+    batches = []
+    while clock.now - start < seconds:
+        batch = controller.acquire()
+        batches.append((clock.now - start, batch))
+        clock.sleep(work_seconds)
+        if stall and clock.now - start >= stall[0]:
+            clock.sleep(stall[1])
+            stall = None
+        controller.record(batch)
+    return batches
+
+
+def _expected(profile, start, end, step=0.01):
+    """Events the profile asks for between `start` and `end` seconds."""
+    return sum(profile.rate_at(start + (i + 0.5) * step) * step for i in range(int(round((end - start) / step))))
+
+
+@pytest.mark.parametrize("profile", [
+    ConstantProfile(1000),
+    StepRampProfile(2000, steps=4, step_seconds=20),
+    FlashSaleProfile(200, multiplier=10, start_seconds=30, duration_seconds=20),
+    DailySineProfile(1000, amplitude=0.8, peak_hour=12, period_seconds=60, start_time=0),
+], ids=["constant", "step_ramp", "flash_sale", "daily_sine"])
+def test_throughput_tracks_the_profile(profile):
+    seconds = 80
+    batches = _run(profile, seconds)
+    assert all(0 < batch <= MAX_BATCH for _, batch in batches)
+    for start in range(0, seconds, WINDOW_SECONDS):
+        sent = sum(batch for elapsed, batch in batches if start <= elapsed < start + WINDOW_SECONDS)
+        expected = _expected(profile, start, start + WINDOW_SECONDS)
+        # Batches are handed out a tick apart, so a window boundary can move about one tick's worth either way.
+        slack = 2 * max(profile.rate_at(start), profile.rate_at(start + WINDOW_SECONDS)) * TICK_SECONDS
+        assert sent == pytest.approx(expected, rel=0.02, abs=slack), start
+
+
+def test_batches_follow_the_tick_and_stay_within_max_batch():
+    batches = _run(ConstantProfile(1000), 10)
+    sizes = [batch for _, batch in batches[1:]]
+    assert max(sizes) <= 1000 * TICK_SECONDS + 1
+    # Above max_batch / tick_seconds events/sec, batches are capped and come faster than a tick apart.
+    batches = _run(ConstantProfile(10_000), 10)
+    assert max(batch for _, batch in batches) == MAX_BATCH
+    assert sum(batch for _, batch in batches) == pytest.approx(100_000, rel=0.01)
+
+
+def test_a_stall_is_made_up_for_at_most_burst_seconds():
+    rate = 1000
+    batches = _run(ConstantProfile(rate), 20, stall=(5, 5))
+    assert all(batch <= MAX_BATCH for _, batch in batches)
+    # The bucket holds burst_seconds (1 s) of traffic, so 4 of the 5 stalled seconds are lost.
+    sent = sum(batch for _, batch in batches)
+    assert sent == pytest.approx(rate * (20 - 5 + 1), rel=0.02)
@@ -0,0 +1,76 @@
+# data_generator/tests/test_session_store.py
+
+import numpy as np
+
+from src.session_store import SessionStore
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _store(**kwargs):
+    clock = _Clock()
+    return SessionStore(clock=clock, rng=np.random.default_rng(0), initial_capacity=4, **kwargs), clock
+
+
+def test_idle_sessions_are_evicted_on_the_sweep():
+    store, clock = _store(idle_timeout_seconds=60, sweep_interval_seconds=10)
+    old, recent = store.allocate(1), store.allocate(2)
+    store.cart_add(old, 7)
+    clock.now = 50
+    store.touch(recent)
+    clock.now = 70
+    store.touch(recent)
+
+    assert store.live_slots.tolist() == [recent]
+    assert store.cart(old) == () and store.cart_size[old] == 0
+    assert store.stats()["idle_evictions"] == 1 and store.stats()["lru_evictions"] == 0
+
+
+def test_idle_sweep_waits_for_its_interval():
+    store, clock = _store(idle_timeout_seconds=60, sweep_interval_seconds=100)
+    store.allocate(1)
+    clock.now = 70
+    store.touch(store.allocate(2))
+    assert len(store) == 2
+    assert store.evict_idle() == 1
+    assert len(store) == 1
+
+
+def test_least_recently_seen_session_makes_room_at_max_sessions():
+    # A sample as large as the store makes the approximate LRU exact.
+    store, clock = _store(max_sessions=3, eviction_sample_size=3)
+    slots = []
+    for key in range(3):
+        clock.now = key
+        slots.append(store.allocate(key))
+    clock.now = 10
+    store.touch(slots[0])
+
+    new = store.allocate(99)
+    assert len(store) == 3
+    assert sorted(store.user_key[store.live_slots].tolist()) == [0, 2, 99]
+    assert new == slots[1]  # the freed slot is reused
+    assert store.stats()["lru_evictions"] == 1
+
+
+def test_allocate_many_evicts_enough_for_the_whole_batch():
+    store, _ = _store(max_sessions=5)
+    store.allocate_many(np.arange(5))
+    store.allocate_many(np.arange(100, 103))
+    assert len(store) == 5
+    assert store.stats()["evictions"] == 3
+    live = store.live_slots
+    assert len(set(live.tolist())) == 5
+
+
+def test_store_grows_past_its_initial_capacity_without_a_limit():
+    store, _ = _store()
+    slots = store.allocate_many(np.arange(10))
+    assert len(store) == 10 and store.stats()["evictions"] == 0
+    assert sorted(store.user_key[slots].tolist()) == list(range(10))
@@ -0,0 +1,72 @@
+# data_generator/tests/test_simulation.py
+#
+# Simulation mode is reproducible: the same seed gives the same event stream
+# on the batch path (run_simulation and generate_clickstream_events) and on the
+# per-event path (generate_clickstream_event), and a different seed does not.
+# The two paths draw their randomness differently, so each is compared with
+# itself; event times come from the same clock draws on both.
+
+import pytest
+
+from src import event_generator, simulation
+from src.rate_controller import create_profile
+
+START = "2024-01-01T00:00:00"
+NUM_USERS = 100
+EVENTS = 3000
+
+
+class _ListSink:
+    def __init__(self):
+        self.events = []
+
+    def publish_events(self, events):
+        self.events.extend(events)
+        return len(events)
+
+    def close(self):
+        pass
+
+
+def _reset(seed):
+    start = simulation.parse_timestamp(START)
+    clock = simulation.SimulationClock(start, create_profile("constant", 5, start_time=start), seed=seed)
+    event_generator.reset_sessions(NUM_USERS, seed=seed, clock=clock)
+
+
+def _batch_path(seed):
+    _reset(seed)
+    return [event for _ in range(EVENTS // 500) for event in event_generator.generate_clickstream_events(500)]
+
+
+def _per_event_path(seed):
+    _reset(seed)
+    return [event_generator.generate_clickstream_event() for _ in range(EVENTS)]
+
+
+def _simulation(seed):
+    sink = _ListSink()
+    simulation.run_simulation(sink=sink, seed=seed, start=START, duration_seconds=1800, events_per_second=2,
+                              profile_name="daily_sine", batch_size=700)
+    return sink.events
+
+
+@pytest.mark.parametrize("path", [_batch_path, _per_event_path, _simulation],
+                         ids=["batch", "per_event", "run_simulation"])
+def test_same_seed_same_stream(path):
+    first = path(7)
+    assert len(first) > 1000
+    assert path(7) == first
+    other = path(8)
+    assert [event["session_id"] for event in other] != [event["session_id"] for event in first]
+
+
+def test_both_paths_draw_the_same_event_times():
+    assert [event["timestamp"] for event in _batch_path(7)] == [event["timestamp"] for event in _per_event_path(7)]
+
+
+def test_event_times_are_ordered_and_within_the_run():
+    events = _simulation(7)
+    timestamps = [event["timestamp"] for event in events]
+    assert timestamps == sorted(timestamps)
+    assert timestamps[0] >= START and timestamps[-1] < "2024-01-01T00:30:00.5"
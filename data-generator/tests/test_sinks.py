@@ -0,0 +1,127 @@
+# data_generator/tests/test_sinks.py
+#
+# File sinks: Hive-style event_date partitions, write-then-rename, rotation on
+# max_file_bytes (also within a single large flush), and the pipeline's local
+# engine reading NDJSON and Parquet output of the same events into the same
+# bronze and silver rows.
+
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+from src import simulation
+from src.sinks import NdjsonFileSink, ParquetFileSink
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                "pipeline"))
+
+MAX_FILE_BYTES = 1024 * 1024
+
+
+class _ListSink:
+    def __init__(self):
+        self.events = []
+
+    def publish_events(self, events):
+        self.events.extend(events)
+        return len(events)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope="module")
+def events():
+    """About 20k seeded events from 22:00 to 02:00, so they span two event dates."""
+    sink = _ListSink()
+    simulation.run_simulation(sink=sink, seed=5, start="2024-01-01T22:00:00", duration_seconds=4 * 3600,
+                              events_per_second=1.4, profile_name="constant")
+    return sink.events
+
+
+def _files(directory):
+    found = []
+    for root, _, names in os.walk(directory):
+        found.extend(os.path.relpath(os.path.join(root, name), directory) for name in names)
+    return sorted(found)
+
+
+def _ndjson_lines(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        return [line for line in f.read().split(b"\n") if line]
+
+
+def _write(sink, events):
+    # One publish of everything, larger than buffer_events: a single flush.
+    sink.publish_events(events)
+    sink.close()
+
+
+def test_files_are_partitioned_by_event_date_and_renamed_on_close(tmp_path, events):
+    sink = NdjsonFileSink(output_dir=str(tmp_path), buffer_events=len(events) + 1)
+    sink.publish_events(events)
+    assert _files(tmp_path) == []  # still buffered
+    sink.flush()
+    assert all(os.path.basename(path).startswith(".") for path in _files(tmp_path))
+    sink.close()
+
+    files = _files(tmp_path)
+    assert {os.path.dirname(path) for path in files} == {"event_date=2024-01-01", "event_date=2024-01-02"}
+    assert not any(os.path.basename(path).startswith(".") for path in files)
+    for path in files:
+        for line in _ndjson_lines(os.path.join(tmp_path, path)):
+            assert "event_date=" + json.loads(line)["timestamp"][:10] == os.path.dirname(path)
+
+
+@pytest.mark.parametrize("compression, max_file_bytes", [(None, MAX_FILE_BYTES), ("gzip", 100_000)])
+def test_ndjson_flush_is_split_at_max_file_bytes(tmp_path, events, compression, max_file_bytes):
+    _write(NdjsonFileSink(output_dir=str(tmp_path), compression=compression, max_file_bytes=max_file_bytes,
+                          buffer_events=1000), events)
+    sizes = [os.path.getsize(os.path.join(tmp_path, path)) for path in _files(tmp_path)]
+    # gzip files are split on an estimate and can run slightly over.
+    assert max(sizes) <= max_file_bytes * (1.05 if compression else 1)
+    assert sum(sizes) > 5 * max_file_bytes
+    assert len(sizes) >= sum(sizes) / max_file_bytes
+    lines = [line for path in _files(tmp_path) for line in _ndjson_lines(os.path.join(tmp_path, path))]
+    assert len(lines) == len(events)
+
+
+def test_parquet_flush_is_split_at_max_file_bytes(tmp_path, events):
+    pq = pytest.importorskip("pyarrow.parquet")
+    max_file_bytes = 256 * 1024
+    _write(ParquetFileSink(output_dir=str(tmp_path), max_file_bytes=max_file_bytes,
+                           buffer_events=len(events) + 1), events)
+    files = _files(tmp_path)
+    assert len(files) > 2
+    rows = 0
+    for path in files:
+        full = os.path.join(tmp_path, path)
+        # Row groups are sized on an estimate and can run slightly over; the footer comes on top.
+        assert os.path.getsize(full) - pq.ParquetFile(full).metadata.serialized_size <= max_file_bytes * 1.1
+        rows += pq.ParquetFile(full).metadata.num_rows
+    assert rows == len(events)
+
+
+def test_engine_reads_ndjson_and_parquet_output_into_the_same_silver(tmp_path, events):
+    pa = pytest.importorskip("pyarrow")
+    arrow_transforms = pytest.importorskip("clickstream_pipeline.arrow_transforms")
+    from clickstream_pipeline import engine
+
+    silver = {}
+    for name, sink_class in [("ndjson", NdjsonFileSink), ("parquet", ParquetFileSink)]:
+        directory = str(tmp_path / name)
+        _write(sink_class(output_dir=directory, max_file_bytes=MAX_FILE_BYTES), events)
+        raw = pa.concat_tables([engine.read_source_file(os.path.join(directory, path))
+                                for path in engine.list_source_files(directory)])
+        table = arrow_transforms.to_silver(arrow_transforms.to_bronze(raw)).drop_columns(["spark_ingestion_time"])
+        silver[name] = table.sort_by([("timestamp", "ascending"), ("session_id", "ascending"),
+                                      ("event_type", "ascending"), ("product_id_flat", "ascending")])
+
+    assert silver["ndjson"].num_rows >= len(events)
+    assert silver["parquet"].to_pylist() == silver["ndjson"].to_pylist()
+    prices = silver["parquet"]["product_price"]
+    assert 0 < prices.null_count < len(prices)
@@ -0,0 +1,107 @@
+# pipeline/benchmarks/bench_engine.py
+#
+# Throughput of the Arrow bronze/silver engine on seeded generator output:
+# rows/sec per stage (decode, bronze, silver with and without product
+# enrichment, Parquet write), end to end over several micro-batches, and peak
+# memory; plus source size and decode rate with PRODUCT_PAYLOAD = "ids".
+# Run from the pipeline directory:
+#   python benchmarks/bench_engine.py [--events 200000]
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PIPELINE_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(PIPELINE_DIR), "data-generator"))
+
+import pyarrow as pa
+
+from clickstream_pipeline import arrow_transforms, engine, products
+
+SEED = 1234
+NUM_USERS = 10_000
+EVENTS = 200_000
+EVENTS_PER_FILE = 20_000
+
+# Metrics where a larger value is a regression.
+LOWER_IS_BETTER = ["*_seconds", "*_mb"]
+
+
+def write_source(directory, events, compression="", payload="full"):
+    """Writes `events` seeded generator events as NDJSON files of EVENTS_PER_FILE each. Returns total bytes."""
+    from src import config, event_generator
+    from src.sinks import NdjsonFileSink
+
+    default_payload, config.PRODUCT_PAYLOAD = config.PRODUCT_PAYLOAD, payload
+    try:
+        event_generator.reset_sessions(NUM_USERS, seed=SEED)
+        for start in range(0, events, EVENTS_PER_FILE):
+            sink = NdjsonFileSink(output_dir=directory, compression=compression)
+            sink.publish_events(event_generator.generate_clickstream_events(min(EVENTS_PER_FILE, events - start)))
+            sink.close()
+    finally:
+        config.PRODUCT_PAYLOAD = default_payload
+    return sum(os.path.getsize(os.path.join(directory, path)) for path in engine.list_source_files(directory))
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(events=EVENTS):
+    """Returns per-stage and end-to-end rows/sec and peak memory for `events` generated events."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source")
+        source_bytes = write_source(source, events)
+        files = [os.path.join(source, path) for path in engine.list_source_files(source)]
+
+        raw, decode_seconds = _timed(lambda: pa.concat_tables([engine.read_source_file(f) for f in files]))
+        bronze, bronze_seconds = _timed(arrow_transforms.to_bronze, raw)
+        silver, silver_seconds = _timed(arrow_transforms.to_silver, bronze)
+        dimension = products.load_products()
+        _, enriched_seconds = _timed(arrow_transforms.to_silver, bronze, dimension)
+        results = {
+            "source_bytes_per_event": source_bytes / events,
+            "decode_rows_per_sec": raw.num_rows / decode_seconds,
+            "bronze_rows_per_sec": raw.num_rows / bronze_seconds,
+            "silver_rows_per_sec": bronze.num_rows / silver_seconds,
+            "silver_enriched_rows_per_sec": bronze.num_rows / enriched_seconds,
+        }
+
+        ids_source = os.path.join(tmp, "source_ids")
+        results["ids_source_bytes_per_event"] = write_source(ids_source, events, payload="ids") / events
+        ids_files = [os.path.join(ids_source, path) for path in engine.list_source_files(ids_source)]
+        ids_raw, ids_decode_seconds = _timed(lambda: pa.concat_tables([engine.read_source_file(f) for f in ids_files]))
+        results["ids_decode_rows_per_sec"] = ids_raw.num_rows / ids_decode_seconds
+        ids_bronze = arrow_transforms.to_bronze(ids_raw)
+        _, ids_enriched_seconds = _timed(arrow_transforms.to_silver, ids_bronze, dimension)
+        results["ids_silver_enriched_rows_per_sec"] = ids_bronze.num_rows / ids_enriched_seconds
+        del ids_raw, ids_bronze
+        lake = os.path.join(tmp, "lake")
+        runner = engine.MicroBatchEngine(source, os.path.join(lake, "bronze"), os.path.join(lake, "silver"),
+                                         os.path.join(lake, "_checkpoints"), max_files_per_batch=2,
+                                         products=dimension)
+        _, write_seconds = _timed(runner._write, silver, os.path.join(tmp, "write_probe"), 0)
+        results["parquet_write_rows_per_sec"] = silver.num_rows / write_seconds
+        del raw, bronze, silver
+
+        batches, total_seconds = _timed(runner.run, 0, None, True)
+        results["end_to_end_rows_per_sec"] = sum(b["bronze_rows"] for b in batches) / total_seconds
+        results["end_to_end_seconds"] = total_seconds
+    results["arrow_peak_mb"] = pa.default_memory_pool().max_memory() / 2**20
+    results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=EVENTS)
+    args = parser.parse_args()
+    for name, value in run(args.events).items():
+        print(f"{name:>32}: {value:>14,.3f}" if name.endswith(("_seconds", "_mb")) else f"{name:>32}: {value:>14,.0f}")
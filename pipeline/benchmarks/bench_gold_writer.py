@@ -0,0 +1,96 @@
+# pipeline/benchmarks/bench_gold_writer.py
+#
+# Gold writes on local delta-spark: the notebook's full-table MERGE against
+# GoldWriter's partition-pruned MERGE and finalize (insert-only) modes, fed with the
+# same session batches from the Arrow sessionizer over seeded simulated traffic.
+# Needs pyspark, delta-spark and Java. Run from the pipeline directory:
+#   python benchmarks/bench_gold_writer.py
+
+import os
+import sys
+import tempfile
+import time
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PIPELINE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pyspark.sql.functions as func
+
+from bench_sessionizer import simulated_silver
+from clickstream_pipeline.gold_writer import GoldWriter, local_spark_session
+from clickstream_pipeline.schema import GOLD_COLUMNS, spark_gold_schema
+from clickstream_pipeline.sessionizer import Sessionizer
+
+BATCH_ROWS = 10_000
+
+# Metrics where a larger value is a regression.
+LOWER_IS_BETTER = ["*_seconds", "*_files_rewritten"]
+
+
+def session_batches(silver):
+    """(updated, closed) session tables per silver micro-batch."""
+    sessionizer = Sessionizer()
+    return [sessionizer.process_batch(silver.slice(start, BATCH_ROWS))
+            for start in range(0, silver.num_rows, BATCH_ROWS)]
+
+
+def notebook_upsert(spark, path):
+    """upsert_to_gold as written in 03_aggregate_gold_layer (no partitioning or pruning)."""
+    from delta.tables import DeltaTable
+
+    def upsert(batch_df, batch_id):
+        if not DeltaTable.isDeltaTable(spark, path):
+            batch_df.write.format("delta").mode("append").save(path)
+            return
+        updates = {name: func.col(f"source.{name}") for name in GOLD_COLUMNS if name not in ("user_id", "session_id")}
+        updates["last_updated"] = func.current_timestamp()
+        DeltaTable.forPath(spark, path).alias("target").merge(
+            source=batch_df.alias("source"),
+            condition=func.expr("target.session_id = source.session_id AND target.user_id = source.user_id"),
+        ).whenMatchedUpdate(set=updates).whenNotMatchedInsertAll().execute()
+    return upsert
+
+
+def _files_rewritten(spark, path):
+    from delta.tables import DeltaTable
+    history = DeltaTable.forPath(spark, path).history().select("operationMetrics").collect()
+    return sum(int((row[0] or {}).get("numTargetFilesRemoved", 0)) for row in history)
+
+
+def _replay(spark, tables, write):
+    schema = spark_gold_schema()
+    start = time.perf_counter()
+    for batch_id, table in enumerate(tables):
+        write(spark.createDataFrame([tuple(row.values()) for row in table.to_pylist()], schema), batch_id)
+    return time.perf_counter() - start
+
+
+def run():
+    """Returns total seconds and files rewritten for the notebook MERGE, GoldWriter merge and finalize."""
+    spark = local_spark_session()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        batches = session_batches(simulated_silver(os.path.join(tmp, "source")))
+        updated = [u for u, _ in batches if u.num_rows]
+        closed = [c for _, c in batches if c.num_rows]
+
+        path = os.path.join(tmp, "notebook")
+        results["notebook_merge_seconds"] = _replay(spark, updated, notebook_upsert(spark, path))
+        results["notebook_merge_files_rewritten"] = _files_rewritten(spark, path)
+
+        writer = GoldWriter(spark, os.path.join(tmp, "merge"))
+        results["pruned_merge_seconds"] = _replay(spark, updated, writer.write_batch)
+        results["pruned_merge_files_rewritten"] = sum(m.get("files_rewritten", 0) for m in writer.batch_metrics)
+
+        writer = GoldWriter(spark, os.path.join(tmp, "finalize"), mode="finalize")
+        results["finalize_seconds"] = _replay(spark, closed, writer.write_batch)
+        results["finalize_files_rewritten"] = sum(m.get("files_rewritten", 0) for m in writer.batch_metrics)
+        results["batches"] = len(updated)
+    spark.stop()
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:>32}: {value:>12,.3f}" if name.endswith("_seconds") else f"{name:>32}: {value:>12,.0f}")
@@ -0,0 +1,117 @@
+# pipeline/benchmarks/bench_lateness.py
+#
+# Silver -> gold session aggregation under late, out-of-order and duplicated
+# delivery. A seeded simulated day of traffic is generated at several disorder
+# levels (data-generator/src/disorder.py), parsed to silver in delivery order
+# and fed to the Sessionizer at several watermark delays (7 hours is the gold
+# query's). Reports peak state rows and memory, rows dropped as late next to
+# the generator's ground truth, and rows/sec. Run from the pipeline directory:
+#   python benchmarks/bench_lateness.py [--watermark-hours 1 3 7]
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PIPELINE_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(PIPELINE_DIR), "data-generator"))
+
+from clickstream_pipeline import arrow_transforms
+from clickstream_pipeline.sessionizer import Sessionizer
+
+SEED = 1234
+HOURS = 24
+EVENTS_PER_SECOND = 2
+BATCH_ROWS = 10_000
+WATERMARK_HOURS = [1, 3, 7]
+
+# Disorder settings per level (see disorder.Disorder); the heavier levels
+# deliver some events more than 7 hours late.
+LEVELS = {
+    "in_order": {},
+    "exponential_5m": dict(delay="exponential", delay_seconds=5 * 60),
+    "lognormal_30m": dict(delay="lognormal", delay_seconds=30 * 60, delay_sigma=1.0),
+    "pareto_1h": dict(delay="pareto", delay_seconds=60 * 60, pareto_alpha=1.2),
+    "partition_drop_8h": dict(partition_drop_interval_seconds=6 * 3600, partition_drop_seconds=8 * 3600),
+    "duplicates_5pct": dict(delay="exponential", delay_seconds=60, duplicate_rate=0.05),
+}
+
+# Metrics where a larger value is a regression.
+LOWER_IS_BETTER = ["*_state_sessions", "*_state_mb", "*_dropped_rows"]
+
+
+class _CollectingSink:
+    def __init__(self):
+        self.events = []
+
+    def publish_events(self, events):
+        self.events.extend(events)
+        return len(events)
+
+    def close(self):
+        pass
+
+
+def delivered_events(level):
+    """Simulated events in delivery order, with disorder.TRUTH_COLUMNS."""
+    from src import simulation
+    from src.disorder import Disorder
+
+    disorder = Disorder(seed=SEED, **LEVELS[level])
+    sink = _CollectingSink()
+    simulation.run_simulation(sink=sink, seed=SEED, start="2024-01-01T00:00:00", duration_seconds=HOURS * 3600,
+                              events_per_second=EVENTS_PER_SECOND, profile_name="daily_sine",
+                              disorder=disorder if disorder.enabled else None)
+    return sink.events
+
+
+def to_silver(events):
+    from src.serializer import encode_event
+    raw = arrow_transforms.decode_events([encode_event(event) for event in events])
+    return arrow_transforms.to_silver(arrow_transforms.to_bronze(raw))
+
+
+def aggregate(silver, watermark_delay):
+    """Feeds `silver` in order. Returns (sessionizer, peak sessions, peak state bytes, seconds)."""
+    sessionizer = Sessionizer(watermark_delay)
+    peak_sessions = peak_bytes = 0
+    start = time.perf_counter()
+    for offset in range(0, silver.num_rows, BATCH_ROWS):
+        sessionizer.process_batch(silver.slice(offset, BATCH_ROWS))
+        peak_sessions = max(peak_sessions, len(sessionizer))
+        peak_bytes = max(peak_bytes, sessionizer.state_bytes_estimate())
+    return sessionizer, peak_sessions, peak_bytes, time.perf_counter() - start
+
+
+def run(watermark_hours=WATERMARK_HOURS):
+    """
+    Returns, per disorder level, the ground truth (late events, duplicates) and,
+    per watermark delay, peak state, dropped rows, the events delivered later
+    than the delay, and rows/sec.
+    """
+    results = {}
+    for level in LEVELS:
+        events = delivered_events(level)
+        lateness_ms = [event.get("lateness_ms", 0) for event in events]
+        results[f"{level}_truth_late_events"] = sum(late > 0 for late in lateness_ms)
+        results[f"{level}_truth_duplicates"] = sum(bool(event.get("is_duplicate")) for event in events)
+        silver = to_silver(events)
+        for hours in watermark_hours:
+            label = f"{level}_watermark_{hours:g}h"
+            sessionizer, peak_sessions, peak_bytes, seconds = aggregate(silver, datetime.timedelta(hours=hours))
+            results[f"{label}_rows_per_sec"] = silver.num_rows / seconds
+            results[f"{label}_peak_state_sessions"] = peak_sessions
+            results[f"{label}_peak_state_mb"] = peak_bytes / 2**20
+            results[f"{label}_dropped_rows"] = sessionizer.late_rows
+            results[f"{label}_truth_beyond_watermark"] = sum(late > hours * 3_600_000 for late in lateness_ms)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--watermark-hours", type=float, nargs="+", default=WATERMARK_HOURS)
+    args = parser.parse_args()
+    for name, value in run(args.watermark_hours).items():
+        print(f"{name:>54}: {value:>14,.3f}" if name.endswith("_mb") else f"{name:>54}: {value:>14,.0f}")
@@ -0,0 +1,100 @@
+# pipeline/benchmarks/bench_sessionizer.py
+#
+# Session aggregation on a seeded simulated day of traffic: rows/sec, state
+# memory compared to raw string sets (what collect_set keeps), and how the
+# watermark delay trades state size against evictions. Run from the pipeline
+# directory:  python benchmarks/bench_sessionizer.py
+
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PIPELINE_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(PIPELINE_DIR), "data-generator"))
+
+import pyarrow as pa
+
+from clickstream_pipeline import arrow_transforms, engine
+from clickstream_pipeline.sessionizer import SET_COLUMNS, Sessionizer
+
+SEED = 1234
+HOURS = 24
+EVENTS_PER_SECOND = 2
+BATCH_ROWS = 10_000
+WATERMARK_HOURS = [1, 3, 7]
+
+# Metrics where a larger value is a regression.
+LOWER_IS_BETTER = ["*_mb", "*_sessions"]
+
+
+def simulated_silver(directory):
+    """Silver table for HOURS of simulated traffic, in event-time order."""
+    from src import simulation
+    from src.sinks import NdjsonFileSink
+
+    sink = NdjsonFileSink(output_dir=directory, compression="")
+    simulation.run_simulation(sink=sink, seed=SEED, start="2024-01-01T00:00:00", duration_seconds=HOURS * 3600,
+                              events_per_second=EVENTS_PER_SECOND, profile_name="daily_sine")
+    sink.close()
+    raw = pa.concat_tables([engine.read_source_file(os.path.join(directory, path))
+                            for path in engine.list_source_files(directory)])
+    return arrow_transforms.to_silver(arrow_transforms.to_bronze(raw)).sort_by("timestamp")
+
+
+def _raw_set_state(silver):
+    """Exact per-session string sets, as collect_set / a distinct page set would hold them."""
+    state = {}
+    columns = ["user_id", "session_id", "page_url"] + [column for column, _ in SET_COLUMNS]
+    for row in zip(*(silver[name].to_pylist() for name in columns)):
+        sets = state.setdefault((row[0], row[1]), [set() for _ in columns[2:]])
+        for target, value in zip(sets, row[2:]):
+            if value is not None:
+                target.add(value)
+    return state
+
+
+def _traced(func, *args):
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        return result, tracemalloc.get_traced_memory()[0] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def _feed(sessionizer, silver):
+    for start in range(0, silver.num_rows, BATCH_ROWS):
+        sessionizer.process_batch(silver.slice(start, BATCH_ROWS))
+    return sessionizer
+
+
+def run():
+    """Returns rows/sec, state memory (MB) with and without eviction, and evictions per watermark delay."""
+    with tempfile.TemporaryDirectory() as tmp:
+        silver = simulated_silver(tmp)
+
+    results = {}
+    start = time.perf_counter()
+    _feed(Sessionizer(), silver)
+    results["rows_per_sec"] = silver.num_rows / (time.perf_counter() - start)
+
+    # Without eviction (the notebook's unbounded state) vs. raw string sets.
+    _, results["raw_string_sets_state_mb"] = _traced(_raw_set_state, silver)
+    keep_all, results["no_eviction_state_mb"] = _traced(_feed, Sessionizer(datetime.timedelta(days=365)), silver)
+    results["no_eviction_state_estimate_mb"] = keep_all.state_bytes_estimate() / 2**20
+
+    for hours in WATERMARK_HOURS:
+        sessionizer, state_mb = _traced(_feed, Sessionizer(datetime.timedelta(hours=hours)), silver)
+        results[f"watermark_{hours}h_state_mb"] = state_mb
+        results[f"watermark_{hours}h_state_sessions"] = len(sessionizer)
+        results[f"watermark_{hours}h_evicted"] = sessionizer.evicted_sessions
+    return results
+
+
+if __name__ == "__main__":
+    for name, value in run().items():
+        print(f"{name:>34}: {value:>14,.3f}" if name.endswith("_mb") else f"{name:>34}: {value:>14,.0f}")
@@ -0,0 +1,78 @@
+# pipeline/benchmarks/bench_wire_format.py
+#
+# Bronze decoding of Event Hubs message bodies: JSON (one event per message and
+# packed NDJSON) against the binary wire format (single and packed records), on
+# the same seeded generator events. Reports bytes/event, generator encode rate
+# and decode rows/sec, and checks that both decode to the same bronze rows.
+# Run from the pipeline directory:
+#   python benchmarks/bench_wire_format.py [--events 200000]
+
+import argparse
+import os
+import sys
+import time
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PIPELINE_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(PIPELINE_DIR), "data-generator"))
+
+from clickstream_pipeline import arrow_transforms, wire_format
+
+SEED = 1234
+NUM_USERS = 10_000
+EVENTS = 200_000
+MESSAGE_BYTES = 256 * 1024  # Packed body size limit (the Event Hubs batch limit is 1 MB)
+
+# Metrics where a larger value is a regression.
+LOWER_IS_BETTER = ["*_bytes_per_event", "*_mismatched_columns"]
+
+
+def generate_events(events):
+    from src import event_generator
+    event_generator.reset_sessions(NUM_USERS, seed=SEED)
+    return [event for start in range(0, events, 10_000)
+            for event in event_generator.generate_clickstream_events(min(10_000, events - start))]
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(events=EVENTS):
+    """Returns bytes/event, encode events/sec and decode rows/sec per message format."""
+    from src import serializer
+    from src import wire_format as encoder
+
+    generated = generate_events(events)
+    results = {}
+    messages = {}
+    for encoding, encode, separator, packed_format in (("json", serializer.encode_event, b"\n", "ndjson"),
+                                                       ("binary", encoder.encode_framed, b"", "binary")):
+        bodies, seconds = _timed(lambda: [encode(event) for event in generated])
+        results[f"{encoding}_bytes_per_event"] = sum(map(len, bodies)) / events
+        results[f"{encoding}_encode_events_per_sec"] = events / seconds
+        single_format = "binary" if encoding == "binary" else None
+        messages[f"{encoding}_single"] = (bodies, [single_format] * len(bodies))
+        packed = serializer.pack_payloads(bodies, MESSAGE_BYTES, separator)
+        messages[f"{encoding}_packed"] = (packed, [packed_format] * len(packed))
+
+    tables = {}
+    for name, (bodies, formats) in messages.items():
+        (table, _), seconds = _timed(wire_format.decode_messages, bodies, formats)
+        results[f"{name}_decode_rows_per_sec"] = table.num_rows / seconds
+        tables[name] = table
+    bronze = arrow_transforms.to_bronze(tables["binary_packed"])
+    reference = arrow_transforms.to_bronze(tables["json_single"]).drop(["spark_ingestion_time"])
+    results["binary_bronze_mismatched_columns"] = sum(
+        not reference[name].equals(bronze[name]) for name in reference.column_names)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=EVENTS)
+    args = parser.parse_args()
+    for name, value in run(args.events).items():
+        print(f"{name:>34}: {value:>14,.1f}" if name.endswith("_bytes_per_event") else f"{name:>34}: {value:>14,.0f}")
@@ -0,0 +1,115 @@
+# pipeline/benchmarks/check_spark_parity.py
+#
+# Runs the Spark and Arrow transforms on the same NDJSON files and compares the
+# bronze and silver rows (ignoring spark_ingestion_time). Then sends the same
+# events through spark_transforms.parse_messages() as single JSON, packed NDJSON
+# and binary messages and compares its bronze rows with from_json's. Needs
+# pyspark and a Java runtime. Run from the pipeline directory:
+#   python benchmarks/check_spark_parity.py <ndjson file or directory>
+
+import json
+import os
+import sys
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PIPELINE_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(PIPELINE_DIR), "data-generator"))
+
+import pyarrow as pa
+
+from clickstream_pipeline import arrow_transforms, engine, spark_transforms
+
+IGNORED_COLUMNS = {"spark_ingestion_time"}
+PACKED_EVENTS = 100
+
+
+def _source_files(path):
+    if os.path.isfile(path):
+        return [path]
+    return [os.path.join(path, name) for name in engine.list_source_files(path)]
+
+
+def _lines(files):
+    """Non-blank lines of the files, like spark.read.text() and the filter below."""
+    lines = []
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            lines.extend(line.rstrip("\r") for line in f.read().split("\n"))
+    return [line for line in lines if line.strip()]
+
+
+def _messages(lines):
+    """The events of `lines` as Event Hubs messages of each format: {name: [(body, format property)]}."""
+    from src import wire_format as generator_wire_format
+
+    binary = []
+    for line in lines:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            event = None
+        record = generator_wire_format.encode_record(event) if type(event) is dict \
+            else bytes((generator_wire_format.JSON_VERSION,)) + line.encode("utf-8")
+        binary.append((generator_wire_format.frame(record), "binary"))
+    return {
+        "json": [(line.encode("utf-8"), None) for line in lines],
+        "ndjson": [("\n".join(lines[i:i + PACKED_EVENTS]).encode("utf-8"), "ndjson")
+                   for i in range(0, len(lines), PACKED_EVENTS)],
+        "binary": binary,
+    }
+
+
+def _normalize(rows):
+    # Spark returns naive datetimes in the session time zone (UTC below).
+    def value(v):
+        return v.replace(tzinfo=None) if hasattr(v, "tzinfo") and v.tzinfo is not None else v
+    normalized = [tuple((k, value(v)) for k, v in sorted(row.items()) if k not in IGNORED_COLUMNS) for row in rows]
+    return sorted(normalized, key=repr)
+
+
+def _compare(name, spark_rows, arrow_rows):
+    spark_rows, arrow_rows = _normalize(spark_rows), _normalize(arrow_rows)
+    if spark_rows == arrow_rows:
+        print(f"{name}: {len(arrow_rows):,} rows identical")
+        return True
+    mismatches = [(s, a) for s, a in zip(spark_rows, arrow_rows) if s != a]
+    print(f"{name}: MISMATCH ({len(spark_rows):,} Spark rows, {len(arrow_rows):,} Arrow rows)")
+    for s, a in mismatches[:5]:
+        print(f"  spark: {dict(s)}\n  arrow: {dict(a)}")
+    return False
+
+
+def main(path):
+    from pyspark.sql import SparkSession
+    from pyspark.sql.functions import lit
+
+    files = _source_files(path)
+    spark = SparkSession.builder.master("local[*]").config("spark.sql.session.timeZone", "UTC").getOrCreate()
+
+    event_df = spark.read.text(files).withColumnRenamed("value", "json_body") \
+        .filter("trim(json_body) != ''") \
+        .withColumn("enqueuedTime", lit(None).cast("timestamp"))
+    spark_bronze = spark_transforms.to_bronze(spark_transforms.parse_events(event_df))
+    spark_silver = spark_transforms.to_silver(spark_bronze)
+
+    raw = pa.concat_tables([engine.read_source_file(f) for f in files])
+    arrow_bronze = arrow_transforms.to_bronze(raw)
+    arrow_silver = arrow_transforms.to_silver(arrow_bronze)
+
+    from_json_rows = [row.asDict() for row in spark_bronze.collect()]
+    ok = _compare("bronze", from_json_rows, arrow_bronze.to_pylist())
+    ok = _compare("silver", [row.asDict() for row in spark_silver.collect()], arrow_silver.to_pylist()) and ok
+
+    for name, messages in _messages(_lines(files)).items():
+        message_df = spark.createDataFrame([(body, None, {"format": fmt} if fmt else {}) for body, fmt in messages],
+                                           "body binary, enqueuedTime timestamp, properties map<string,string>")
+        parsed = spark_transforms.to_bronze(spark_transforms.parse_messages(message_df))
+        ok = _compare(f"parse_messages ({name})", [row.asDict() for row in parsed.collect()], from_json_rows) and ok
+    spark.stop()
+    return ok
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python benchmarks/check_spark_parity.py <ndjson file or directory>")
+    sys.exit(0 if main(sys.argv[1]) else 1)
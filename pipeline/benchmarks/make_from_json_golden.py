@@ -0,0 +1,53 @@
+# pipeline/benchmarks/make_from_json_golden.py
+#
+# Regenerates the expected rows of tests/data/from_json_golden.json by running
+# every case's body through from_json(json_body, clickstreamSchema) in Spark,
+# the way spark_transforms.parse_events() does. The case names and bodies in
+# the file are kept; only "expected" is rewritten (fields Spark returns as null
+# are left out). Needs pyspark and a Java runtime. Run from the pipeline directory:
+#   python benchmarks/make_from_json_golden.py
+
+import json
+import os
+import sys
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PIPELINE_DIR)
+
+from clickstream_pipeline.schema import spark_schema
+
+GOLDEN_PATH = os.path.join(PIPELINE_DIR, "tests", "data", "from_json_golden.json")
+
+
+def from_json_rows(spark, bodies):
+    """from_json(body, clickstreamSchema) of each body, as dicts in input order."""
+    from pyspark.sql.functions import col, from_json
+
+    df = spark.createDataFrame([(i, body) for i, body in enumerate(bodies)], "i int, json_body string")
+    rows = df.withColumn("data", from_json(col("json_body"), spark_schema())) \
+        .select("i", "data.*").orderBy("i").collect()
+    return [{k: v for k, v in row.asDict().items() if k != "i"} for row in rows]
+
+
+def main():
+    from pyspark.sql import SparkSession
+
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        cases = json.load(f)
+    spark = SparkSession.builder.master("local[1]").config("spark.sql.session.timeZone", "UTC").getOrCreate()
+    rows = from_json_rows(spark, [case["body"] for case in cases])
+    print(f"Spark {spark.version}: {len(rows)} bodies parsed")
+    spark.stop()
+
+    with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i, (case, row) in enumerate(zip(cases, rows)):
+            expected = {k: v for k, v in row.items() if v is not None}
+            entry = {"case": case["case"], "body": case["body"], "expected": expected}
+            f.write("  " + json.dumps(entry, ensure_ascii=False) + (",\n" if i < len(cases) - 1 else "\n"))
+        f.write("]\n")
+    print(f"Wrote {GOLDEN_PATH}")
+
+
+if __name__ == "__main__":
+    main()
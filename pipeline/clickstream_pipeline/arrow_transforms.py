@@ -0,0 +1,267 @@
+# pipeline/clickstream_pipeline/arrow_transforms.py
+#
+# PyArrow implementation of the bronze and silver transforms in
+# spark_transforms.py. Output matches Spark row for row and column for column;
+# the comments call out which Spark behaviour each step reproduces.
+
+import datetime
+import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from clickstream_pipeline.schema import (BRONZE_COLUMNS, EVENT_FIELDS, RAW_SCHEMA, SILVER_COLUMNS, SILVER_SCHEMA,
+                                         TIMESTAMP)
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the standard library decoder
+    orjson = None
+    _loads = json.loads
+
+_NONE = type(None)
+_EMPTY = {}
+
+# Strings Spark accepts for a double field (JSON option allowNonNumericNumbers).
+_SPECIAL_DOUBLES = {
+    "NaN": float("nan"), "+NaN": float("nan"), "-NaN": float("nan"),
+    "Infinity": float("inf"), "+Infinity": float("inf"), "+INF": float("inf"),
+    "-Infinity": float("-inf"), "-INF": float("-inf"),
+}
+_INT32_MIN, _INT32_MAX = -2**31, 2**31 - 1
+
+
+# --- JSON decoding (from_json with clickstreamSchema) ---
+#
+# Like Spark's JSON parser in PERMISSIVE mode, a body that is not valid JSON (or
+# not an object) becomes a row of nulls, and a field whose value does not match
+# its declared type is null while the rest of the row is kept. Non-string values
+# of string fields are kept as their JSON text.
+
+def _json_text(value):
+    return orjson.dumps(value).decode("utf-8") if orjson is not None else json.dumps(value, separators=(",", ":"))
+
+
+def _string(value):
+    return value if value is None or type(value) is str else _json_text(value)
+
+
+def _strings(values):
+    if set(map(type, values)) <= {str, _NONE}:
+        return pa.array(values, pa.string())
+    return pa.array([_string(v) for v in values], pa.string())
+
+
+def _double(value):
+    if type(value) is float or type(value) is int:
+        return float(value)
+    if type(value) is str:
+        return _SPECIAL_DOUBLES.get(value)
+    return None
+
+
+def _doubles(values):
+    if set(map(type, values)) <= {float, int, _NONE}:
+        try:
+            return pa.array(values, pa.float64())
+        except (pa.ArrowInvalid, OverflowError):
+            pass
+    return pa.array([_double(v) for v in values], pa.float64())
+
+
+def _ints(values):
+    if set(map(type, values)) <= {int, _NONE}:
+        try:
+            return pa.array(values, pa.int32())
+        except (pa.ArrowInvalid, OverflowError):
+            pass
+    return pa.array([v if type(v) is int and _INT32_MIN <= v <= _INT32_MAX else None for v in values], pa.int32())
+
+
+def _booleans(values):
+    return pa.array([v if type(v) is bool else None for v in values], pa.bool_())
+
+
+def _string_lists(values):
+    if set(map(type, values)) <= {list, _NONE}:
+        if set(type(item) for v in values if v for item in v) <= {str, _NONE}:
+            return pa.array(values, pa.list_(pa.string()))
+    return pa.array([[_string(item) for item in v] if type(v) is list else None for v in values],
+                    pa.list_(pa.string()))
+
+
+_CONVERTERS = {
+    "string": _strings,
+    "array<string>": _string_lists,
+    "double": _doubles,
+    "boolean": _booleans,
+    "int": _ints,
+}
+
+
+def _decode(body):
+    try:
+        record = _loads(body)
+    except ValueError:
+        return _EMPTY
+    return record if type(record) is dict else _EMPTY
+
+
+def decode_events(bodies):
+    """
+    Parses JSON event bodies (bytes or str, one event each) into a table with
+    RAW_SCHEMA, following from_json(json_body, clickstreamSchema).
+    """
+    records = [_decode(body) for body in bodies]
+    columns = [_CONVERTERS[kind]([record.get(name) for record in records]) for name, kind in EVENT_FIELDS]
+    return pa.Table.from_arrays(columns, schema=RAW_SCHEMA)
+
+
+def split_packed_bodies(bodies, formats=None):
+    """
+    explode_packed_bodies() for Python lists: bodies whose format property is
+    "ndjson" are split on newlines. Returns (bodies, source index per body).
+    """
+    out = []
+    source = []
+    for i, body in enumerate(bodies):
+        parts = body.split(b"\n" if isinstance(body, bytes) else "\n") \
+            if formats is not None and formats[i] == "ndjson" else [body]
+        out.extend(parts)
+        source.extend([i] * len(parts))
+    return out, np.asarray(source, dtype=np.int64)
+
+
+# --- Bronze ---
+
+def _parse_timestamp(value):
+    try:
+        parsed = datetime.datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)  # session time zone (UTC)
+    return parsed
+
+
+def parse_timestamps(strings):
+    """
+    to_timestamp(): ISO-8601 strings to UTC timestamps, null when unparseable.
+    Strings with a zone (the generator's "...Z") take the vectorized cast.
+    """
+    try:
+        return pc.cast(strings, TIMESTAMP)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return pa.array([None if s is None else _parse_timestamp(s) for s in strings.to_pylist()], TIMESTAMP)
+
+
+def to_bronze(raw, enqueued_time=None, ingestion_time=None):
+    """
+    Bronze table from a RAW_SCHEMA table.
+
+    Args:
+        raw (pa.Table): Output of decode_events() (or a file with the same columns).
+        enqueued_time: Per-row Event Hubs enqueue times, or None (file sources).
+        ingestion_time (datetime): current_timestamp() of the micro-batch (default: now).
+    """
+    n = raw.num_rows
+    ingestion_time = ingestion_time or datetime.datetime.now(datetime.timezone.utc)
+    # Parquet sources may carry narrower or wider types than clickstreamSchema.
+    columns = {name: pc.cast(raw[name], RAW_SCHEMA.field(name).type)
+               for name in RAW_SCHEMA.names if name in BRONZE_COLUMNS}
+    columns["timestamp"] = parse_timestamps(raw["timestamp"])
+    columns["eventhub_enqueued_time"] = pa.array(enqueued_time, TIMESTAMP) if enqueued_time is not None \
+        else pa.nulls(n, TIMESTAMP)
+    columns["spark_ingestion_time"] = pa.repeat(pa.scalar(ingestion_time, TIMESTAMP), n)
+    return pa.table([columns[name] for name in BRONZE_COLUMNS], names=BRONZE_COLUMNS)
+
+
+# --- Silver ---
+
+def _standardize_browser(browser):
+    lowered = pc.utf8_lower(browser)
+    # when(...) treats a null condition as false, so null browsers end up "Other".
+    conditions = [pc.fill_null(pc.match_substring(lowered, name), False) for name in ("chrome", "firefox", "safari", "edge")]
+    return pc.case_when(pa.StructArray.from_arrays(conditions, names=["chrome", "firefox", "safari", "edge"]),
+                        "Chrome", "Firefox", "Safari", "Edge", "Other")
+
+
+def _extract_domain(page_url):
+    # regexp_extract returns "" when the pattern does not match and null only for null input.
+    matched = pc.struct_field(pc.extract_regex(page_url, r"https?://(?P<domain>[^/]+)"), [0])
+    return pc.if_else(pc.is_valid(page_url), pc.fill_null(matched, ""), pa.scalar(None, pa.string()))
+
+
+def _flatten_products(table):
+    """
+    explode_outer(zip_with(product_id, product_name, ...)): one row per position
+    of the longer array (the shorter one padded with nulls), or a single row of
+    nulls when product_id is null or empty. A null product_name (events sent
+    with ids only) counts as an empty array.
+    """
+    ids = table["product_id"].combine_chunks()
+    names = table["product_name"].combine_chunks()
+    n = len(ids)
+    ids_len = pc.fill_null(pc.list_value_length(ids), 0).to_numpy(zero_copy_only=False)
+    names_len = pc.fill_null(pc.list_value_length(names), 0).to_numpy(zero_copy_only=False)
+    zipped = ids.is_valid().to_numpy(zero_copy_only=False) & (ids_len > 0)
+
+    lengths = np.where(zipped, np.maximum(ids_len, names_len), 1)
+    rows = np.repeat(np.arange(n), lengths)
+    position = np.arange(len(rows)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    def element(lists, list_len):
+        ok = zipped[rows] & (position < list_len[rows])
+        offsets = lists.offsets.to_numpy(zero_copy_only=False)[:-1]
+        index = pa.array(np.where(ok, offsets[rows] + position, 0), mask=~ok)
+        return lists.values.take(index) if len(lists.values) else pa.nulls(len(rows), pa.string())
+
+    flat = table.take(rows)
+    return flat, element(ids, ids_len), element(names, names_len)
+
+
+def enrich_products(columns, products):
+    """
+    Fills product details from the product dimension (products.PRODUCT_SCHEMA),
+    looked up by product_id_flat: a hash lookup against the whole dimension,
+    like the broadcast join in spark_transforms.enrich_products(). Values sent
+    on the event win over the catalog ones.
+    """
+    index = pc.index_in(columns["product_id_flat"], value_set=products["product_id"].combine_chunks())
+
+    def lookup(name):
+        return products[name].combine_chunks().take(index)
+
+    category = lookup("category")
+    columns["product_name_flat"] = pc.coalesce(columns["product_name_flat"], lookup("name"))
+    columns["product_brand_flat"] = pc.coalesce(columns["product_brand_flat"], lookup("brand"))
+    columns["category"] = pc.coalesce(columns["category"], category)
+    columns["product_category_flat"] = category
+    columns["product_unit_price"] = lookup("unit_price")
+
+
+def to_silver(bronze, products=None):
+    """
+    Silver table from a bronze table (to_silver() in spark_transforms.py).
+    With a product dimension (see products.load_products()), product details
+    are enriched from it; otherwise the catalog columns stay null.
+    """
+    drop = pc.and_kleene(
+        pc.and_kleene(pc.equal(bronze["event_type"], "page_view"), pc.match_substring(bronze["page_url"], "/product")),
+        pc.is_null(bronze["product_id"]),
+    )
+    # filter(~cond) keeps a row only when cond is false; null counts as not kept.
+    table = bronze.filter(pc.invert(drop))
+    table, product_id_flat, product_name_flat = _flatten_products(table)
+    columns = {name: table[name] for name in table.column_names}
+    columns["domain"] = _extract_domain(table["page_url"].combine_chunks())
+    columns["browser_standardized"] = _standardize_browser(table["browser"].combine_chunks())
+    columns["product_id_flat"] = product_id_flat
+    columns["product_name_flat"] = product_name_flat
+    columns["product_brand_flat"] = pa.nulls(table.num_rows, pa.string())
+    columns["product_category_flat"] = pa.nulls(table.num_rows, pa.string())
+    columns["product_unit_price"] = pa.nulls(table.num_rows, pa.float64())
+    if products is not None:
+        enrich_products(columns, products)
+    return pa.table([columns[name] for name in SILVER_COLUMNS], schema=SILVER_SCHEMA)
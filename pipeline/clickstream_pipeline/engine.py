@@ -0,0 +1,193 @@
+# pipeline/clickstream_pipeline/engine.py
+#
+# Local micro-batch runner for the bronze and silver layers: picks up new
+# NDJSON / Parquet files written by the generator's file sinks, runs the Arrow
+# transforms and appends partitioned Parquet. Usage (from the pipeline directory):
+#
+#   python -m clickstream_pipeline.engine --source ../data-generator/output --output ./lake
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import time
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from clickstream_pipeline import arrow_transforms, products
+from clickstream_pipeline.schema import RAW_SCHEMA
+
+SOURCE_EXTENSIONS = (".ndjson", ".ndjson.gz", ".parquet")
+PARTITION_COLUMN = "event_date"
+
+
+class FileCheckpoint:
+    """
+    Set of source files already processed, plus the last batch id, stored as
+    JSON in `checkpoint_dir`. Saved with a write-then-rename, so a crash leaves
+    either the previous or the new checkpoint, never a partial one.
+    """
+    def __init__(self, checkpoint_dir):
+        self.path = os.path.join(checkpoint_dir, "processed_files.json")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self.batch_id = -1
+        self.files = set()
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+            self.batch_id = state["batch_id"]
+            self.files = set(state["files"])
+
+    def commit(self, batch_id, files):
+        self.batch_id = batch_id
+        self.files.update(files)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"batch_id": batch_id, "files": sorted(self.files)}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def list_source_files(source_dir):
+    """
+    Generator output files under `source_dir` (relative paths, sorted). Skips
+    files the sinks are still writing ("." prefix) and hidden ("_") entries.
+    """
+    found = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = [d for d in dirs if not d.startswith((".", "_"))]
+        for name in files:
+            if not name.startswith((".", "_")) and name.endswith(SOURCE_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(root, name), source_dir))
+    return sorted(found)
+
+
+def read_source_file(path):
+    """Reads one generator output file into a RAW_SCHEMA table."""
+    if path.endswith(".parquet"):
+        table = pq.read_table(path)
+        columns = [table[name] if name in table.column_names else pa.nulls(table.num_rows, field.type)
+                   for name, field in zip(RAW_SCHEMA.names, RAW_SCHEMA)]
+        return pa.Table.from_arrays(columns, names=RAW_SCHEMA.names)
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        # Spark's text/json file source skips blank lines.
+        lines = [line for line in f.read().split(b"\n") if line.strip()]
+    return arrow_transforms.decode_events(lines)
+
+
+def with_event_date(table):
+    """Adds the `event_date` partition column (UTC date of `timestamp`)."""
+    return table.append_column(PARTITION_COLUMN, pc.strftime(table["timestamp"], format="%Y-%m-%d"))
+
+
+class MicroBatchEngine:
+    """
+    Processes new source files in micro-batches of at most `max_files_per_batch`.
+
+    Each batch decodes the files, builds bronze and silver with
+    arrow_transforms, writes both as Parquet partitioned by `event_date`
+    (`<dir>/event_date=YYYY-MM-DD/part-<batch>-<n>.parquet`) and only then
+    records the files in the checkpoint. A batch interrupted before the
+    checkpoint is re-run with the same batch id and overwrites its own files, so
+    every source file ends up in the output exactly once.
+    """
+    def __init__(self, source_dir, bronze_dir, silver_dir, checkpoint_dir, max_files_per_batch=100, products=None):
+        """
+        Args:
+            products (pa.Table): Product dimension for the silver enrichment
+                (products.load_products()); None leaves the catalog columns null.
+        """
+        self.source_dir = source_dir
+        self.bronze_dir = bronze_dir
+        self.silver_dir = silver_dir
+        self.checkpoint = FileCheckpoint(checkpoint_dir)
+        self.max_files_per_batch = max_files_per_batch
+        self.products = products
+
+    def pending_files(self):
+        """Source files not yet processed (paths relative to source_dir), in name order."""
+        return [path for path in list_source_files(self.source_dir) if path not in self.checkpoint.files]
+
+    def _write(self, table, base_dir, batch_id):
+        ds.write_dataset(
+            with_event_date(table), base_dir, format="parquet",
+            partitioning=ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive"),
+            basename_template=f"part-{batch_id:06d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+    def run_once(self):
+        """
+        Processes one micro-batch. Returns a dict with the batch id, file count,
+        bronze and silver row counts and duration, or None when there is nothing new.
+        """
+        files = self.pending_files()[:self.max_files_per_batch]
+        if not files:
+            return None
+        start = time.perf_counter()
+        batch_id = self.checkpoint.batch_id + 1
+        raw = pa.concat_tables([read_source_file(os.path.join(self.source_dir, path)) for path in files])
+        bronze = arrow_transforms.to_bronze(raw, ingestion_time=datetime.datetime.now(datetime.timezone.utc))
+        silver = arrow_transforms.to_silver(bronze, self.products)
+        self._write(bronze, self.bronze_dir, batch_id)
+        self._write(silver, self.silver_dir, batch_id)
+        self.checkpoint.commit(batch_id, files)
+        return {
+            "batch_id": batch_id,
+            "files": len(files),
+            "bronze_rows": bronze.num_rows,
+            "silver_rows": silver.num_rows,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def run(self, poll_interval=5.0, max_batches=None, stop_when_idle=False):
+        """
+        Runs micro-batches until `max_batches` is reached, or forever (polling
+        every `poll_interval` seconds when idle). With `stop_when_idle`, returns
+        as soon as no new files are left. Returns the list of batch results.
+        """
+        results = []
+        while max_batches is None or len(results) < max_batches:
+            result = self.run_once()
+            if result is None:
+                if stop_when_idle:
+                    break
+                time.sleep(poll_interval)
+                continue
+            results.append(result)
+            print(f"Batch {result['batch_id']}: {result['files']} files, {result['bronze_rows']:,} bronze rows, "
+                  f"{result['silver_rows']:,} silver rows in {result['seconds']:.2f}s")
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the bronze and silver transforms on local generator output.")
+    parser.add_argument("--source", required=True, help="Directory written by the NDJSON or Parquet sink")
+    parser.add_argument("--output", required=True, help="Lake directory (bronze/, silver/ and _checkpoints/ inside)")
+    parser.add_argument("--max-files-per-batch", type=int, default=100)
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    parser.add_argument("--catalog", help="Product catalog (.csv/.parquet) for enrichment (default: the generator's)")
+    parser.add_argument("--once", action="store_true", help="Stop when all current files are processed")
+    args = parser.parse_args(argv)
+
+    engine = MicroBatchEngine(
+        args.source,
+        os.path.join(args.output, "bronze"),
+        os.path.join(args.output, "silver"),
+        os.path.join(args.output, "_checkpoints"),
+        max_files_per_batch=args.max_files_per_batch,
+        products=products.load_products(args.catalog),
+    )
+    try:
+        engine.run(poll_interval=args.poll_interval, stop_when_idle=args.once)
+    except KeyboardInterrupt:
+        print("Engine stopped.")
+
+
+if __name__ == "__main__":
+    main()
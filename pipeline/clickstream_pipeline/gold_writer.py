@@ -0,0 +1,258 @@
+# pipeline/clickstream_pipeline/gold_writer.py
+#
+# Gold session summary: the streaming aggregation of 03_aggregate_gold_layer and
+# the foreachBatch writer that lands it in Delta. Requires pyspark and delta-spark.
+
+import datetime
+import math
+import re
+import time
+
+import pyspark.sql.functions as func
+from pyspark.sql import Window
+
+from clickstream_pipeline.schema import GOLD_COLUMNS
+
+PARTITION_COLUMN = "session_start_date"
+KEY_COLUMNS = ["user_id", "session_id"]
+WATERMARK_DELAY = "7 hours"
+SESSION_GAP = "1 hour"
+
+# operationMetrics of the Delta commit reported per batch (absent ones are skipped).
+DELTA_METRICS = {
+    "numTargetFilesRemoved": "files_rewritten",
+    "numTargetFilesAdded": "files_added",
+    "numTargetRowsMatchedUpdated": "rows_matched",
+    "numTargetRowsUpdated": "rows_updated",
+    "numTargetRowsInserted": "rows_inserted",
+    "numFiles": "files_added",
+    "numOutputRows": "rows_inserted",
+    "executionTimeMs": "delta_execution_ms",
+}
+
+
+def _session_metrics():
+    # Counted per silver row (one per product), as in the original notebook; see Sessionizer.
+    return [
+        func.min("timestamp").alias("session_start_time"),
+        func.max("timestamp").alias("session_end_time"),
+        func.count("*").alias("total_events_per_session"),
+        func.approx_count_distinct("page_url").alias("unique_page_views"),
+        func.sum(func.when(func.col("event_type") == "add_to_cart", 1).otherwise(0)).alias("add_to_cart_count"),
+        func.sum(func.when(func.col("event_type") == "purchase", 1).otherwise(0)).alias("purchase_count"),
+        func.sum(func.when(func.col("event_type") == "purchase", func.col("product_price")).otherwise(0.0)).alias("total_purchase_value"),
+        func.collect_set(func.col("category")).alias("product_categories_viewed"),
+        func.collect_set(func.col("product_id_flat")).alias("products_viewed_ids"),
+        func.collect_set(func.col("product_name_flat")).alias("products_viewed_names"),
+        func.collect_set(func.col("product_brand_flat")).alias("products_viewed_brands"),
+    ]
+
+
+def watermark_timedelta(watermark):
+    """A Spark delay threshold such as "7 hours" or "1 day 30 minutes" as a timedelta."""
+    if isinstance(watermark, datetime.timedelta):
+        return watermark
+    parts = re.findall(r"(\d+(?:\.\d+)?)\s*(week|day|hour|minute|second|millisecond)s?\b", watermark.lower())
+    if not parts or re.sub(r"[\d.\s]|weeks?|days?|hours?|minutes?|seconds?|milliseconds?", "", watermark.lower()):
+        raise ValueError(f"Unsupported watermark delay '{watermark}'. Use e.g. '7 hours' or '30 minutes'.")
+    return sum((datetime.timedelta(**{unit + "s": float(value)}) for value, unit in parts), datetime.timedelta())
+
+
+def session_summary(silver_df, watermark=WATERMARK_DELAY, closed_only=False, session_gap=SESSION_GAP):
+    """
+    Session aggregates of a silver stream.
+
+    By default this is session_summary_df from the notebook: grouped by
+    (user_id, session_id) and written with outputMode("update"). With
+    `closed_only`, sessions are also grouped by a session_window of
+    `session_gap`, so the query can run in outputMode("append") and emits each
+    session once, after the watermark has passed it (for GoldWriter(mode="finalize")).
+
+    A session_window closes `session_gap` after its last event and is emitted
+    once the watermark passes that, so a finalized session lands about
+    session_gap + watermark after its last event (8 hours with the defaults).
+    The watermark only needs to cover how late events arrive; events later than
+    it are dropped.
+
+    session_window splits a session at every gap in its events longer than
+    `session_gap`, emitting several rows with the same (user_id, session_id).
+    The generator starts a new session_id after SESSION_IDLE_TIMEOUT_SECONDS
+    (30 minutes) of inactivity, so a gap longer than that (1 hour by default)
+    keeps its sessions whole; GoldWriter(mode="finalize") keeps the first row
+    written per session and skips later pieces.
+    """
+    silver_df = silver_df.withWatermark("timestamp", watermark)
+    if closed_only:
+        grouped = silver_df.groupBy(func.col("user_id"), func.col("session_id"),
+                                    func.session_window("timestamp", session_gap))
+        return grouped.agg(*_session_metrics()) \
+            .drop("session_window") \
+            .withColumn("last_updated", func.current_timestamp())
+    return silver_df.groupBy(func.col("user_id"), func.col("session_id")) \
+        .agg(*_session_metrics()) \
+        .withColumn("last_updated", func.current_timestamp())
+
+
+def prepare_batch(batch_df):
+    """
+    One row per (user_id, session_id) with its partition date.
+
+    Session rows are cumulative, so when a batch holds several versions of a
+    session (a replayed batch, or sessions from several sources) the one with
+    the most events, then the latest end time, is kept.
+    """
+    latest_first = Window.partitionBy(*KEY_COLUMNS).orderBy(
+        func.col("total_events_per_session").desc(), func.col("session_end_time").desc(),
+        func.col("last_updated").desc())
+    return batch_df \
+        .withColumn("_rank", func.row_number().over(latest_first)) \
+        .filter(func.col("_rank") == 1) \
+        .drop("_rank") \
+        .select(*GOLD_COLUMNS) \
+        .withColumn(PARTITION_COLUMN, func.to_date("session_start_time"))
+
+
+def pruning_dates(dates, watermark=WATERMARK_DELAY, lookback_days=0):
+    """
+    Target partitions a MERGE of sessions starting on `dates` can touch.
+
+    A session's start only moves earlier as late events arrive, and by less than
+    the watermark delay, so an existing row starts at most that much after the
+    source row: on its start date or one of the next ceil(delay / 1 day) days
+    (just the day after for the notebook's 7 hours).
+
+    In finalize mode the row already in the table can also be an earlier piece
+    of a split session, which starts before the source row; `lookback_days`
+    adds that many days before each date (1 covers sessions shorter than a day,
+    such as one split just after midnight).
+    """
+    slack_days = math.ceil(watermark_timedelta(watermark) / datetime.timedelta(days=1))
+    touched = set()
+    for date in dates:
+        if date is not None:
+            touched.update(date + datetime.timedelta(days=day) for day in range(-lookback_days, slack_days + 1))
+    return sorted(touched)
+
+
+def merge_condition(dates):
+    """MERGE condition of `source` against `target` rows, restricted to the partitions in `dates`."""
+    date_list = ", ".join(f"DATE'{date.isoformat()}'" for date in dates)
+    return func.expr(f"target.{PARTITION_COLUMN} IN ({date_list}) "
+                     "AND target.session_id = source.session_id AND target.user_id = source.user_id")
+
+
+class GoldWriter:
+    """
+    foreachBatch sink for the gold session table, partitioned by session start date.
+
+    mode="merge" (default) upserts each batch of session updates with a MERGE
+    restricted to the partitions the batch can match. mode="finalize" writes
+    sessions that are already closed (session_summary(closed_only=True)) with an
+    insert-only MERGE, so it never rewrites existing files and a session already
+    in the table (a replayed batch, or a later piece of a session split by a gap
+    longer than the session gap, starting up to a day later) is skipped rather
+    than written twice.
+
+    Both modes deduplicate the batch first, check for the table only until it
+    exists, and keep Delta's operation metrics of every batch in `batch_metrics`.
+    """
+    def __init__(self, spark, path, mode="merge", app_id="clickstream_gold", watermark=WATERMARK_DELAY):
+        """
+        Args:
+            spark (SparkSession): Session with the Delta extensions.
+            path (str): Gold Delta table path.
+            mode (str): "merge" or "finalize".
+            app_id (str): Delta txnAppId for idempotent appends while the table does not exist yet.
+            watermark (str): The session_summary() watermark delay; bounds the partitions a MERGE scans.
+        """
+        if mode not in ("merge", "finalize"):
+            raise ValueError(f"Unknown gold write mode '{mode}'. Use 'merge' or 'finalize'.")
+        self.spark = spark
+        self.path = path
+        self.mode = mode
+        self.app_id = app_id
+        self.watermark = watermark_timedelta(watermark)
+        self._table = None
+        self.batch_metrics = []
+
+    def _delta_table(self):
+        from delta.tables import DeltaTable
+        if self._table is None and DeltaTable.isDeltaTable(self.spark, self.path):
+            self._table = DeltaTable.forPath(self.spark, self.path)
+        return self._table
+
+    def _append(self, batch_df, batch_id):
+        batch_df.write.format("delta") \
+            .mode("append") \
+            .partitionBy(PARTITION_COLUMN) \
+            .option("txnAppId", self.app_id) \
+            .option("txnVersion", batch_id) \
+            .save(self.path)
+
+    def _merge(self, table, batch_df, insert_only=False):
+        dates = pruning_dates((row[0] for row in batch_df.select(PARTITION_COLUMN).distinct().collect()),
+                              self.watermark, lookback_days=1 if insert_only else 0)
+        merge = table.alias("target").merge(source=batch_df.alias("source"), condition=merge_condition(dates))
+        if not insert_only:
+            updates = {name: func.col(f"source.{name}") for name in GOLD_COLUMNS + [PARTITION_COLUMN]
+                       if name not in KEY_COLUMNS}
+            updates["last_updated"] = func.current_timestamp()
+            merge = merge.whenMatchedUpdate(set=updates)
+        merge.whenNotMatchedInsertAll().execute()
+        return len(dates)
+
+    def write_batch(self, batch_df, batch_id):
+        """foreachBatch callback: writes one micro-batch. Returns its metrics dict."""
+        start = time.perf_counter()
+        batch_df = prepare_batch(batch_df).persist()
+        try:
+            metrics = {"batch_id": batch_id, "mode": self.mode, "source_rows": batch_df.count()}
+            if metrics["source_rows"] == 0:
+                return metrics
+            table = self._delta_table()
+            version = self._table_version(table)
+            if table is None:
+                self._append(batch_df, batch_id)
+                metrics["operation"] = "append"
+            else:
+                metrics["partitions_scanned"] = self._merge(table, batch_df, insert_only=self.mode == "finalize")
+                metrics["operation"] = "insert" if self.mode == "finalize" else "merge"
+        finally:
+            batch_df.unpersist()
+        metrics["seconds"] = time.perf_counter() - start
+        metrics.update(self._last_commit_metrics(version))
+        self.batch_metrics.append(metrics)
+        print(f"Gold batch {batch_id}: " + ", ".join(f"{k}={v}" for k, v in metrics.items() if k != "batch_id"))
+        return metrics
+
+    @staticmethod
+    def _table_version(table):
+        return table.history(1).select("version").first()[0] if table is not None else None
+
+    def _last_commit_metrics(self, previous_version):
+        """
+        Operation metrics of the commit this batch made, or {} when the table
+        version did not change (e.g. an append Delta skipped as a replay of a
+        txnVersion it already has), so another writer's commit is never reported.
+        """
+        table = self._delta_table()
+        if table is None:
+            return {}
+        version, operation_metrics = table.history(1).select("version", "operationMetrics").first()
+        if version == previous_version:
+            return {}
+        operation_metrics = operation_metrics or {}
+        return {name: int(operation_metrics[key]) for key, name in DELTA_METRICS.items() if key in operation_metrics}
+
+
+def local_spark_session(app_name="clickstream-gold", shuffle_partitions=4):
+    """Local SparkSession with Delta Lake enabled (delta-spark from pip), for benchmarks and tests."""
+    from delta import configure_spark_with_delta_pip
+    from pyspark.sql import SparkSession
+
+    builder = SparkSession.builder.master("local[*]").appName(app_name) \
+        .config("spark.sql.extensions", "io.delta.sql.DeltaSparkSessionExtension") \
+        .config("spark.sql.catalog.spark_catalog", "org.apache.spark.sql.delta.catalog.DeltaCatalog") \
+        .config("spark.sql.shuffle.partitions", shuffle_partitions) \
+        .config("spark.sql.session.timeZone", "UTC")
+    return configure_spark_with_delta_pip(builder).getOrCreate()
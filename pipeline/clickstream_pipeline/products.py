@@ -0,0 +1,53 @@
+# pipeline/clickstream_pipeline/products.py
+#
+# Product dimension used by the silver enrichment: one row per product id with
+# its name, brand, category and unit price.
+
+import csv
+import os
+import pyarrow as pa
+
+# The built-in catalog, shared with the data generator (its config.PRODUCTS_PATH).
+PRODUCTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                             "schemas", "products.csv")
+
+PRODUCT_SCHEMA = pa.schema([
+    ("product_id", pa.string()),
+    ("name", pa.string()),
+    ("brand", pa.string()),
+    ("category", pa.string()),
+    ("unit_price", pa.float64()),
+])
+
+
+def _from_rows(rows):
+    return pa.Table.from_pylist([
+        {"product_id": row["id"], "name": row["name"], "brand": row["brand"],
+         "category": row["category"], "unit_price": float(row["price"])}
+        for row in rows
+    ], schema=PRODUCT_SCHEMA)
+
+
+def load_products(path=None):
+    """
+    Product dimension from a catalog file in the generator's CATALOG_PATH format
+    (.csv or .parquet with id,name,brand,price,category), or from the built-in
+    catalog in schemas/products.csv when `path` is None.
+    """
+    path = path or PRODUCTS_PATH
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        return _from_rows(pq.read_table(path, columns=["id", "name", "brand", "price", "category"]).to_pylist())
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            return _from_rows(csv.DictReader(f))
+    raise ValueError(f"Unsupported catalog file '{path}'. Use .csv or .parquet.")
+
+
+def spark_products(spark, products=None):
+    """The product dimension as a Spark DataFrame (small enough to broadcast)."""
+    from pyspark.sql.types import DoubleType, StringType, StructField, StructType
+    products = products if products is not None else load_products()
+    schema = StructType([StructField(name, DoubleType() if name == "unit_price" else StringType(), True)
+                         for name in PRODUCT_SCHEMA.names])
+    return spark.createDataFrame([tuple(row.values()) for row in products.to_pylist()], schema)
@@ -0,0 +1,124 @@
+# pipeline/clickstream_pipeline/schema.py
+
+import pyarrow as pa
+
+# Raw event fields, as declared by clickstreamSchema in the bronze notebook.
+# Types: "string", "array<string>", "double", "boolean", "int".
+EVENT_FIELDS = [
+    ("user_id", "string"),
+    ("session_id", "string"),
+    ("timestamp", "string"),
+    ("event_type", "string"),
+    ("page_url", "string"),
+    ("product_id", "array<string>"),
+    ("product_name", "array<string>"),
+    ("product_brand", "array<string>"),
+    ("product_price", "double"),
+    ("category", "string"),
+    ("browser", "string"),
+    ("os", "string"),
+    ("ip_address", "string"),
+    ("referral_source", "string"),
+    ("device_type", "string"),
+    ("geo_country", "string"),
+    ("geo_city", "string"),
+    ("is_new_user", "boolean"),
+    ("cart_size", "int"),
+]
+
+BRONZE_COLUMNS = [
+    "user_id", "session_id", "timestamp", "event_type", "page_url",
+    "product_id", "product_name", "product_price", "category", "browser",
+    "os", "ip_address", "referral_source", "device_type", "geo_country",
+    "geo_city", "is_new_user", "cart_size", "eventhub_enqueued_time",
+    "spark_ingestion_time",
+]
+
+SILVER_COLUMNS = [
+    "user_id", "session_id", "timestamp", "event_type", "page_url", "domain",
+    "browser_standardized", "product_id_flat", "product_name_flat", "product_brand_flat",
+    "product_category_flat", "product_unit_price", "product_price", "category", "browser", "os", "ip_address", "referral_source",
+    "device_type", "geo_country", "geo_city", "is_new_user", "cart_size",
+    "eventhub_enqueued_time", "spark_ingestion_time",
+]
+
+# Session summary columns of the gold layer (session_summary_df).
+GOLD_COLUMNS = [
+    "user_id", "session_id", "session_start_time", "session_end_time",
+    "total_events_per_session", "unique_page_views", "add_to_cart_count",
+    "purchase_count", "total_purchase_value", "product_categories_viewed",
+    "products_viewed_ids", "products_viewed_names", "products_viewed_brands",
+    "last_updated",
+]
+
+ARROW_TYPES = {
+    "string": pa.string(),
+    "array<string>": pa.list_(pa.string()),
+    "double": pa.float64(),
+    "boolean": pa.bool_(),
+    "int": pa.int32(),
+}
+TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+RAW_SCHEMA = pa.schema([(name, ARROW_TYPES[kind]) for name, kind in EVENT_FIELDS])
+
+_COLUMN_TYPES = {name: ARROW_TYPES[kind] for name, kind in EVENT_FIELDS}
+_COLUMN_TYPES.update({
+    "timestamp": TIMESTAMP,
+    "eventhub_enqueued_time": TIMESTAMP,
+    "spark_ingestion_time": TIMESTAMP,
+    "domain": pa.string(),
+    "browser_standardized": pa.string(),
+    "product_id_flat": pa.string(),
+    "product_name_flat": pa.string(),
+    "product_brand_flat": pa.string(),
+    "product_category_flat": pa.string(),
+    "product_unit_price": pa.float64(),
+})
+
+BRONZE_SCHEMA = pa.schema([(name, _COLUMN_TYPES[name]) for name in BRONZE_COLUMNS])
+SILVER_SCHEMA = pa.schema([(name, _COLUMN_TYPES[name]) for name in SILVER_COLUMNS])
+GOLD_SCHEMA = pa.schema([
+    ("user_id", pa.string()),
+    ("session_id", pa.string()),
+    ("session_start_time", TIMESTAMP),
+    ("session_end_time", TIMESTAMP),
+    ("total_events_per_session", pa.int64()),
+    ("unique_page_views", pa.int64()),
+    ("add_to_cart_count", pa.int64()),
+    ("purchase_count", pa.int64()),
+    ("total_purchase_value", pa.float64()),
+    ("product_categories_viewed", pa.list_(pa.string())),
+    ("products_viewed_ids", pa.list_(pa.string())),
+    ("products_viewed_names", pa.list_(pa.string())),
+    ("products_viewed_brands", pa.list_(pa.string())),
+    ("last_updated", TIMESTAMP),
+])
+
+
+def spark_schema():
+    """clickstreamSchema as a Spark StructType (requires pyspark)."""
+    from pyspark.sql.types import (ArrayType, BooleanType, DoubleType, IntegerType, StringType,
+                                   StructField, StructType)
+    spark_types = {
+        "string": StringType(),
+        "array<string>": ArrayType(StringType()),
+        "double": DoubleType(),
+        "boolean": BooleanType(),
+        "int": IntegerType(),
+    }
+    return StructType([StructField(name, spark_types[kind], True) for name, kind in EVENT_FIELDS])
+
+
+def spark_gold_schema():
+    """GOLD_SCHEMA as a Spark StructType (requires pyspark)."""
+    from pyspark.sql.types import (ArrayType, DoubleType, LongType, StringType, StructField, StructType,
+                                   TimestampType)
+    spark_types = {
+        pa.string(): StringType(),
+        TIMESTAMP: TimestampType(),
+        pa.int64(): LongType(),
+        pa.float64(): DoubleType(),
+        pa.list_(pa.string()): ArrayType(StringType()),
+    }
+    return StructType([StructField(field.name, spark_types[field.type], True) for field in GOLD_SCHEMA])
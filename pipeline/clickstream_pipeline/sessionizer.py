@@ -0,0 +1,285 @@
+# pipeline/clickstream_pipeline/sessionizer.py
+#
+# Incremental session aggregation over silver micro-batches: the metrics of
+# session_summary_df in 03_aggregate_gold_layer, with compact per-session state
+# that is evicted once the event-time watermark has passed the session.
+
+import datetime
+import heapq
+import itertools
+from array import array
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from clickstream_pipeline import hyperloglog
+from clickstream_pipeline.hyperloglog import HyperLogLog, hash64
+from clickstream_pipeline.schema import GOLD_SCHEMA, TIMESTAMP
+
+WATERMARK_DELAY = datetime.timedelta(hours=7)  # withWatermark("timestamp", "7 hours")
+
+# (silver column, gold column) of the collect_set aggregates.
+SET_COLUMNS = [
+    ("category", "product_categories_viewed"),
+    ("product_id_flat", "products_viewed_ids"),
+    ("product_name_flat", "products_viewed_names"),
+    ("product_brand_flat", "products_viewed_brands"),
+]
+
+# Per-session sets are packed uint32 arrays (linear membership test) up to this
+# size, then Python sets.
+SMALL_SET_LIMIT = 64
+
+# Rough CPython sizes behind state_bytes_estimate (64-bit, measured with tracemalloc).
+SESSION_BYTES = 1250   # session object, key tuple and strings, dict and heap entries, HLL and set headers
+SET_ENTRY_BYTES = 20   # one dictionary code, including the array header amortized over a typical session
+
+
+class _Session:
+    __slots__ = ("start", "end", "events", "pages", "add_to_cart", "purchases", "purchase_value", "sets")
+
+    def __init__(self):
+        self.start = None
+        self.end = None
+        self.events = 0
+        self.pages = HyperLogLog()
+        self.add_to_cart = 0
+        self.purchases = 0
+        self.purchase_value = None
+        self.sets = [None] * len(SET_COLUMNS)  # None, array("I") of codes, or set once large
+
+
+class Sessionizer:
+    """
+    Per-session aggregates (user_id, session_id) updated one micro-batch at a time.
+
+    Compared to the Spark aggregation, state stays bounded:
+
+    - unique_page_views is a HyperLogLog (exact for small sessions, at most
+      2**precision bytes for large ones) instead of approx_count_distinct's
+      per-group buffer;
+    - the collect_set columns hold int codes into one shared string
+      dictionary, optionally capped at `max_set_size` values per set;
+    - a session is evicted (and returned as closed) once the watermark, the
+      latest event time seen minus `watermark_delay`, passes its last event.
+      Rows older than the watermark are dropped as late; an on-time event for
+      an evicted session (a gap longer than the delay) starts a new aggregate.
+
+    process_batch() returns only the sessions the batch changed, like the
+    streaming query's "update" output mode.
+
+    The metrics keep a quirk of the notebook's aggregation, so gold stays
+    comparable with existing tables: silver has one row per product, and a
+    purchase carries its order total on every row, so a purchase of n
+    products adds n to purchase_count and total_events_per_session and n
+    times its total to total_purchase_value.
+    """
+    def __init__(self, watermark_delay=WATERMARK_DELAY, max_set_size=None, precision=hyperloglog.PRECISION):
+        """
+        Args:
+            watermark_delay (timedelta): How far behind the latest event time a session may still change.
+            max_set_size (int): Optional cap on distinct values kept per collect_set column and session.
+            precision (int): HyperLogLog precision (2**precision registers).
+        """
+        self.watermark_delay_us = int(watermark_delay.total_seconds() * 1_000_000)
+        self.max_set_size = max_set_size
+        self.precision = precision
+        self._sessions = {}      # (user_id, session_id) -> _Session
+        self._expiry = []        # heap of (session_end, seq, key); entries for extended sessions are stale
+        self._seq = itertools.count()
+        self._codes = {}         # string -> dictionary code
+        self._values = []        # dictionary code -> string
+        self._url_hashes = {}    # page_url -> hash64
+        self._set_entries = 0
+        self._hll_bytes = 0
+        self.max_event_time = None
+        self.watermark = None    # epoch microseconds
+        self.late_rows = 0
+        self.invalid_rows = 0
+        self.evicted_sessions = 0
+        self.dropped_set_values = 0
+        self.last_batch = {}
+
+    def __len__(self):
+        return len(self._sessions)
+
+    # --- Batch processing ---
+
+    def _aggregate(self, silver):
+        """Per-session partial aggregates of one batch (Arrow hash aggregation)."""
+        ts = pc.cast(silver["timestamp"], pa.int64())
+        valid = pc.is_valid(ts)
+        if self.watermark is not None:
+            late = pc.fill_null(pc.less(ts, self.watermark), False)
+            self.late_rows += pc.sum(pc.cast(late, pa.int64())).as_py() or 0
+            valid = pc.and_(valid, pc.invert(late))
+        # Rows without an event time cannot be placed against the watermark.
+        self.invalid_rows += pc.sum(pc.cast(pc.is_null(ts), pa.int64())).as_py() or 0
+        silver = silver.filter(valid)
+        ts = pc.cast(silver["timestamp"], pa.int64())
+
+        event_type = silver["event_type"]
+        purchase = pc.fill_null(pc.equal(event_type, "purchase"), False)
+        table = pa.table({
+            "user_id": silver["user_id"],
+            "session_id": silver["session_id"],
+            "ts": ts,
+            "cart": pc.cast(pc.fill_null(pc.equal(event_type, "add_to_cart"), False), pa.int64()),
+            "purchase": pc.cast(purchase, pa.int64()),
+            "value": pc.if_else(purchase, silver["product_price"], 0.0),
+            "page_url": silver["page_url"],
+            **{column: silver[column] for column, _ in SET_COLUMNS},
+        })
+        distinct = pc.CountOptions(mode="only_valid")
+        return table.group_by(["user_id", "session_id"], use_threads=False).aggregate([
+            ("ts", "min"), ("ts", "max"), ("ts", "count", pc.CountOptions(mode="all")),
+            ("cart", "sum"), ("purchase", "sum"), ("value", "sum"),
+            ("page_url", "distinct", distinct),
+            *[(column, "distinct", distinct) for column, _ in SET_COLUMNS],
+        ])
+
+    def _encode_lists(self, lists, encode):
+        """Maps the values of a list column through `encode` (once per distinct string). Returns (flat list, offsets)."""
+        lists = lists.combine_chunks()
+        encoded = pc.dictionary_encode(lists.values)
+        mapping = np.asarray([encode(value) for value in encoded.dictionary.to_pylist()], dtype=np.uint64)
+        flat = mapping[encoded.indices.to_numpy(zero_copy_only=False)].tolist() if len(mapping) else []
+        return flat, lists.offsets.to_numpy(zero_copy_only=False).tolist()
+
+    def _code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._values)
+            self._values.append(value)
+        return code
+
+    def _url_hash(self, url):
+        h = self._url_hashes.get(url)
+        if h is None:
+            h = self._url_hashes[url] = hash64(url)
+        return h
+
+    def _add_to_set(self, session, j, codes):
+        if not codes:
+            return
+        target = session.sets[j]
+        if target is None:
+            target = session.sets[j] = array("I")
+        before = len(target)
+        limit = self.max_set_size
+        add = target.append if type(target) is array else target.add
+        for code in codes:
+            if code in target:
+                continue
+            if limit is not None and len(target) >= limit:
+                self.dropped_set_values += 1
+                continue
+            add(code)
+        if type(target) is array and len(target) > SMALL_SET_LIMIT:
+            session.sets[j] = set(target)
+        self._set_entries += len(target) - before
+
+    def process_batch(self, silver, now=None):
+        """
+        Folds a silver table into the session state.
+
+        Returns:
+            (updated, closed): GOLD_SCHEMA tables with the sessions this batch
+            changed, and the sessions evicted because the watermark passed them.
+        """
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        rows = silver.num_rows
+        grouped = self._aggregate(silver)
+        pages, page_offsets = self._encode_lists(grouped["page_url_distinct"], self._url_hash)
+        sets = [self._encode_lists(grouped[f"{column}_distinct"], self._code) for column, _ in SET_COLUMNS]
+
+        updated = []
+        columns = [grouped[name].to_pylist() for name in
+                   ("user_id", "session_id", "ts_min", "ts_max", "ts_count", "cart_sum", "purchase_sum", "value_sum")]
+        for i, (user_id, session_id, start, end, events, carts, purchases, value) in enumerate(zip(*columns)):
+            key = (user_id, session_id)
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._sessions[key] = _Session()
+            if session.start is None or start < session.start:
+                session.start = start
+            if session.end is None or end > session.end:
+                session.end = end
+                heapq.heappush(self._expiry, (end, next(self._seq), key))
+            session.events += events
+            session.add_to_cart += carts
+            session.purchases += purchases
+            if value is not None:
+                session.purchase_value = value + (session.purchase_value or 0.0)
+
+            hll_before = session.pages.nbytes()
+            session.pages.add_hashes(pages[page_offsets[i]:page_offsets[i + 1]], self.precision)
+            self._hll_bytes += session.pages.nbytes() - hll_before
+            for j, (flat, offsets) in enumerate(sets):
+                self._add_to_set(session, j, flat[offsets[i]:offsets[i + 1]])
+            updated.append((key, session))
+
+        if grouped.num_rows:
+            batch_max = pc.max(grouped["ts_max"]).as_py()
+            self.max_event_time = batch_max if self.max_event_time is None else max(self.max_event_time, batch_max)
+            self.watermark = self.max_event_time - self.watermark_delay_us
+        closed = self._evict()
+        self.last_batch = {"rows": rows, "updated_sessions": len(updated), "closed_sessions": len(closed)}
+        return self._to_table(updated, now), self._to_table(closed, now)
+
+    def _evict(self):
+        closed = []
+        while self._expiry and self.watermark is not None and self._expiry[0][0] < self.watermark:
+            end, _, key = heapq.heappop(self._expiry)
+            session = self._sessions.get(key)
+            if session is None or session.end != end:
+                continue  # the session was extended after this entry was pushed
+            del self._sessions[key]
+            self._set_entries -= sum(len(s) for s in session.sets if s is not None)
+            self._hll_bytes -= session.pages.nbytes()
+            closed.append((key, session))
+        self.evicted_sessions += len(closed)
+        return closed
+
+    def _to_table(self, items, now):
+        values = self._values
+        columns = [
+            [key[0] for key, _ in items],
+            [key[1] for key, _ in items],
+            pa.array([s.start for _, s in items], pa.int64()).cast(TIMESTAMP),
+            pa.array([s.end for _, s in items], pa.int64()).cast(TIMESTAMP),
+            [s.events for _, s in items],
+            [s.pages.count() for _, s in items],
+            [s.add_to_cart for _, s in items],
+            [s.purchases for _, s in items],
+            [s.purchase_value for _, s in items],
+        ]
+        for j in range(len(SET_COLUMNS)):
+            columns.append([[values[code] for code in s.sets[j]] if s.sets[j] is not None else [] for _, s in items])
+        columns.append(pa.repeat(pa.scalar(now, TIMESTAMP), len(items)))
+        return pa.Table.from_arrays([pa.array(c, f.type) if isinstance(c, list) else c
+                                     for c, f in zip(columns, GOLD_SCHEMA)], schema=GOLD_SCHEMA)
+
+    # --- Metrics ---
+
+    def state_bytes_estimate(self):
+        """Approximate memory held by session state and the shared dictionary."""
+        dictionary = sum(len(value) + 120 for value in self._values)  # str object + dict and list slots
+        return len(self._sessions) * SESSION_BYTES + self._set_entries * SET_ENTRY_BYTES + self._hll_bytes + dictionary
+
+    def stats(self):
+        """State size, watermark and eviction counters, plus the counts of the last batch."""
+        return {
+            "state_sessions": len(self._sessions),
+            "state_set_entries": self._set_entries,
+            "state_hll_bytes": self._hll_bytes,
+            "state_bytes_estimate": self.state_bytes_estimate(),
+            "dictionary_entries": len(self._values),
+            "watermark": None if self.watermark is None else
+            datetime.datetime.fromtimestamp(self.watermark / 1_000_000, datetime.timezone.utc).isoformat(),
+            "late_rows": self.late_rows,
+            "invalid_rows": self.invalid_rows,
+            "evicted_sessions": self.evicted_sessions,
+            "dropped_set_values": self.dropped_set_values,
+            **{f"last_batch_{name}": value for name, value in self.last_batch.items()},
+        }
@@ -0,0 +1,163 @@
+# pipeline/clickstream_pipeline/spark_transforms.py
+#
+# Bronze and silver transforms of the Databricks notebooks, as functions over
+# (streaming or batch) DataFrames. arrow_transforms.py implements the same
+# logic with PyArrow for local runs.
+
+from pyspark.sql.functions import (array, array_size, broadcast, coalesce, col, current_timestamp, explode,
+                                   explode_outer, from_json, lit, lower, regexp_extract, split, struct, to_timestamp,
+                                   when, zip_with)
+from pyspark.sql.types import DoubleType, StringType, StructField, StructType, TimestampType
+
+from clickstream_pipeline import wire_format
+from clickstream_pipeline.schema import BRONZE_COLUMNS, SILVER_COLUMNS, spark_schema
+
+
+def explode_packed_bodies(event_df):
+    """
+    Splits packed messages (application property format = "ndjson") into one
+    row per event. Expects `json_body` and `properties` columns; drops `properties`.
+    """
+    return event_df \
+        .withColumn("json_body", explode(
+            when(col("properties")["format"] == "ndjson", split(col("json_body"), "\n"))
+            .otherwise(array(col("json_body")))
+        )) \
+        .drop("properties")
+
+
+def parse_events(event_df, schema=None):
+    """Parses `json_body` with clickstreamSchema; keeps `enqueuedTime` as eventhub_enqueued_time."""
+    schema = schema or spark_schema()
+    return event_df \
+        .withColumn("data", from_json(col("json_body"), schema)) \
+        .select("data.*", col("enqueuedTime").alias("eventhub_enqueued_time")) \
+        .withColumn("spark_ingestion_time", current_timestamp())
+
+
+def _decode_in_arrow(df, decode):
+    """
+    Runs decode(batch) -> (RAW_SCHEMA table, source row per event) over `df` in
+    mapInArrow and returns the parse_events() columns, with each event's
+    enqueuedTime taken from its source row.
+    """
+    def decode_batches(batches):
+        import pyarrow as pa
+        for batch in batches:
+            raw, source = decode(batch)
+            enqueued = batch.column("enqueuedTime").take(pa.array(source))
+            yield from raw.append_column("eventhub_enqueued_time", enqueued).to_batches()
+
+    output_schema = StructType(spark_schema().fields + [StructField("eventhub_enqueued_time", TimestampType(), True)])
+    return df.mapInArrow(decode_batches, output_schema) \
+        .withColumn("spark_ingestion_time", current_timestamp())
+
+
+def parse_binary_events(event_df, versions=None):
+    """
+    Decodes binary messages (application property format = "binary") with
+    wire_format.decode_bodies() in mapInArrow. Expects `body` and `enqueuedTime`
+    columns and returns the same columns as parse_events(). The schema file is
+    read on the driver; executors only need the clickstream_pipeline package
+    importable (installed on the cluster, or shipped with addPyFile).
+    """
+    versions = versions or wire_format.load_schema()
+
+    def decode(batch):
+        return wire_format.decode_bodies(batch.column("body").to_pylist(), versions)
+
+    return _decode_in_arrow(event_df.select("body", "enqueuedTime"), decode)
+
+
+def parse_messages(message_df, schema=None, versions=None):
+    """
+    Parsed events from raw Event Hubs messages (`body`, `enqueuedTime` and
+    `properties` columns) in any format the generator sends: single JSON events,
+    packed NDJSON and binary records. Same columns as parse_events().
+
+    JSON and NDJSON messages are parsed natively with from_json; only binary
+    messages go through parse_binary_events() in Python. The filter splits the
+    source into those two branches, so a batch source that is expensive to read
+    should be persisted before the call.
+    """
+    is_binary = coalesce(col("properties")["format"] == wire_format.BINARY_FORMAT, lit(False))
+    json_df = message_df.filter(~is_binary) \
+        .select(col("body").cast("string").alias("json_body"), "enqueuedTime", "properties")
+    return parse_events(explode_packed_bodies(json_df), schema) \
+        .unionByName(parse_binary_events(message_df.filter(is_binary), versions))
+
+
+def to_bronze(parsed_df):
+    """Final bronze columns, with `timestamp` as a timestamp."""
+    return parsed_df.withColumn("timestamp", to_timestamp(col("timestamp"))).select(*BRONZE_COLUMNS)
+
+
+def enrich_products(silver_df, products_df):
+    """
+    Fills product name, brand, category and unit price from the product
+    dimension (products.spark_products()) with a broadcast join on
+    product_id_flat. Values sent on the event win over the catalog ones.
+    """
+    dim = products_df.select(
+        col("product_id").alias("dim_product_id"),
+        col("name").alias("dim_name"),
+        col("brand").alias("dim_brand"),
+        col("category").alias("dim_category"),
+        col("unit_price").alias("dim_unit_price"),
+    )
+    return silver_df.join(broadcast(dim), col("product_id_flat") == col("dim_product_id"), "left") \
+        .withColumn("product_name_flat", coalesce(col("product_name_flat"), col("dim_name"))) \
+        .withColumn("product_brand_flat", coalesce(col("product_brand_flat"), col("dim_brand"))) \
+        .withColumn("category", coalesce(col("category"), col("dim_category"))) \
+        .withColumn("product_category_flat", col("dim_category")) \
+        .withColumn("product_unit_price", col("dim_unit_price")) \
+        .drop("dim_product_id", "dim_name", "dim_brand", "dim_category", "dim_unit_price")
+
+
+def to_silver(bronze_df, products_df=None):
+    """
+    Silver transform: page domain, standardized browser, drops product page views
+    without a product, and flattens the product arrays to one row per product.
+    With `products_df`, product details are enriched from the product dimension.
+    """
+    silver_df = bronze_df.withColumn("domain", regexp_extract(col("page_url"), "https?://([^/]+)", 1)) \
+        .withColumn("browser_standardized",
+                    when(lower(col("browser")).contains("chrome"), "Chrome")
+                    .when(lower(col("browser")).contains("firefox"), "Firefox")
+                    .when(lower(col("browser")).contains("safari"), "Safari")
+                    .when(lower(col("browser")).contains("edge"), "Edge")
+                    .otherwise("Other")) \
+        .filter(
+            ~(
+                (col("event_type") == "page_view") &
+                (col("page_url").like("%/product%")) &
+                (col("product_id").isNull())
+            )
+        )
+
+    silver_df = silver_df.withColumn("product_data",
+                    explode_outer(
+                        when(
+                            col("product_id").isNotNull() & (array_size(col("product_id")) > 0),
+                            # Events sent with PRODUCT_PAYLOAD = "ids" have no product_name; keep their ids.
+                            zip_with(col("product_id"), coalesce(col("product_name"), array().cast("array<string>")),
+                                     lambda id, name: struct(id.alias("id"), name.alias("name"), lit(None).alias("brand")))
+                        ).otherwise(
+                            array(struct(lit(None).cast(StringType()).alias("id"),
+                                         lit(None).cast(StringType()).alias("name"),
+                                         lit(None).cast(StringType()).alias("brand")))
+                        )
+                    )
+        ) \
+        .withColumn("product_id_flat", col("product_data.id")) \
+        .withColumn("product_name_flat", col("product_data.name")) \
+        .withColumn("product_brand_flat", col("product_data.brand")) \
+        .drop("product_id", "product_name", "product_brand", "product_data")
+
+    if products_df is not None:
+        silver_df = enrich_products(silver_df, products_df)
+    else:
+        silver_df = silver_df \
+            .withColumn("product_category_flat", lit(None).cast(StringType())) \
+            .withColumn("product_unit_price", lit(None).cast(DoubleType()))
+    return silver_df.select(*SILVER_COLUMNS)
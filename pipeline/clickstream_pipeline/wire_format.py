@@ -0,0 +1,313 @@
+# pipeline/clickstream_pipeline/wire_format.py
+#
+# Bronze decoder for binary messages (application property format = "binary"),
+# written by the generator's src/wire_format.py; the record layout is described
+# there and the field list of every version is in schemas/clickstream_event.json.
+#
+# Records of each schema version have a fixed-size block followed by their
+# strings, so a whole micro-batch is decoded with numpy gathers over one buffer
+# instead of event by event. Fields are matched to clickstreamSchema by name:
+# fields a record's version does not have are null, fields the schema does not
+# declare are skipped. Version 0 records carry a JSON event and are decoded with
+# arrow_transforms.decode_events(), and a record that is cut short decodes to a
+# row of nulls, like a malformed JSON body.
+
+import json
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from clickstream_pipeline import arrow_transforms
+from clickstream_pipeline.schema import EVENT_FIELDS, RAW_SCHEMA
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                           "schemas", "clickstream_event.json")
+
+BINARY_FORMAT = "binary"
+JSON_VERSION = 0
+LIST_SEPARATOR = "\x1f"
+
+_NULL_LENGTH = 0xFFFF
+_NULL_COUNT = 0xFF
+_ESCAPE = 255
+_INT32_MIN = -2**31
+_INT64_MIN = -2**63
+
+# numpy slots of each field type in the fixed block (must match FIXED_FORMATS in the generator).
+FIXED_SLOTS = {
+    "string": [("", "<u2")],
+    "string_list": [(".count", "u1"), ("", "<u2")],
+    "enum": [("", "u1")],
+    "timestamp": [("", "<i8")],
+    "double": [(".tag", "u1"), ("", "<f8")],
+    "boolean": [("", "u1")],
+    "int": [("", "<i4")],
+    "long": [("", "<i8")],
+}
+_VARIABLE_TYPES = ("string", "string_list")
+_RAW_TYPES = {name: RAW_SCHEMA.field(name).type for name, _ in EVENT_FIELDS}
+
+
+def load_schema(path=SCHEMA_PATH):
+    """Parsed schema file: {version: [field dicts]}."""
+    with open(path, encoding="utf-8") as f:
+        spec = json.load(f)
+    return {entry["version"]: entry["fields"] for entry in spec["versions"]}
+
+
+def split_records(bodies):
+    """
+    Splits message bodies into their length-prefixed records.
+
+    Returns (buffer, starts, lengths, source): all bodies as one uint8 array,
+    each record's offset and length in it, and the index of its body. A length
+    prefix that runs past the end of its body yields one record of length -1
+    (decoded as nulls) for the rest of that body.
+    """
+    buffer = b"".join(bodies)
+    starts = []
+    lengths = []
+    source = []
+    offset = 0
+    for i, body in enumerate(bodies):
+        end = len(body)
+        pos = 0
+        while pos < end:
+            length = 0
+            shift = 0
+            while pos < end:
+                byte = body[pos]
+                pos += 1
+                length |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            else:
+                length = -1
+            if length < 0 or pos + length > end:
+                starts.append(offset + min(pos, end))
+                lengths.append(-1)
+                source.append(i)
+                break
+            starts.append(offset + pos)
+            lengths.append(length)
+            source.append(i)
+            pos += length
+        offset += end
+    return (np.frombuffer(buffer, dtype=np.uint8), np.asarray(starts, dtype=np.int64),
+            np.asarray(lengths, dtype=np.int64), np.asarray(source, dtype=np.int64))
+
+
+def _validity(valid):
+    return pa.py_buffer(np.packbits(valid, bitorder="little"))
+
+
+def _gather_strings(buffer, starts, lengths, valid):
+    """String array of buffer[start:start + length] per row, null where not `valid`."""
+    lengths = np.where(valid, lengths, 0)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    positions = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+    data = buffer[positions]
+    string_type, offset_type = (pa.string(), np.int32) if offsets[-1] < 2**31 else (pa.large_string(), np.int64)
+    strings = pa.Array.from_buffers(string_type, len(lengths),
+                                    [_validity(valid), pa.py_buffer(offsets.astype(offset_type)), pa.py_buffer(data)])
+    try:
+        strings.validate(full=True)
+    except pa.ArrowInvalid:  # invalid UTF-8 in a corrupt record: null that value
+        strings = pa.array([None if v is None else _utf8(v) for v in
+                            pa.Array.from_buffers(pa.binary() if offset_type is np.int32 else pa.large_binary(),
+                                                  len(lengths), strings.buffers()).to_pylist()], pa.string())
+    return strings.cast(pa.string())
+
+
+def _utf8(data):
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+class RecordReader:
+    """Decodes records of one schema version into RAW_SCHEMA columns."""
+
+    def __init__(self, version, fields):
+        self.version = version
+        self.fields = fields
+        self.dtype = np.dtype([(field["name"] + suffix, code)
+                               for field in fields for suffix, code in FIXED_SLOTS[field["type"]]])
+
+    def decode(self, buffer, starts, lengths):
+        """RAW_SCHEMA table of the records at `starts` (offsets of their version byte)."""
+        n = len(starts)
+        size = self.dtype.itemsize
+        complete = lengths >= 1 + size
+        block = buffer[np.where(complete, starts + 1, 0)[:, None] + np.arange(size)] if n and size else \
+            np.zeros((n, size), dtype=np.uint8)
+        fixed = np.ascontiguousarray(block).view(self.dtype).reshape(n)
+
+        # Strings follow the fixed block in field order.
+        position = starts + 1 + size
+        string_starts = {}
+        for field in self.fields:
+            if field["type"] in _VARIABLE_TYPES:
+                length = fixed[field["name"]].astype(np.int64)
+                length[length == _NULL_LENGTH] = 0
+                string_starts[field["name"]] = (position, length)
+                position = position + length
+        complete &= starts + lengths >= position
+        escapes = self._escapes(buffer, fixed, position, starts + lengths, complete)
+
+        columns = {}
+        for field in self.fields:
+            name, kind = field["name"], field["type"]
+            if name not in _RAW_TYPES:
+                continue
+            values = fixed[name]
+            if kind == "string":
+                column = _gather_strings(buffer, *string_starts[name], complete & (values != _NULL_LENGTH))
+            elif kind == "string_list":
+                column = self._string_list(buffer, *string_starts[name], fixed[name + ".count"],
+                                           complete & (values != _NULL_LENGTH) & (fixed[name + ".count"] != _NULL_COUNT))
+            elif kind == "enum":
+                symbols = field["symbols"]
+                lookup = pa.array([None] + symbols + [None] * (255 - len(symbols)), pa.string())
+                column = lookup.take(pa.array(np.where(complete, values, 0)))
+                if name in escapes:
+                    column = pc.replace_with_mask(column, pa.array((values == _ESCAPE) & complete),
+                                                  pa.array(escapes[name], pa.string()))
+            elif kind == "timestamp":
+                micros = pa.array(values, pa.timestamp("us"), mask=~complete | (values == _INT64_MIN))
+                column = pc.strftime(micros, format="%Y-%m-%dT%H:%M:%SZ")
+            elif kind == "double":
+                # Like from_json, an array in a double field (tag 2) is null.
+                column = pa.array(values, pa.float64(), mask=~complete | (fixed[name + ".tag"] != 1))
+            elif kind == "boolean":
+                column = pa.array(values == 2, pa.bool_(), mask=~complete | (values == 0))
+            elif kind == "int":
+                column = pa.array(values, pa.int32(), mask=~complete | (values == _INT32_MIN))
+            else:  # long
+                column = pa.array(values, pa.int64(), mask=~complete | (values == _INT64_MIN))
+            columns[name] = column.cast(_RAW_TYPES[name])
+        return pa.Table.from_arrays([columns[name] if name in columns else pa.nulls(n, _RAW_TYPES[name])
+                                     for name, _ in EVENT_FIELDS], schema=RAW_SCHEMA)
+
+    @staticmethod
+    def _string_list(buffer, starts, lengths, counts, valid):
+        joined = _gather_strings(buffer, starts, lengths, valid & (counts > 0))
+        counts = np.where(valid, counts, 0).astype(np.int64)
+        items = pc.split_pattern(joined, LIST_SEPARATOR)
+        # split_pattern("") is [""]; rows with no items contribute nothing.
+        items = items.filter(pa.array(counts > 0)).flatten()
+        offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+        np.cumsum(counts, out=offsets[1:])
+        if len(items) != offsets[-1]:  # an item count that does not match its string (corrupt record)
+            lists = [None if v is None else v.split(LIST_SEPARATOR) if c else []
+                     for v, c in zip(joined.to_pylist(), counts.tolist())]
+            return pa.array([v if ok and (v is None or len(v) == c) else None
+                             for v, c, ok in zip(lists, counts.tolist(), valid.tolist())], pa.list_(pa.string()))
+        return pa.ListArray.from_arrays(pa.array(offsets), items, mask=pa.array(~valid))
+
+    def _escapes(self, buffer, fixed, escape_starts, ends, complete):
+        """Values of enums coded 255, read from the end of each record: {field: [value per escaped row]}."""
+        enums = [field["name"] for field in self.fields if field["type"] == "enum"]
+        escaped = np.zeros(len(fixed), dtype=bool)
+        for name in enums:
+            escaped |= fixed[name] == _ESCAPE
+        escapes = {}
+        for row in np.flatnonzero(escaped & complete).tolist():
+            position, end = int(escape_starts[row]), int(ends[row])
+            for name in enums:
+                if fixed[name][row] != _ESCAPE:
+                    continue
+                value = None
+                if position + 2 <= end:
+                    length = int(buffer[position]) | int(buffer[position + 1]) << 8
+                    if position + 2 + length <= end:
+                        value = _utf8(buffer[position + 2:position + 2 + length].tobytes())
+                    position += 2 + length
+                escapes.setdefault(name, []).append(value)
+        return escapes
+
+
+def _reader(version, schema):
+    if version not in schema:
+        raise ValueError(f"Binary record written with schema version {version}, which the pipeline's "
+                         f"schemas/clickstream_event.json does not define; deploy the newer schema file first.")
+    return RecordReader(version, schema[version])
+
+
+def decode_bodies(bodies, schema=None):
+    """
+    Decodes binary message bodies (each one or more length-prefixed records)
+    into a RAW_SCHEMA table. Returns (table, source index per row), like
+    arrow_transforms.split_packed_bodies().
+
+    Args:
+        bodies (list): Message bodies (bytes).
+        schema (dict): load_schema() output; loaded from SCHEMA_PATH when omitted.
+    """
+    schema = schema if schema is not None else _default_schema()
+    buffer, starts, lengths, source = split_records(bodies)
+    versions = np.full(len(starts), -1, dtype=np.int64)
+    versions[lengths > 0] = buffer[starts[lengths > 0]]
+    parts = []
+    for version in np.unique(versions).tolist():
+        rows = np.flatnonzero(versions == version)
+        if version == JSON_VERSION:
+            table = arrow_transforms.decode_events([buffer[s + 1:s + l].tobytes()
+                                                    for s, l in zip(starts[rows].tolist(), lengths[rows].tolist())])
+        elif version < 0:  # empty or truncated record
+            table = pa.Table.from_arrays([pa.nulls(len(rows), field.type) for field in RAW_SCHEMA], schema=RAW_SCHEMA)
+        else:
+            table = _reader(version, schema).decode(buffer, starts[rows], lengths[rows])
+        parts.append((rows, table))
+    if len(parts) == 1:
+        return parts[0][1], source
+    if not parts:
+        return RAW_SCHEMA.empty_table(), source
+    order = np.argsort(np.concatenate([rows for rows, _ in parts]), kind="stable")
+    return pa.concat_tables([table for _, table in parts]).take(pa.array(order)), source
+
+
+_schema = None
+
+
+def _default_schema():
+    global _schema
+    if _schema is None:
+        _schema = load_schema()
+    return _schema
+
+
+def decode_messages(bodies, formats=None, schema=None):
+    """
+    Event Hubs message bodies in any format: JSON (one event), packed NDJSON
+    (format "ndjson") or binary (format "binary"). Returns (RAW_SCHEMA table,
+    source index per row), rows in message order.
+
+    Args:
+        bodies (list): Message bodies (bytes).
+        formats (list): The `format` application property of each message (None when absent).
+        schema (dict): Binary schema versions (load_schema()); default SCHEMA_PATH.
+    """
+    binary = np.array([f == BINARY_FORMAT for f in formats], dtype=bool) if formats is not None \
+        else np.zeros(len(bodies), dtype=bool)
+    parts = []
+    text_rows = np.flatnonzero(~binary)
+    if len(text_rows):
+        split, source = arrow_transforms.split_packed_bodies([bodies[i] for i in text_rows.tolist()],
+                                                             [formats[i] for i in text_rows.tolist()] if formats else None)
+        parts.append((text_rows[source], arrow_transforms.decode_events(split)))
+    binary_rows = np.flatnonzero(binary)
+    if len(binary_rows):
+        table, source = decode_bodies([bodies[i] for i in binary_rows.tolist()], schema)
+        parts.append((binary_rows[source], table))
+    if not parts:
+        return RAW_SCHEMA.empty_table(), np.zeros(0, dtype=np.int64)
+    if len(parts) == 1:
+        return parts[0][1], parts[0][0]
+    source = np.concatenate([rows for rows, _ in parts])
+    order = np.argsort(source, kind="stable")
+    return pa.concat_tables([table for _, table in parts]).take(pa.array(order)), source[order]
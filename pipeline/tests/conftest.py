@@ -0,0 +1,32 @@
+# pipeline/tests/conftest.py
+#
+# Makes clickstream_pipeline and the data generator's src package importable,
+# like the benchmarks do, and provides a local `spark` session for the tests that
+# need one (skipped without pyspark or Java). Run from the pipeline directory:
+#   python -m pytest tests
+
+import os
+import sys
+
+import pytest
+
+PIPELINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PIPELINE_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(PIPELINE_DIR), "data-generator"))
+
+
+@pytest.fixture(scope="session")
+def spark():
+    """Local SparkSession (UTC); tests using it are skipped without pyspark or a Java runtime."""
+    pytest.importorskip("pyspark")
+    from pyspark.sql import SparkSession
+    try:
+        session = SparkSession.builder.master("local[2]").appName("clickstream-tests") \
+            .config("spark.sql.shuffle.partitions", 2) \
+            .config("spark.sql.session.timeZone", "UTC") \
+            .config("spark.ui.enabled", False) \
+            .getOrCreate()
+    except Exception as e:
+        pytest.skip(f"Spark is not available: {e}")
+    yield session
+    session.stop()
@@ -0,0 +1,79 @@
+# pipeline/tests/test_gold_writer.py
+#
+# MERGE partition pruning and finalize-mode session splitting of the gold writer.
+# The Spark tests run the session_window aggregation and the MERGE condition
+# (as an anti join, which is what an insert-only MERGE inserts) on local Spark;
+# they are skipped without a Java runtime. Delta itself is not needed.
+
+import datetime
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+from clickstream_pipeline import gold_writer
+from clickstream_pipeline.gold_writer import PARTITION_COLUMN, merge_condition, pruning_dates
+
+SILVER_DDL = ("user_id string, session_id string, timestamp timestamp, event_type string, page_url string, "
+              "product_price double, category string, product_id_flat string, product_name_flat string, "
+              "product_brand_flat string")
+
+
+def _silver(spark, times):
+    """One session's page views at `times`."""
+    return spark.createDataFrame(
+        [("user_1", "session_1", ts, "page_view", f"https://www.example.com/page/{i}", None, None, None, None, None)
+         for i, ts in enumerate(times)], SILVER_DDL)
+
+
+def _pieces(spark, times, **kwargs):
+    """Finalized session rows of `times`, oldest first, each prepared as its own writer batch."""
+    summary = gold_writer.session_summary(_silver(spark, times), closed_only=True, **kwargs)
+    starts = [row[0] for row in summary.select("session_start_time").orderBy("session_start_time").collect()]
+    return [gold_writer.prepare_batch(summary.filter(summary.session_start_time == start)) for start in starts]
+
+
+def _inserted(target_df, source_df, lookback_days):
+    """Source rows an insert-only MERGE into `target_df` would insert."""
+    dates = pruning_dates([row[0] for row in source_df.select(PARTITION_COLUMN).distinct().collect()],
+                          lookback_days=lookback_days)
+    return source_df.alias("source").join(target_df.alias("target"), merge_condition(dates), "left_anti").count()
+
+
+def test_pruning_dates_look_ahead_by_the_watermark():
+    day = datetime.date(2024, 1, 2)
+    assert pruning_dates([day], "7 hours") == [day, datetime.date(2024, 1, 3)]
+    assert pruning_dates([day], "30 hours") == [day, datetime.date(2024, 1, 3), datetime.date(2024, 1, 4)]
+    assert pruning_dates([day, None, day], "30 minutes") == [day, datetime.date(2024, 1, 3)]
+
+
+def test_pruning_dates_look_back_for_finalize():
+    day = datetime.date(2024, 1, 2)
+    assert pruning_dates([day], "7 hours", lookback_days=1) == [datetime.date(2024, 1, 1), day,
+                                                               datetime.date(2024, 1, 3)]
+
+
+def test_watermark_timedelta_parses_spark_delays():
+    assert gold_writer.watermark_timedelta("7 hours") == datetime.timedelta(hours=7)
+    assert gold_writer.watermark_timedelta("1 day 30 minutes") == datetime.timedelta(days=1, minutes=30)
+    with pytest.raises(ValueError):
+        gold_writer.watermark_timedelta("7 fortnights")
+
+
+def test_default_session_gap_keeps_a_generator_session_whole(spark):
+    # 25-minute gaps are within the generator's 30-minute idle timeout.
+    times = [datetime.datetime(2024, 1, 1, 23, 30) + datetime.timedelta(minutes=25 * i) for i in range(4)]
+    pieces = _pieces(spark, times)
+    assert len(pieces) == 1
+    assert pieces[0].first()["total_events_per_session"] == 4
+
+
+def test_finalize_skips_a_later_piece_split_across_midnight(spark):
+    times = [datetime.datetime(2024, 1, 1, 23, 40), datetime.datetime(2024, 1, 1, 23, 50),
+             datetime.datetime(2024, 1, 2, 1, 10)]
+    target, source = _pieces(spark, times)
+    assert (target.first()[PARTITION_COLUMN], source.first()[PARTITION_COLUMN]) == (datetime.date(2024, 1, 1),
+                                                                                    datetime.date(2024, 1, 2))
+    assert _inserted(target, source, lookback_days=1) == 0
+    # Looking forward only misses the earlier piece's partition and inserts a duplicate.
+    assert _inserted(target, source, lookback_days=0) == 1
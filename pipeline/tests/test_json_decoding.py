@@ -0,0 +1,42 @@
+# pipeline/tests/test_json_decoding.py
+#
+# arrow_transforms.decode_events() against from_json(json_body, clickstreamSchema)
+# in PERMISSIVE mode. The expected rows in data/from_json_golden.json are written
+# by benchmarks/make_from_json_golden.py from a real from_json run (Spark 4.2;
+# fields left out are null). Rerun it after adding a case or upgrading Spark.
+
+import json
+import os
+
+import pytest
+
+from clickstream_pipeline import arrow_transforms, wire_format
+from clickstream_pipeline.schema import EVENT_FIELDS
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "from_json_golden.json")
+
+with open(GOLDEN_PATH, encoding="utf-8") as f:
+    GOLDEN = json.load(f)
+
+
+def _expected(case):
+    return {name: case["expected"].get(name) for name, _ in EVENT_FIELDS}
+
+
+@pytest.mark.parametrize("case", GOLDEN, ids=[case["case"] for case in GOLDEN])
+def test_decode_events_matches_from_json(case):
+    rows = arrow_transforms.decode_events([case["body"].encode("utf-8")]).to_pylist()
+    assert rows == [_expected(case)]
+
+
+def test_decode_messages_matches_from_json_for_single_and_packed_bodies():
+    bodies = [case["body"].encode("utf-8") for case in GOLDEN]
+    expected = [_expected(case) for case in GOLDEN]
+
+    single, source = wire_format.decode_messages(bodies, [None] * len(bodies))
+    assert single.to_pylist() == expected
+    assert source.tolist() == list(range(len(bodies)))
+
+    packed, source = wire_format.decode_messages([b"\n".join(bodies)], ["ndjson"])
+    assert packed.to_pylist() == expected
+    assert source.tolist() == [0] * len(bodies)
@@ -0,0 +1,176 @@
+# pipeline/tests/test_sessionizer.py
+#
+# The incremental Sessionizer against an exact aggregation of the same silver
+# rows (the definitions of session_summary_df in 03_aggregate_gold_layer), and
+# against that Spark aggregation itself when a local Spark is available;
+# watermark eviction and late rows; and HyperLogLog error at the configured
+# precision.
+
+import datetime
+import math
+
+import pyarrow as pa
+import pytest
+
+from clickstream_pipeline import arrow_transforms, hyperloglog
+from clickstream_pipeline.hyperloglog import HyperLogLog, hash64
+from clickstream_pipeline.schema import SILVER_SCHEMA
+from clickstream_pipeline.sessionizer import SET_COLUMNS, Sessionizer
+
+BATCH_ROWS = 1000
+SET_NAMES = [gold for _, gold in SET_COLUMNS]
+
+
+class _ListSink:
+    def __init__(self):
+        self.events = []
+
+    def publish_events(self, events):
+        self.events.extend(events)
+        return len(events)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(scope="module")
+def silver():
+    """Silver rows of three simulated hours, in event-time order."""
+    from src import simulation
+    from src.serializer import encode_event
+
+    sink = _ListSink()
+    simulation.run_simulation(sink=sink, seed=11, start="2024-01-01T08:00:00", duration_seconds=3 * 3600,
+                              events_per_second=1, profile_name="constant")
+    raw = arrow_transforms.decode_events([encode_event(event) for event in sink.events])
+    return arrow_transforms.to_silver(arrow_transforms.to_bronze(raw)).sort_by("timestamp")
+
+
+def _reference(silver):
+    """Exact session metrics, as session_summary_df defines them (one count per silver row)."""
+    sessions = {}
+    for row in silver.to_pylist():
+        s = sessions.setdefault((row["user_id"], row["session_id"]), {
+            "session_start_time": row["timestamp"], "session_end_time": row["timestamp"],
+            "total_events_per_session": 0, "pages": set(), "add_to_cart_count": 0, "purchase_count": 0,
+            "total_purchase_value": 0.0, **{name: set() for name in SET_NAMES}})
+        s["session_start_time"] = min(s["session_start_time"], row["timestamp"])
+        s["session_end_time"] = max(s["session_end_time"], row["timestamp"])
+        s["total_events_per_session"] += 1
+        if row["page_url"] is not None:
+            s["pages"].add(row["page_url"])
+        s["add_to_cart_count"] += row["event_type"] == "add_to_cart"
+        if row["event_type"] == "purchase":
+            s["purchase_count"] += 1
+            s["total_purchase_value"] += row["product_price"] or 0.0
+        for column, name in SET_COLUMNS:
+            if row[column] is not None:
+                s[name].add(row[column])
+    return sessions
+
+
+def _latest(tables):
+    """Last row per (user_id, session_id) over a sequence of GOLD_SCHEMA tables."""
+    latest = {}
+    for table in tables:
+        for row in table.to_pylist():
+            latest[(row["user_id"], row["session_id"])] = row
+    return latest
+
+
+def _feed(sessionizer, silver):
+    tables = []
+    for start in range(0, silver.num_rows, BATCH_ROWS):
+        updated, closed = sessionizer.process_batch(silver.slice(start, BATCH_ROWS))
+        tables += [updated, closed]
+    return tables
+
+
+def test_sessionizer_matches_an_exact_aggregation(silver):
+    expected = _reference(silver)
+    actual = _latest(_feed(Sessionizer(), silver))
+    assert actual.keys() == expected.keys()
+    for key, row in actual.items():
+        exp = expected[key]
+        for name in ["session_start_time", "session_end_time", "total_events_per_session", "add_to_cart_count",
+                     "purchase_count"]:
+            assert row[name] == exp[name], (key, name)
+        assert row["total_purchase_value"] == pytest.approx(exp["total_purchase_value"])
+        # Sessions stay below hyperloglog.SPARSE_LIMIT pages, where the count is exact.
+        assert row["unique_page_views"] == len(exp["pages"])
+        for name in SET_NAMES:
+            assert set(row[name]) == exp[name], (key, name)
+
+
+def test_sessionizer_matches_the_notebook_spark_aggregation(spark, silver):
+    from clickstream_pipeline.gold_writer import session_summary
+
+    # session_summary() over a batch DataFrame: the watermark is a no-op, the aggregation is the notebook's.
+    df = spark.createDataFrame(silver.select([name for name in SILVER_SCHEMA.names]))
+    expected = {(row["user_id"], row["session_id"]): row.asDict() for row in session_summary(df).collect()}
+    actual = _latest(_feed(Sessionizer(), silver))
+    assert actual.keys() == expected.keys()
+    for key, row in actual.items():
+        exp = expected[key]
+        for name in ["total_events_per_session", "add_to_cart_count", "purchase_count"]:
+            assert row[name] == exp[name], (key, name)
+        for name in ["session_start_time", "session_end_time"]:
+            assert row[name].replace(tzinfo=None) == exp[name].replace(tzinfo=None), (key, name)
+        assert row["total_purchase_value"] == pytest.approx(exp["total_purchase_value"])
+        # approx_count_distinct is not exact either; both are within a page on small sessions.
+        assert abs(row["unique_page_views"] - exp["unique_page_views"]) <= 1, key
+        for name in SET_NAMES:
+            assert set(row[name]) == set(exp[name]), (key, name)
+
+
+def _silver_rows(rows):
+    """Silver table from (user_id, session_id, minute) rows, page views at 2024-01-01 00:00 + minute."""
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    columns = {name: [None] * len(rows) for name in SILVER_SCHEMA.names}
+    columns["user_id"] = [user for user, _, _ in rows]
+    columns["session_id"] = [session for _, session, _ in rows]
+    columns["timestamp"] = [start + datetime.timedelta(minutes=minute) for _, _, minute in rows]
+    columns["event_type"] = ["page_view"] * len(rows)
+    columns["page_url"] = [f"https://www.example.com/page/{minute}" for _, _, minute in rows]
+    return pa.table(columns, schema=SILVER_SCHEMA)
+
+
+def test_watermark_evicts_idle_sessions_and_drops_late_rows():
+    sessionizer = Sessionizer(watermark_delay=datetime.timedelta(minutes=30))
+    updated, closed = sessionizer.process_batch(_silver_rows([("u1", "s1", 0), ("u1", "s1", 5), ("u2", "s2", 10)]))
+    assert updated.num_rows == 2 and closed.num_rows == 0
+
+    # Max event time 40 min: watermark 10 min passes s1 (last event at 5) but not s2 (at 10).
+    updated, closed = sessionizer.process_batch(_silver_rows([("u2", "s2", 40)]))
+    assert closed.column("session_id").to_pylist() == ["s1"]
+    assert closed.column("total_events_per_session").to_pylist() == [2]
+    assert len(sessionizer) == 1
+
+    # A row behind the watermark is dropped; an on-time one for the evicted session starts a new aggregate.
+    updated, closed = sessionizer.process_batch(_silver_rows([("u1", "s1", 3), ("u1", "s1", 20)]))
+    assert sessionizer.late_rows == 1
+    assert updated.column("total_events_per_session").to_pylist() == [1]
+    assert sessionizer.stats()["evicted_sessions"] == 1
+
+
+@pytest.mark.parametrize("n", [10, hyperloglog.SPARSE_LIMIT])
+def test_hyperloglog_is_exact_while_sparse(n):
+    hll = HyperLogLog()
+    hll.add_hashes(hash64(f"https://www.example.com/page/{i}") for i in list(range(n)) * 2)
+    assert hll.count() == n
+
+
+def test_hyperloglog_error_at_the_configured_precision():
+    # Standard error 1.04 / sqrt(2**precision): ~4.6% at the default precision of 9.
+    sigma = 1.04 / math.sqrt(2 ** hyperloglog.PRECISION)
+    errors = []
+    for trial in range(20):
+        for n in [100, 1_000, 10_000]:
+            hll = HyperLogLog()
+            hll.add_hashes(hash64(f"{trial}/{i}") for i in range(n))
+            error = hll.count() / n - 1
+            assert abs(error) < 4 * sigma, (trial, n, error)
+            errors.append(error)
+    rms = math.sqrt(sum(e * e for e in errors) / len(errors))
+    assert rms < 1.5 * sigma
+    assert abs(sum(errors) / len(errors)) < sigma / 2  # no systematic bias
@@ -0,0 +1,95 @@
+# pipeline/tests/test_wire_format.py
+#
+# Generator encoding (data-generator/src/wire_format.py) -> bronze decoding
+# (clickstream_pipeline.wire_format) must give the same RAW_SCHEMA rows as the
+# JSON path (serializer.encode_event -> arrow_transforms.decode_events).
+
+import pytest
+
+from clickstream_pipeline import arrow_transforms, wire_format
+from src import event_generator
+from src import wire_format as generator_wire_format
+from src.disorder import Disorder
+from src.serializer import encode_event
+
+
+def _json_rows(events):
+    return arrow_transforms.decode_events([encode_event(event) for event in events]).to_pylist()
+
+
+def _binary_rows(bodies):
+    table, _ = wire_format.decode_bodies(bodies)
+    return table.to_pylist()
+
+
+@pytest.fixture(scope="module")
+def events():
+    event_generator.reset_sessions(500, seed=7)
+    return event_generator.generate_clickstream_events(5000)
+
+
+def test_single_and_packed_records_match_json(events):
+    expected = _json_rows(events)
+    framed = [generator_wire_format.encode_framed(event) for event in events]
+    assert {generator_wire_format.encode_record(event)[0] for event in events} == {1}
+    assert _binary_rows(framed) == expected
+    packed = [b"".join(framed[i:i + 300]) for i in range(0, len(framed), 300)]
+    table, source = wire_format.decode_bodies(packed)
+    assert table.to_pylist() == expected
+    assert source.tolist() == [i // 300 for i in range(len(events))]
+
+
+def test_disorder_ground_truth_uses_version_2_and_still_matches_json():
+    event_generator.reset_sessions(200, seed=3, disorder=Disorder(delay="exponential", delay_seconds=60,
+                                                                 duplicate_rate=0.1, seed=3))
+    try:
+        events = event_generator.generate_clickstream_events(2000) + event_generator.flush_delayed_events()
+    finally:
+        event_generator.reset_sessions(200, seed=3)  # back to the configured (in-order) delivery
+    framed = [generator_wire_format.encode_framed(event) for event in events]
+    assert {generator_wire_format.encode_record(event)[0] for event in events} == {2}
+    assert _binary_rows(framed) == _json_rows(events)
+
+
+@pytest.mark.parametrize("event", [
+    {"user_id": "user_1", "event_type": "page_view"},                              # missing fields
+    {"user_id": "user_1", "browser": "Opera", "geo_city": "Paris"},                # enum values outside the symbols
+    {"user_id": "user_1", "product_price": [109.0], "product_id": []},             # one-element price list, empty list
+    {"user_id": "user_1", "cart_size": "3"},                                       # wrong type: sent as JSON
+    {"user_id": "user_1", "timestamp": "not a time"},                              # unparseable timestamp: sent as JSON
+    {"user_id": "u" * 70_000},                                                     # string over 64 KiB: sent as JSON
+    {"user_id": "user_1", "product_name": ["a\x1fb"]},                             # list separator in an item: JSON
+])
+def test_edge_cases_match_json(event):
+    assert _binary_rows([generator_wire_format.encode_framed(event)]) == _json_rows([event])
+
+
+def test_unencodable_events_fall_back_to_json_records():
+    assert generator_wire_format.encode_record({"cart_size": "3"})[0] == generator_wire_format.JSON_VERSION
+
+
+def test_truncated_record_is_a_row_of_nulls(events):
+    body = generator_wire_format.encode_framed(events[0])
+    rows = _binary_rows([body[:-5]])
+    assert rows == [dict.fromkeys(rows[0])]
+
+
+def test_unknown_schema_version_is_an_error(events):
+    body = generator_wire_format.encode_framed(events[0])
+    with pytest.raises(ValueError, match="schema version"):
+        wire_format.decode_bodies([body], schema={})
+
+
+def test_decode_messages_keeps_message_order_across_formats(events):
+    sample = events[:30]
+    bodies, formats = [], []
+    for i, event in enumerate(sample):
+        if i % 3 == 0:
+            bodies.append(generator_wire_format.encode_framed(event))
+            formats.append(wire_format.BINARY_FORMAT)
+        else:
+            bodies.append(encode_event(event))
+            formats.append(None)
+    table, source = wire_format.decode_messages(bodies, formats)
+    assert table.to_pylist() == _json_rows(sample)
+    assert source.tolist() == list(range(len(sample)))